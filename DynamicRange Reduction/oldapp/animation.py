@@ -0,0 +1,214 @@
+"""
+Multi-frame images: animated GIF and ANI files.
+
+wx decodes one frame per wx.Image; the number of frames comes from
+wx.Image.GetImageCount. What wx does not give is the frame timing, nor
+where a GIF frame goes on the canvas and what happens to it afterwards, so
+those are read from the file structure here, and the GIF frames are
+composited into full-size images that can be played and edited on their own.
+"""
+import os
+import struct
+from collections import namedtuple
+
+import wx
+
+from imageops import np
+from pixelbuffer import PixelBuffer
+
+ANIMATED_EXTENSIONS = ('.gif', '.ani')
+# Delays below MIN_DELAY_MS are played at DEFAULT_DELAY_MS, as browsers do
+DEFAULT_DELAY_MS = 100
+MIN_DELAY_MS = 20
+# GIF disposal methods
+DISPOSE_BACKGROUND = 2
+DISPOSE_PREVIOUS = 3
+
+# frames are full-size wx.Images (the same object may appear more than once
+# in an ANI sequence), delays the time each is shown, in milliseconds
+Animation = namedtuple('Animation', ['frames', 'delays'])
+# Where a GIF frame goes on the canvas, and how it is disposed of
+GifFrame = namedtuple('GifFrame', ['left', 'top', 'width', 'height', 'delay', 'disposal'])
+
+
+def play_delay(delay):
+    return delay if delay >= MIN_DELAY_MS else DEFAULT_DELAY_MS
+
+
+def skip_sub_blocks(f):
+    size = f.read(1)
+    while size and size[0]:
+        f.seek(size[0], os.SEEK_CUR)
+        size = f.read(1)
+
+
+def read_gif_layout(f):
+    """Return (canvas width, canvas height, [GifFrame]) without decoding any pixels."""
+    header = f.read(13)
+    if header[:6] not in (b'GIF87a', b'GIF89a'):
+        raise ValueError("Not a GIF file")
+    width, height, packed = struct.unpack('<HHB', header[6:11])
+    if packed & 0x80:
+        f.seek(3 << ((packed & 7) + 1), os.SEEK_CUR)
+    frames = []
+    delay = disposal = 0
+    while True:
+        introducer = f.read(1)
+        if introducer == b'!':
+            if f.read(1) == b'\xf9':
+                # Graphic control extension: applies to the next frame
+                block = f.read(f.read(1)[0])
+                disposal = (block[0] >> 2) & 7
+                delay = struct.unpack('<H', block[1:3])[0] * 10
+            skip_sub_blocks(f)
+        elif introducer == b',':
+            left, top, frame_width, frame_height, packed = struct.unpack('<HHHHB', f.read(9))
+            if packed & 0x80:
+                f.seek(3 << ((packed & 7) + 1), os.SEEK_CUR)
+            # LZW code size, then the image data
+            f.seek(1, os.SEEK_CUR)
+            skip_sub_blocks(f)
+            frames.append(GifFrame(left, top, frame_width, frame_height, delay, disposal))
+            delay = disposal = 0
+        else:
+            # Trailer, or a truncated file
+            break
+    return width, height, frames
+
+
+def read_ani_sequence(f):
+    """
+    Return (sequence, delays) of an ANI file: the frame index shown at
+    each step and its delay in milliseconds. The steps follow the 'seq '
+    chunk if there is one, else the frames in order.
+    """
+    header = f.read(12)
+    if header[:4] != b'RIFF' or header[8:12] != b'ACON':
+        raise ValueError("Not an ANI file")
+    frame_count = step_count = 0
+    jiffies = 0
+    rates = sequence = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, size = struct.unpack('<4sI', chunk)
+        if chunk_id in (b'anih', b'rate', b'seq '):
+            data = f.read(size)
+            if chunk_id == b'anih':
+                frame_count, step_count = struct.unpack('<II', data[4:12])
+                jiffies = struct.unpack('<I', data[28:32])[0]
+            else:
+                values = list(struct.unpack(f'<{size // 4}I', data[:size // 4 * 4]))
+                if chunk_id == b'rate':
+                    rates = values
+                else:
+                    sequence = values
+            f.seek(size & 1, os.SEEK_CUR)
+        else:
+            # Chunks are padded to an even size
+            f.seek(size + (size & 1), os.SEEK_CUR)
+    if sequence is None:
+        sequence = list(range(step_count or frame_count))
+    if rates is None:
+        rates = [jiffies] * len(sequence)
+    # Rates are in jiffies of 1/60 s
+    delays = [rate * 1000 // 60 for rate in rates[:len(sequence)]]
+    return sequence, delays
+
+
+def frame_count(path, bitmap_type):
+    """Number of frames wx can decode from path (0 if it cannot read it)."""
+    return wx.Image.GetImageCount(path, bitmap_type)
+
+
+def load_frame(path, bitmap_type, index):
+    image = wx.Image(path, bitmap_type, index)
+    if not image.IsOk():
+        raise ValueError(f"Could not decode frame {index + 1} of {os.path.basename(path)}")
+    return image
+
+
+def to_image(canvas):
+    """A wx.Image of an (H, W, 4) RGBA array, with alpha only if some pixel is not opaque."""
+    height, width = canvas.shape[:2]
+    opaque = bool(canvas[..., 3].all())
+    buffer = PixelBuffer.new(width, height, alpha=not opaque)
+    buffer.array()[...] = canvas[..., :3]
+    if not opaque:
+        buffer.alpha_array()[...] = canvas[..., 3]
+    return buffer.to_image()
+
+
+def load_gif(path, bitmap_type, count):
+    """
+    Decode the frames of an animated GIF and composite each onto the
+    canvas left by the frames before it, following the disposal methods.
+    Without NumPy the frames are returned as decoded.
+    """
+    with open(path, 'rb') as f:
+        width, height, layout = read_gif_layout(f)
+    layout = layout[:count]
+    delays = [play_delay(frame.delay) for frame in layout]
+    if np is None:
+        return Animation([load_frame(path, bitmap_type, i) for i in range(len(layout))], delays)
+
+    canvas = np.zeros((height, width, 4), dtype=np.uint8)
+    frames = []
+    for i, frame in enumerate(layout):
+        image = load_frame(path, bitmap_type, i)
+        if image.HasMask():
+            # The transparent colour becomes alpha 0
+            image.InitAlpha()
+        left, top = frame.left, frame.top
+        if image.GetWidth() == width and image.GetHeight() == height:
+            # Already placed on the canvas by the decoder
+            left = top = 0
+        previous = canvas.copy() if frame.disposal == DISPOSE_PREVIOUS else None
+        source = PixelBuffer(image)
+        rows = max(0, min(image.GetHeight(), height - top))
+        columns = max(0, min(image.GetWidth(), width - left))
+        region = canvas[top:top + rows, left:left + columns]
+        pixels = source.array()[:rows, :columns]
+        alpha = source.alpha_array()
+        if alpha is None:
+            region[..., :3] = pixels
+            region[..., 3] = 255
+        else:
+            visible = alpha[:rows, :columns] != 0
+            region[..., :3][visible] = pixels[visible]
+            region[..., 3][visible] = 255
+        frames.append(to_image(canvas))
+        if frame.disposal == DISPOSE_BACKGROUND:
+            region[...] = 0
+        elif previous is not None:
+            canvas = previous
+    return Animation(frames, delays)
+
+
+def load_ani(path, bitmap_type, count):
+    with open(path, 'rb') as f:
+        sequence, delays = read_ani_sequence(f)
+    images = [load_frame(path, bitmap_type, i) for i in range(count)]
+    steps = [(index, delay) for index, delay in zip(sequence, delays) if index < count]
+    return Animation([images[index] for index, _ in steps], [play_delay(delay) for _, delay in steps])
+
+
+def load_animation(path, supported_formats):
+    """
+    Load every frame of an animated GIF or ANI file as an Animation.
+    Returns None for other files and for files with a single frame.
+    Safe to call from a worker thread.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    bitmap_type = supported_formats.get(extension)
+    if extension not in ANIMATED_EXTENSIONS or bitmap_type is None:
+        return None
+    count = frame_count(path, bitmap_type)
+    if count <= 1:
+        return None
+    if extension == '.gif':
+        animation = load_gif(path, bitmap_type, count)
+    else:
+        animation = load_ani(path, bitmap_type, count)
+    return animation if len(animation.frames) > 1 else None
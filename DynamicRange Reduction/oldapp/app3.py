@@ -2,42 +2,7 @@ import wx
 import os
 import sys
 
-def reduce_color_depth(image, bits=4):
-    """
-    Reduce the color depth of the image by quantizing each RGB channel.
-    bits: number of bits per channel (e.g., 4 => 16 levels per channel)
-    Returns a new wx.Image with reduced color depth.
-    """
-    if bits < 1 or bits > 8:
-        raise ValueError("Bits must be between 1 and 8")
-    levels = 2 ** bits
-    scale = 256 // levels
-
-    width = image.GetWidth()
-    height = image.GetHeight()
-    data = image.GetData()
-    if isinstance(data, bytes):
-        data = bytearray(data)
-    else:
-        data = bytearray(data)
-
-    for i in range(0, len(data), 3):
-        r = data[i]
-        g = data[i+1]
-        b = data[i+2]
-        # Quantize each channel
-        r = (r // scale) * scale
-        g = (g // scale) * scale
-        b = (b // scale) * scale
-        data[i] = r
-        data[i+1] = g
-        data[i+2] = b
-
-    new_image = wx.Image(width, height)
-    new_image.SetData(bytes(data))
-    if image.HasAlpha():
-        new_image.SetAlpha(image.GetAlpha())
-    return new_image
+from imageops import reduce_color_depth
 
 class UniversalImageViewer(wx.Frame):
     def __init__(self, parent, title):
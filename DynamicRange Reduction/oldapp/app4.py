@@ -1,14 +1,99 @@
 import wx
+import math
 import os
+import sqlite3
 import sys
 
+import animation
+import deepimage
+import editpipeline
+import folderscan
+import imagecache
+import imageloader
+import imageops
+import imageprobe
+import imagesaver
+import parallel
+import pyramid
+import thumbcache
+import thumbgrid
+import tiledcanvas
+import workers
+
 class UniversalImageViewer(wx.Frame):
+    # Memory budget for decoded images kept for folder navigation
+    IMAGE_CACHE_MB = 512
+    # Percentiles mapped by Reduce Dynamic Range (Robust)
+    ROBUST_PERCENTILES = (0.5, 99.5)
+    # Tile grid (tiles per side) of the local dynamic range reduction
+    LOCAL_RANGE_TILES = 8
+    # Minimum time between two factor previews while the slider is dragged
+    PREVIEW_DELAY_MS = 40
+    # Memory budget for the cached intermediate results of the edit steps
+    EDIT_CACHE_MB = 256
+    # Threads for pixel operations; None uses one per CPU
+    PROCESSING_THREADS = None
+
     def __init__(self, parent, title):
         super(UniversalImageViewer, self).__init__(parent, title=title, size=(900, 700))
         self.current_image = None
         self.image_path = None
         self.original_image = None
         self.supported_formats = self.get_supported_formats()
+        # 16-bit and float PNM/TIFF files load as deepimage.DeepImage
+        self.decoder = imageloader.BackgroundDecoder(self.supported_formats, self.on_decode_finished, deep=True)
+        self.image_cache = imagecache.ImageCache(self.supported_formats, self.IMAGE_CACHE_MB, deep=True)
+        try:
+            self.thumbnails = thumbcache.ThumbnailCache(self.supported_formats)
+        except (OSError, sqlite3.Error):
+            # Unwritable cache folder or corrupt database: keep thumbnails for this session only
+            self.thumbnails = thumbcache.ThumbnailCache(self.supported_formats, db_path=thumbcache.MEMORY_DB)
+        self.saver = imagesaver.ImageSaver(self.supported_formats)
+        self.folder_files = []
+        self.folder_index = -1
+        # Every scanned file; folder_files is this list filtered and sorted
+        self.folder_all_files = []
+        self.folder_info = {}
+        self.min_resolution = 0
+        self.sort_by_resolution = False
+        self.image_info = None
+        self.probe_worker = workers.LatestOnlyWorker(imageprobe.probe_images, self.on_probe_finished,
+                                                     name="image-probe")
+        self.folder_scanner = folderscan.FolderScanner(self.supported_formats, self.on_scan_batch,
+                                                       self.on_scan_done)
+        self.pyramids = []
+        self.image_stats = None
+        # Leave fully transparent pixels out of the range statistics
+        self.ignore_transparent = False
+        # (DeepImage, its 8-bit wx.Image) for the image last shown
+        self.display_cache = None
+        self.preview_proxy = None
+        self.preview_timer = None
+        self.band_executor = parallel.BandExecutor(self.PROCESSING_THREADS)
+        self.range_worker = workers.LatestOnlyWorker(self.render_range, self.on_range_finished,
+                                                     name="range-compression")
+        # original -> compress/quantize steps; zoom is applied on top in display_image
+        self.edits = editpipeline.EditPipeline({
+            'compress': self.compress_dynamic_range,
+            'quantize': self.reduce_color_depth,
+            'local': self.compress_local_range,
+        }, self.EDIT_CACHE_MB, fuse=self.apply_point_steps, fusable=imageops.PointPipeline.OPERATIONS)
+        # Frames of the animated GIF/ANI shown, and their bitmaps at the display size
+        self.animation = None
+        self.frame_bitmaps = []
+        self.frame_index = 0
+        # (animation, steps, ignore_transparent, frames) of the last frames edited
+        self.edited_frames = None
+        self.animation_loader = workers.LatestOnlyWorker(animation.load_animation, self.on_animation_finished,
+                                                         name="animation-loader")
+        self.frames_worker = workers.LatestOnlyWorker(self.render_frames, self.on_frames_finished,
+                                                      name="animation-frames")
+        self.animation_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_animation_timer, self.animation_timer)
+        self.zoom = 1.0
+        # Full size / shown size while the source is a reduced JPEG draft, else 1
+        self.draft_scale = 1.0
+        self.full_decode_pending = False
         self.init_ui()
         self.create_menu()
         self.create_toolbar()
@@ -18,63 +103,19 @@ class UniversalImageViewer(wx.Frame):
 
     def get_supported_formats(self):
         """Get supported formats with safe constant handling"""
-        formats = {
-            # Bitmap formats
-            '.bmp': wx.BITMAP_TYPE_BMP,
-            '.bitmap': wx.BITMAP_TYPE_BMP,
-            # JPEG formats
-            '.jpg': wx.BITMAP_TYPE_JPEG,
-            '.jpeg': wx.BITMAP_TYPE_JPEG,
-            '.jpe': wx.BITMAP_TYPE_JPEG,
-            '.jfif': wx.BITMAP_TYPE_JPEG,
-            # PNG format
-            '.png': wx.BITMAP_TYPE_PNG,
-            # GIF format
-            '.gif': wx.BITMAP_TYPE_GIF,
-            # TIFF formats
-            '.tif': wx.BITMAP_TYPE_TIF,
-            '.tiff': wx.BITMAP_TYPE_TIF,
-            # PCX format
-            '.pcx': wx.BITMAP_TYPE_PCX,
-            # ICO format
-            '.ico': wx.BITMAP_TYPE_ICO,
-            '.icon': wx.BITMAP_TYPE_ICO,
-            # CUR format (cursor)
-            '.cur': wx.BITMAP_TYPE_CUR,
-            # ANI format (animated cursor)
-            '.ani': wx.BITMAP_TYPE_ANI,
-            # PNM formats
-            '.pnm': wx.BITMAP_TYPE_PNM,
-            '.pbm': wx.BITMAP_TYPE_PNM,
-            '.pgm': wx.BITMAP_TYPE_PNM,
-            '.ppm': wx.BITMAP_TYPE_PNM,
-            # XPM format
-            '.xpm': wx.BITMAP_TYPE_XPM,
-        }
-        # Add conditional formats that might not be available in all wxPython versions
-        conditional_formats = {
-            'BITMAP_TYPE_WEBP': ('.webp', 'WEBP format'),
-            'BITMAP_TYPE_ICNS': ('.icns', 'Apple Icon format'),
-            'BITMAP_TYPE_TGA': ('.tga', 'Targa format'),
-        }
-        for const_name, (extension, description) in conditional_formats.items():
-            if hasattr(wx, const_name):
-                formats[extension] = getattr(wx, const_name)
-                print(f"Added support for {description} ({extension})")
-            else:
-                print(f"Note: {description} ({extension}) not available in this wxPython version")
-        return formats
+        return imageops.get_supported_formats(verbose=True)
 
     def init_ui(self):
         panel = wx.Panel(self)
         main_sizer = wx.BoxSizer(wx.VERTICAL)
-        self.scrolled_window = wx.ScrolledWindow(panel)
+        # Paints only the visible tiles, so huge images never become one bitmap
+        self.scrolled_window = tiledcanvas.TiledImageCanvas(panel)
         self.scrolled_window.SetScrollRate(10, 10)
         self.scrolled_window.SetMinSize((700, 500))
-        self.image_ctrl = wx.StaticBitmap(self.scrolled_window)
-        scroll_sizer = wx.BoxSizer(wx.VERTICAL)
-        scroll_sizer.Add(self.image_ctrl, 1, wx.EXPAND)
-        self.scrolled_window.SetSizer(scroll_sizer)
+        # Folder browser; only the visible cells are painted or have thumbnails loaded
+        self.thumb_grid = thumbgrid.ThumbnailGrid(panel, self.thumbnails, self.on_grid_activate)
+        self.thumb_grid.SetMinSize((700, 500))
+        self.thumb_grid.Hide()
         info_panel = wx.Panel(panel)
         info_sizer = wx.GridBagSizer(5, 5)
         self.file_label = wx.StaticText(info_panel, label="File: None")
@@ -85,8 +126,20 @@ class UniversalImageViewer(wx.Frame):
         info_sizer.Add(self.size_label, pos=(0, 1), flag=wx.EXPAND)
         info_sizer.Add(self.format_label, pos=(1, 0), flag=wx.EXPAND)
         info_sizer.Add(self.dimensions_label, pos=(1, 1), flag=wx.EXPAND)
+        self.factor_label = wx.StaticText(info_panel, label="Factor: 0.70")
+        self.factor_slider = wx.Slider(info_panel, value=70, minValue=0, maxValue=100)
+        info_sizer.Add(self.factor_label, pos=(2, 0), flag=wx.ALIGN_CENTER_VERTICAL)
+        info_sizer.Add(self.factor_slider, pos=(2, 1), flag=wx.EXPAND)
+        info_sizer.AddGrowableCol(1)
         info_panel.SetSizer(info_sizer)
+        # Dragging previews on a proxy; letting go renders the full image once
+        self.factor_slider.Bind(wx.EVT_SCROLL_THUMBTRACK, self.on_factor_drag)
+        for event_type in (wx.EVT_SCROLL_THUMBRELEASE, wx.EVT_SCROLL_LINEUP, wx.EVT_SCROLL_LINEDOWN,
+                           wx.EVT_SCROLL_PAGEUP, wx.EVT_SCROLL_PAGEDOWN, wx.EVT_SCROLL_TOP,
+                           wx.EVT_SCROLL_BOTTOM):
+            self.factor_slider.Bind(event_type, self.on_factor_release)
         main_sizer.Add(self.scrolled_window, 1, wx.EXPAND | wx.ALL, 10)
+        main_sizer.Add(self.thumb_grid, 1, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(info_panel, 0, wx.EXPAND | wx.ALL, 10)
         panel.SetSizer(main_sizer)
 
@@ -95,43 +148,91 @@ class UniversalImageViewer(wx.Frame):
         file_menu = wx.Menu()
         open_item = file_menu.Append(wx.ID_OPEN, "&Open Image\tCtrl+O", "Open an image file")
         open_folder_item = file_menu.Append(wx.ID_ANY, "Open &Folder\tCtrl+F", "Open all images from a folder")
+        open_tree_item = file_menu.Append(wx.ID_ANY, "Open Folder &Tree\tCtrl+Shift+F",
+                                          "Open all images from a folder and its subfolders")
         file_menu.AppendSeparator()
         self.save_item = file_menu.Append(wx.ID_SAVE, "&Save Image\tCtrl+S", "Save current image")
+        export_item = file_menu.Append(wx.ID_ANY, "&Export As...\tCtrl+Shift+E",
+                                       "Save the image in several formats and sizes at once")
+        file_menu.AppendSeparator()
+        cancel_load_item = file_menu.Append(wx.ID_ANY, "&Cancel Loading\tEsc", "Stop loading the current image")
         file_menu.AppendSeparator()
         exit_item = file_menu.Append(wx.ID_EXIT, "E&xit\tCtrl+Q", "Exit application")
 
+        edit_menu = wx.Menu()
+        self.undo_item = edit_menu.Append(wx.ID_UNDO, "&Undo\tCtrl+Z", "Undo the last edit")
+        self.redo_item = edit_menu.Append(wx.ID_REDO, "&Redo\tCtrl+Y", "Redo the last undone edit")
+        self.undo_item.Enable(False)
+        self.redo_item.Enable(False)
+
         view_menu = wx.Menu()
         self.fit_item = view_menu.AppendRadioItem(wx.ID_ANY, "&Fit to Window", "Fit image to window")
         self.actual_size_item = view_menu.AppendRadioItem(wx.ID_ANY, "&Actual Size", "Show image at actual size")
         view_menu.Check(self.fit_item.GetId(), True)
         view_menu.AppendSeparator()
         self.reduce_item = view_menu.Append(wx.ID_ANY, "Reduce &Dynamic Range\tCtrl+D", "Compress image dynamic range")
+        reduce_robust_item = view_menu.Append(wx.ID_ANY, "Reduce Dynamic Range (&Robust)\tCtrl+Shift+D",
+                                              "Compress dynamic range, ignoring outlier pixels")
+        local_item = view_menu.Append(wx.ID_ANY, "Reduce Dynamic Range (&Local)\tCtrl+L",
+                                      "Compress the dynamic range of each region from its own range")
+        quantize_item = view_menu.Append(wx.ID_ANY, "Reduce Color De&pth", "Quantize to 4 bits per channel")
+        self.ignore_transparent_item = view_menu.AppendCheckItem(
+            wx.ID_ANY, "Ignore &Transparent Pixels", "Take the dynamic range from the visible pixels only")
         view_menu.AppendSeparator()
         zoom_in_item = view_menu.Append(wx.ID_ZOOM_IN, "Zoom &In\tCtrl++", "Zoom in")
         zoom_out_item = view_menu.Append(wx.ID_ZOOM_OUT, "Zoom &Out\tCtrl+-", "Zoom out")
         zoom_reset_item = view_menu.Append(wx.ID_ZOOM_100, "&Reset Zoom\tCtrl+0", "Reset zoom to 100%")
+        view_menu.AppendSeparator()
+        next_item = view_menu.Append(wx.ID_FORWARD, "&Next Image\tPgDn", "Show the next image in the folder")
+        prev_item = view_menu.Append(wx.ID_BACKWARD, "&Previous Image\tPgUp", "Show the previous image in the folder")
+        self.browser_item = view_menu.AppendCheckItem(wx.ID_ANY, "Thumbnail &Browser\tCtrl+B",
+                                                      "Browse the folder as a grid of thumbnails")
+        self.sort_resolution_item = view_menu.AppendCheckItem(
+            wx.ID_ANY, "&Sort Folder by Resolution", "Order the folder by pixel count instead of name")
+        min_resolution_item = view_menu.Append(wx.ID_ANY, "&Minimum Resolution...",
+                                               "Hide images smaller than a given size")
+        cache_item = view_menu.Append(wx.ID_ANY, "Image &Cache Size...", "Set the memory budget for cached images")
 
         help_menu = wx.Menu()
         about_item = help_menu.Append(wx.ID_ABOUT, "&About", "About this application")
         formats_item = help_menu.Append(wx.ID_ANY, "Supported &Formats", "Show supported formats")
+        thumb_stats_item = help_menu.Append(wx.ID_ANY, "&Thumbnail Cache Statistics",
+                                            "Show thumbnail cache usage")
 
         menubar.Append(file_menu, "&File")
+        menubar.Append(edit_menu, "&Edit")
         menubar.Append(view_menu, "&View")
         menubar.Append(help_menu, "&Help")
         self.SetMenuBar(menubar)
 
         self.Bind(wx.EVT_MENU, self.on_open, open_item)
         self.Bind(wx.EVT_MENU, self.on_open_folder, open_folder_item)
+        self.Bind(wx.EVT_MENU, self.on_open_folder_tree, open_tree_item)
         self.Bind(wx.EVT_MENU, self.on_save, self.save_item)
+        self.Bind(wx.EVT_MENU, self.on_export, export_item)
+        self.Bind(wx.EVT_MENU, self.on_cancel_load, cancel_load_item)
         self.Bind(wx.EVT_MENU, self.on_exit, exit_item)
+        self.Bind(wx.EVT_MENU, self.on_undo, self.undo_item)
+        self.Bind(wx.EVT_MENU, self.on_redo, self.redo_item)
         self.Bind(wx.EVT_MENU, self.on_fit_to_window, self.fit_item)
         self.Bind(wx.EVT_MENU, self.on_actual_size, self.actual_size_item)
         self.Bind(wx.EVT_MENU, self.on_reduce_colors, self.reduce_item)
+        self.Bind(wx.EVT_MENU, self.on_reduce_robust, reduce_robust_item)
+        self.Bind(wx.EVT_MENU, self.on_reduce_local, local_item)
+        self.Bind(wx.EVT_MENU, self.on_quantize, quantize_item)
+        self.Bind(wx.EVT_MENU, self.on_ignore_transparent, self.ignore_transparent_item)
         self.Bind(wx.EVT_MENU, self.on_zoom_in, zoom_in_item)
         self.Bind(wx.EVT_MENU, self.on_zoom_out, zoom_out_item)
         self.Bind(wx.EVT_MENU, self.on_zoom_reset, zoom_reset_item)
+        self.Bind(wx.EVT_MENU, self.on_next_image, next_item)
+        self.Bind(wx.EVT_MENU, self.on_prev_image, prev_item)
+        self.Bind(wx.EVT_MENU, self.on_toggle_browser, self.browser_item)
+        self.Bind(wx.EVT_MENU, self.on_sort_by_resolution, self.sort_resolution_item)
+        self.Bind(wx.EVT_MENU, self.on_min_resolution, min_resolution_item)
+        self.Bind(wx.EVT_MENU, self.on_cache_size, cache_item)
         self.Bind(wx.EVT_MENU, self.on_about, about_item)
         self.Bind(wx.EVT_MENU, self.on_show_formats, formats_item)
+        self.Bind(wx.EVT_MENU, self.on_thumbnail_stats, thumb_stats_item)
 
     def create_toolbar(self):
         toolbar = self.CreateToolBar(wx.TB_HORIZONTAL | wx.TB_TEXT)
@@ -143,6 +244,9 @@ class UniversalImageViewer(wx.Frame):
         zoom_in_tool = toolbar.AddTool(wx.ID_ZOOM_IN, "Zoom In", wx.ArtProvider.GetBitmap(wx.ART_PLUS))
         zoom_out_tool = toolbar.AddTool(wx.ID_ZOOM_OUT, "Zoom Out", wx.ArtProvider.GetBitmap(wx.ART_MINUS))
         zoom_reset_tool = toolbar.AddTool(wx.ID_ZOOM_100, "Actual Size", wx.ArtProvider.GetBitmap(wx.ART_GO_HOME))
+        toolbar.AddSeparator()
+        prev_tool = toolbar.AddTool(wx.ID_BACKWARD, "Previous", wx.ArtProvider.GetBitmap(wx.ART_GO_BACK))
+        next_tool = toolbar.AddTool(wx.ID_FORWARD, "Next", wx.ArtProvider.GetBitmap(wx.ART_GO_FORWARD))
         toolbar.Realize()
 
         self.Bind(wx.EVT_TOOL, self.on_open, open_tool)
@@ -151,10 +255,36 @@ class UniversalImageViewer(wx.Frame):
         self.Bind(wx.EVT_TOOL, self.on_zoom_in, zoom_in_tool)
         self.Bind(wx.EVT_TOOL, self.on_zoom_out, zoom_out_tool)
         self.Bind(wx.EVT_TOOL, self.on_zoom_reset, zoom_reset_tool)
+        self.Bind(wx.EVT_TOOL, self.on_prev_image, prev_tool)
+        self.Bind(wx.EVT_TOOL, self.on_next_image, next_tool)
 
     def create_statusbar(self):
-        self.statusbar = self.CreateStatusBar()
+        self.statusbar = self.CreateStatusBar(2)
+        self.statusbar.SetStatusWidths([-1, 150])
         self.statusbar.SetStatusText("Ready - Open an image to begin")
+        self.progress_gauge = wx.Gauge(self.statusbar, range=100, style=wx.GA_HORIZONTAL | wx.GA_SMOOTH)
+        self.progress_gauge.Hide()
+        self.progress_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda event: self.progress_gauge.Pulse(), self.progress_timer)
+        self.statusbar.Bind(wx.EVT_SIZE, self.on_statusbar_size)
+
+    def on_statusbar_size(self, event):
+        self.position_progress_gauge()
+        event.Skip()
+
+    def position_progress_gauge(self):
+        rect = self.statusbar.GetFieldRect(1)
+        self.progress_gauge.SetSize(rect.x + 2, rect.y + 2, rect.width - 4, rect.height - 4)
+
+    def show_progress(self, message):
+        self.statusbar.SetStatusText(message)
+        self.position_progress_gauge()
+        self.progress_gauge.Show()
+        self.progress_timer.Start(100)
+
+    def hide_progress(self):
+        self.progress_timer.Stop()
+        self.progress_gauge.Hide()
 
     def get_supported_wildcards(self):
         extensions = {}
@@ -186,59 +316,324 @@ class UniversalImageViewer(wx.Frame):
             if file_dialog.ShowModal() == wx.ID_CANCEL:
                 return
             self.image_path = file_dialog.GetPath()
+            self.folder_scanner.cancel()
+            self.folder_files = []
+            self.folder_index = -1
             self.load_image(self.image_path)
 
-    def on_open_folder(self, event):
+    def on_open_folder(self, event, recursive=False):
         with wx.DirDialog(self, "Choose a folder containing images") as dir_dialog:
             if dir_dialog.ShowModal() == wx.ID_CANCEL:
                 return
             folder_path = dir_dialog.GetPath()
-            self.load_images_from_folder(folder_path)
-
-    def load_images_from_folder(self, folder_path):
-        supported_files = []
-        for filename in os.listdir(folder_path):
-            file_ext = os.path.splitext(filename)[1].lower()
-            if file_ext in self.supported_formats:
-                supported_files.append(os.path.join(folder_path, filename))
-        if supported_files:
-            self.image_path = supported_files[0]
-            self.load_image(self.image_path)
-            self.statusbar.SetStatusText(f"Loaded 1 of {len(supported_files)} images from folder")
+            self.load_images_from_folder(folder_path, recursive)
+
+    def on_open_folder_tree(self, event):
+        self.on_open_folder(event, recursive=True)
+
+    def load_images_from_folder(self, folder_path, recursive=False):
+        """
+        Scan folder_path in the background; the first image is shown as soon
+        as the first batch arrives and later batches extend the folder.
+        """
+        self.folder_files = []
+        self.folder_index = -1
+        self.folder_all_files = []
+        self.folder_info = {}
+        self.thumb_grid.set_paths([])
+        self.folder_scanner.scan(folder_path, recursive)
+        self.statusbar.SetStatusText(f"Scanning {folder_path}...")
+
+    def on_scan_batch(self, generation, paths):
+        # Called on the scan thread
+        wx.CallAfter(self.on_folder_batch, generation, paths)
+
+    def on_folder_batch(self, generation, paths):
+        if not self.folder_scanner.is_current(generation):
+            return
+        self.folder_all_files.extend(paths)
+        if self.folder_view_active():
+            # Filtered or sorted views are built once the scan has finished
+            return
+        first_batch = not self.folder_files
+        self.folder_files.extend(paths)
+        self.thumb_grid.append_paths(paths)
+        if first_batch:
+            self.show_folder_image(0)
+
+    def on_scan_done(self, generation, count, error):
+        wx.CallAfter(self.on_folder_scanned, generation, count, error)
+
+    def on_folder_scanned(self, generation, count, error):
+        if not self.folder_scanner.is_current(generation):
+            return
+        if error is not None:
+            wx.MessageBox(f"Error scanning folder: {error}", "Error", wx.OK | wx.ICON_ERROR)
+        if not self.folder_all_files:
+            if error is None:
+                wx.MessageBox("No supported image files found in the selected folder.", "Info",
+                              wx.OK | wx.ICON_INFORMATION)
+            return
+        # Batches are sorted on their own; put the whole folder in order once it is known
+        self.folder_all_files.sort()
+        self.statusbar.SetStatusText(f"Found {count} images", 1)
+        if self.folder_view_active():
+            self.request_folder_view()
+            return
+        sorted_files = list(self.folder_all_files)
+        if sorted_files != self.folder_files:
+            current = self.folder_files[self.folder_index] if self.folder_index >= 0 else None
+            self.folder_files = sorted_files
+            self.thumb_grid.set_paths(sorted_files)
+            if current is not None:
+                self.folder_index = sorted_files.index(current)
+                self.thumb_grid.select(self.folder_index)
+
+    def folder_view_active(self):
+        return self.min_resolution > 0 or self.sort_by_resolution
+
+    def request_folder_view(self):
+        """Probe the headers of the files not probed yet, then rebuild the folder view."""
+        if not self.folder_all_files:
+            return
+        missing = [path for path in self.folder_all_files if path not in self.folder_info]
+        if not missing:
+            self.apply_folder_view()
+            return
+        self.probe_worker.request(missing)
+        self.show_progress(f"Reading headers of {len(missing)} images...")
+
+    def on_probe_finished(self, args, generation, infos, error):
+        # Called on the probe thread
+        wx.CallAfter(self.on_folder_probed, generation, infos, error)
+
+    def on_folder_probed(self, generation, infos, error):
+        if not self.probe_worker.is_current(generation):
+            return
+        self.hide_progress()
+        if error is not None:
+            wx.MessageBox(f"Error reading image headers: {error}", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.folder_info.update(infos)
+        self.apply_folder_view()
+
+    def apply_folder_view(self):
+        """Filter and sort folder_all_files into folder_files from the probed headers."""
+        def pixels(path):
+            info = self.folder_info.get(path)
+            return info.width * info.height if info is not None else 0
+
+        files = self.folder_all_files
+        if self.min_resolution > 0:
+            # Files that could not be probed are kept rather than hidden
+            files = [path for path in files
+                     if self.folder_info.get(path) is None
+                     or min(self.folder_info[path].width, self.folder_info[path].height) >= self.min_resolution]
+        if self.sort_by_resolution:
+            files = sorted(files, key=pixels)
+        current = self.image_path
+        self.folder_files = list(files)
+        self.thumb_grid.set_paths(self.folder_files)
+        if not self.folder_files:
+            self.folder_index = -1
+            self.statusbar.SetStatusText("No images in this folder match the minimum resolution")
+        elif current in self.folder_files:
+            self.folder_index = self.folder_files.index(current)
+            self.thumb_grid.select(self.folder_index)
         else:
-            wx.MessageBox("No supported image files found in the selected folder.", "Info", wx.OK | wx.ICON_INFORMATION)
+            self.show_folder_image(0)
+        self.statusbar.SetStatusText(f"Showing {len(self.folder_files)} of {len(self.folder_all_files)}", 1)
+
+    def on_sort_by_resolution(self, event):
+        self.sort_by_resolution = self.sort_resolution_item.IsChecked()
+        self.request_folder_view()
+
+    def on_min_resolution(self, event):
+        min_resolution = wx.GetNumberFromUser(
+            "Hide images whose width or height is below (pixels, 0 shows all):", "Pixels",
+            "Minimum Resolution", self.min_resolution, 0, 100000, self)
+        if min_resolution >= 0:
+            self.min_resolution = min_resolution
+            self.request_folder_view()
+
+    def show_folder_image(self, index):
+        self.folder_index = index
+        self.image_path = self.folder_files[index]
+        self.load_image(self.image_path)
+        neighbours = [self.folder_files[i] for i in (index + 1, index - 1)
+                      if 0 <= i < len(self.folder_files)]
+        self.image_cache.prefetch(neighbours)
+
+    def on_next_image(self, event):
+        if self.folder_files and self.folder_index < len(self.folder_files) - 1:
+            self.show_folder_image(self.folder_index + 1)
+
+    def on_prev_image(self, event):
+        if self.folder_files and self.folder_index > 0:
+            self.show_folder_image(self.folder_index - 1)
+
+    def show_browser(self, show):
+        self.browser_item.Check(show)
+        self.thumb_grid.Show(show)
+        self.scrolled_window.Show(not show)
+        self.thumb_grid.GetParent().Layout()
+        if show:
+            if self.folder_index >= 0:
+                self.thumb_grid.select(self.folder_index)
+            self.thumb_grid.SetFocus()
+
+    def on_toggle_browser(self, event):
+        self.show_browser(self.browser_item.IsChecked())
+
+    def on_grid_activate(self, index):
+        self.show_browser(False)
+        self.show_folder_image(index)
+
+    def on_cache_size(self, event):
+        budget_mb = wx.GetNumberFromUser(
+            "Memory budget for cached images (MB):", "MB", "Image Cache Size",
+            int(self.image_cache.budget_mb), 0, 65536, self)
+        if budget_mb >= 0:
+            self.image_cache.set_budget(budget_mb)
+            self.statusbar.SetStatusText(
+                f"Image cache: {self.format_file_size(self.image_cache.total_bytes)} "
+                f"used of {budget_mb} MB")
 
     def load_image(self, path):
+        """
+        Show path, from the image cache if it is there, otherwise by decoding
+        it on the background decoder (on_image_decoded shows the result).
+        """
+        info = self.show_file_info(path)
+        image = self.image_cache.get(path)
+        if image is not None:
+            self.decoder.cancel()
+            self.hide_progress()
+            self.show_loaded_image(path, image)
+            return
+        self.decoder.request(path, self.draft_size_for(path, info))
+        self.show_progress(f"Loading {os.path.basename(path)}...")
+
+    def draft_size_for(self, path, info):
+        """
+        Size to decode a JPEG at when it is shown fitted to the window, so
+        the decoder can skip detail that would be scaled away; None decodes
+        in full.
+        """
+        if (not self.fit_item.IsChecked() or info is None or info.format != 'JPEG'
+                or not imageloader.can_decode_draft(path)):
+            return None
+        display_size = self.scrolled_window.GetClientSize()
+        scale = min(display_size.width / info.width, display_size.height / info.height)
+        if scale >= 0.5:
+            return None
+        return (info.width * scale, info.height * scale)
+
+    def request_full_image(self):
+        """Decode the full resolution of a draft in the background, once."""
+        if self.draft_scale > 1.0 and not self.full_decode_pending:
+            self.full_decode_pending = True
+            self.decoder.request(self.image_path)
+            self.show_progress(f"Loading {os.path.basename(self.image_path)} at full resolution...")
+
+    def replace_draft(self, image, steps=None, result=None):
+        """
+        Swap the full resolution decode in for the draft, keeping the edits.
+        result is the output of steps on image if it was already computed.
+        """
+        self.draft_scale = 1.0
+        self.full_decode_pending = False
+        self.original_image = image
+        self.edits.replace_source(image, steps, result)
+        self.show_edit_result()
+
+    def on_decode_finished(self, path, draft_size, generation, image, error):
+        # Called on the decoder thread
+        wx.CallAfter(self.on_image_decoded, path, draft_size, generation, image, error)
+
+    def on_image_decoded(self, path, draft_size, generation, image, error):
+        if not self.decoder.is_current(generation):
+            return
+        self.hide_progress()
+        if error is not None:
+            wx.MessageBox(f"Error loading image: {error}", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if image is None:
+            wx.MessageBox(
+                "Failed to load image! The file might be corrupted or in an unsupported format.",
+                "Error", wx.OK | wx.ICON_ERROR
+            )
+            return
+        info = self.image_info
+        # Only a draft request can come back reduced; other images may be
+        # smaller than the header says (e.g. the first frame of a GIF)
+        if (draft_size is not None and info is not None and path == self.image_path
+                and image.GetWidth() < info.width):
+            self.show_loaded_image(path, image, info.width / image.GetWidth())
+            return
+        self.image_cache.put(path, image)
+        if path == self.image_path and self.draft_scale > 1.0:
+            self.replace_draft(image)
+            self.statusbar.SetStatusText(f"Loaded full resolution of {os.path.basename(path)}")
+            return
+        self.show_loaded_image(path, image)
+
+    def show_file_info(self, path):
+        """
+        Fill the info panel from the file header, before the image is decoded;
+        returns the imageprobe.ImageInfo, or None if the header is unknown.
+        """
+        info = self.folder_info.get(path) or imageprobe.probe_image(path)
+        self.image_info = info
+        filename = os.path.basename(path)
+        file_ext = os.path.splitext(path)[1].lower()
+        self.file_label.SetLabel(f"File: {filename}")
+        if info is None:
+            self.size_label.SetLabel("Size: N/A")
+            self.format_label.SetLabel(f"Format: {file_ext.upper() or 'Unknown'}")
+            self.dimensions_label.SetLabel("Dimensions: N/A")
+            return None
+        details = f"{info.bit_depth}-bit" + (", alpha" if info.has_alpha else "")
+        self.size_label.SetLabel(f"Size: {self.format_file_size(info.file_size)}")
+        self.format_label.SetLabel(f"Format: {info.format} ({details})")
+        self.dimensions_label.SetLabel(f"Dimensions: {info.width} × {info.height}")
+        return info
+
+    def show_loaded_image(self, path, image, draft_scale=1.0):
         try:
-            file_ext = os.path.splitext(path)[1].lower()
-            if file_ext in self.supported_formats:
-                bitmap_type = self.supported_formats[file_ext]
-                image = wx.Image(path, bitmap_type)
-            else:
-                image = wx.Image(path, wx.BITMAP_TYPE_ANY)
-            if not image.IsOk():
-                image = wx.Image(path, wx.BITMAP_TYPE_ANY)
-                if not image.IsOk():
-                    wx.MessageBox(
-                        "Failed to load image! The file might be corrupted or in an unsupported format.",
-                        "Error", wx.OK | wx.ICON_ERROR
-                    )
-                    return
+            self.image_path = path
             self.original_image = image
             self.current_image = image
+            self.edits.set_source(image)
+            self.zoom = 1.0
+            self.draft_scale = draft_scale
+            self.full_decode_pending = False
+            self.stop_animation()
+            if os.path.splitext(path)[1].lower() in animation.ANIMATED_EXTENSIONS:
+                self.animation_loader.request(path, self.supported_formats)
+            self.update_undo_items()
             self.display_image()
             filename = os.path.basename(path)
-            file_size = os.path.getsize(path)
             dimensions = f"{image.GetWidth()} × {image.GetHeight()}"
-            file_size_str = self.format_file_size(file_size)
-            self.file_label.SetLabel(f"File: {filename}")
-            self.size_label.SetLabel(f"Size: {file_size_str}")
-            self.format_label.SetLabel(f"Format: {file_ext.upper() or 'Unknown'}")
-            self.dimensions_label.SetLabel(f"Dimensions: {dimensions}")
-            self.statusbar.SetStatusText(f"Loaded: {filename} - {dimensions}")
+            if self.image_info is None:
+                self.size_label.SetLabel(f"Size: {self.format_file_size(os.path.getsize(path))}")
+                self.dimensions_label.SetLabel(f"Dimensions: {dimensions}")
+            status = f"Loaded: {filename} - {dimensions}"
+            if draft_scale > 1.0:
+                status += f" (1/{round(draft_scale)} scale preview)"
+            if self.folder_files:
+                status += f" ({self.folder_index + 1} of {len(self.folder_files)})"
+            self.statusbar.SetStatusText(status)
         except Exception as e:
             wx.MessageBox(f"Error loading image: {str(e)}", "Error", wx.OK | wx.ICON_ERROR)
 
+    def on_cancel_load(self, event):
+        if self.progress_gauge.IsShown():
+            self.decoder.cancel()
+            self.full_decode_pending = False
+            self.hide_progress()
+            self.statusbar.SetStatusText("Loading cancelled")
+
     def format_file_size(self, size_bytes):
         if size_bytes == 0:
             return "0 B"
@@ -249,120 +644,408 @@ class UniversalImageViewer(wx.Frame):
             i += 1
         return f"{size_bytes:.1f} {size_names[i]}"
 
+    def display_version(self, image):
+        """The 8-bit wx.Image to show for image, converted once for a DeepImage."""
+        if not isinstance(image, deepimage.DeepImage):
+            return image
+        if self.display_cache is None or self.display_cache[0] is not image:
+            self.display_cache = (image, deepimage.to_wx_image(image))
+        return self.display_cache[1]
+
     def display_image(self):
         if self.current_image is None:
             return
-        image = self.current_image
+        image = self.display_version(self.current_image)
+        scale = self.display_scale(image)
+        if scale > 1.0:
+            self.request_full_image()
+            # The canvas scales the visible tiles; the zoomed image is never built
+            self.scrolled_window.set_image(image, scale)
+        elif scale != 1.0:
+            self.scrolled_window.set_image(
+                self.pyramid_for(image).scaled(image.GetWidth() * scale, image.GetHeight() * scale))
+        else:
+            self.scrolled_window.set_image(image)
+        self.Layout()
+        self.render_animation()
+
+    def display_scale(self, image):
+        """Scale image is shown at: fitted to the window, or the zoom."""
         if self.fit_item.IsChecked():
             display_size = self.scrolled_window.GetClientSize()
-            img_width = image.GetWidth()
-            img_height = image.GetHeight()
-            if img_width > 0 and img_height > 0:
-                scale_x = display_size.width / img_width
-                scale_y = display_size.height / img_height
-                scale = min(scale_x, scale_y)
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                image = image.Scale(new_width, new_height, wx.IMAGE_QUALITY_HIGH)
-        bitmap = wx.Bitmap(image)
-        self.image_ctrl.SetBitmap(bitmap)
-        self.scrolled_window.SetVirtualSize(bitmap.GetSize())
-        self.scrolled_window.Layout()
-        self.Layout()
+            if image.GetWidth() <= 0 or image.GetHeight() <= 0:
+                return 1.0
+            return min(display_size.width / image.GetWidth(), display_size.height / image.GetHeight())
+        # zoom is relative to the full resolution, which a draft is smaller than
+        return self.zoom * self.draft_scale
+
+    def on_animation_finished(self, args, generation, result, error):
+        # Called on the animation loader thread
+        wx.CallAfter(self.on_animation_loaded, args, generation, result, error)
+
+    def on_animation_loaded(self, args, generation, result, error):
+        if not self.animation_loader.is_current(generation) or args[0] != self.image_path:
+            return
+        if error is not None:
+            self.statusbar.SetStatusText(f"Could not load the animation frames: {error}")
+            return
+        if result is None:
+            return
+        self.animation = result
+        self.render_animation()
+        self.statusbar.SetStatusText(f"Loaded {len(result.frames)} frames of {os.path.basename(args[0])}")
+
+    def render_animation(self):
+        """
+        Edit and scale every frame for playback in the background; playback
+        of the previous frames stops until on_frames_rendered has them.
+        """
+        if self.animation is None:
+            return
+        self.animation_timer.Stop()
+        scale = self.display_scale(self.animation.frames[0])
+        self.frames_worker.request(self.animation, self.edits.steps, scale)
+
+    def render_frames(self, source, steps, scale):
+        """Runs on the animation frames worker thread; the edited frames are kept for rescaling."""
+        cached = self.edited_frames
+        if cached is None or cached[0] is not source or cached[1:3] != (steps, self.ignore_transparent):
+            cached = (source, steps, self.ignore_transparent, self.edit_frames(source.frames, steps))
+            self.edited_frames = cached
+        frames = cached[3]
+        if scale != 1.0:
+            width = max(1, int(frames[0].GetWidth() * scale))
+            height = max(1, int(frames[0].GetHeight() * scale))
+            frames = self.band_executor.map_frames(
+                lambda frame: frame.Scale(width, height, wx.IMAGE_QUALITY_HIGH), frames)
+        return frames
+
+    def edit_frames(self, frames, steps):
+        """
+        Run the edit steps on every frame of an animation, frames in parallel.
+        Runs of compress/quantize steps share one statistics pass over all
+        frames, so every frame gets the same mapping; local compression
+        works frame by frame.
+        """
+        start = 0
+        while start < len(steps):
+            stop = start
+            while stop < len(steps) and steps[stop].name in imageops.PointPipeline.OPERATIONS:
+                stop += 1
+            if stop > start:
+                point_pipeline = imageops.PointPipeline((step.name, dict(step.params)) for step in steps[start:stop])
+                frames = self.band_executor.apply_point_pipeline_frames(point_pipeline, frames,
+                                                                        self.ignore_transparent)
+                start = stop
+            else:
+                params = dict(steps[start].params)
+                frames = self.band_executor.map_frames(
+                    lambda frame: imageops.compress_local_range(frame, **params), frames)
+                start += 1
+        return frames
+
+    def on_frames_finished(self, args, generation, frames, error):
+        # Called on the animation frames worker thread
+        wx.CallAfter(self.on_frames_rendered, args, generation, frames, error)
+
+    def on_frames_rendered(self, args, generation, frames, error):
+        if not self.frames_worker.is_current(generation) or args[0] is not self.animation:
+            return
+        if error is not None:
+            self.statusbar.SetStatusText(f"Could not play the animation: {error}")
+            return
+        # Converted once here, so playback only swaps bitmaps
+        self.frame_bitmaps = [wx.Bitmap(frame) for frame in frames]
+        self.frame_index %= len(self.frame_bitmaps)
+        self.show_frame()
+
+    def show_frame(self):
+        self.scrolled_window.set_bitmap(self.frame_bitmaps[self.frame_index])
+        self.animation_timer.StartOnce(self.animation.delays[self.frame_index])
+
+    def on_animation_timer(self, event):
+        if not self.frame_bitmaps:
+            return
+        self.frame_index = (self.frame_index + 1) % len(self.frame_bitmaps)
+        self.show_frame()
+
+    def stop_animation(self):
+        self.animation_timer.Stop()
+        self.animation_loader.cancel()
+        self.frames_worker.cancel()
+        self.animation = None
+        self.edited_frames = None
+        self.frame_bitmaps = []
+        self.frame_index = 0
+
+    def pyramid_for(self, image):
+        """Return the scaling pyramid for image, reusing it for the last few images shown."""
+        for image_pyramid in self.pyramids:
+            if image_pyramid.image is image:
+                return image_pyramid
+        image_pyramid = pyramid.ImagePyramid(image)
+        self.pyramids = [image_pyramid] + self.pyramids[:2]
+        return image_pyramid
 
     def on_fit_to_window(self, event):
         self.display_image()
 
     def on_actual_size(self, event):
         if self.original_image:
-            self.current_image = self.original_image
+            self.zoom = 1.0
             self.display_image()
 
     def on_zoom_in(self, event):
         if self.original_image and self.actual_size_item.IsChecked():
-            width = int(self.current_image.GetWidth() * 1.2)
-            height = int(self.current_image.GetHeight() * 1.2)
-            self.current_image = self.original_image.Scale(width, height, wx.IMAGE_QUALITY_HIGH)
+            self.zoom *= 1.2
             self.display_image()
 
     def on_zoom_out(self, event):
         if self.original_image and self.actual_size_item.IsChecked():
-            width = int(self.current_image.GetWidth() * 0.8)
-            height = int(self.current_image.GetHeight() * 0.8)
-            self.current_image = self.original_image.Scale(width, height, wx.IMAGE_QUALITY_HIGH)
+            self.zoom *= 0.8
             self.display_image()
 
     def on_zoom_reset(self, event):
         self.on_actual_size(event)
 
-    def compress_dynamic_range(self, image, factor=0.7):
+    def stats_for(self, image):
+        """Return the channel histograms of image, computed once and kept for the last image."""
+        ignore_transparent = self.ignore_transparent
+        # Runs on the range worker too: read the shared entry once and
+        # return the local result, never re-read what the other thread may replace
+        cached = self.image_stats
+        if cached is not None and cached[0] is image and cached[1] == ignore_transparent:
+            return cached[2]
+        if isinstance(image, deepimage.DeepImage):
+            stats = deepimage.DeepStats(image, ignore_transparent)
+        else:
+            stats = self.band_executor.channel_stats(image, ignore_transparent)
+        self.image_stats = (image, ignore_transparent, stats)
+        return stats
+
+    def compress_dynamic_range(self, image, factor=0.7, low_percentile=None, high_percentile=None):
         """
         Compress the dynamic range to create a hazy/washed-out look.
         factor: 1.0 = no change, 0.0 = completely flat gray.
         Default 0.7 gives a strong but not extreme compression.
+        With percentiles, or when transparent pixels are ignored, the cached
+        histograms of image are reused.
+        """
+        if isinstance(image, deepimage.DeepImage):
+            compress = deepimage.compress_dynamic_range
+        else:
+            compress = self.band_executor.compress_dynamic_range
+        ignore_transparent = self.ignore_transparent and image.HasAlpha()
+        if low_percentile is None and high_percentile is None and not ignore_transparent:
+            return compress(image, factor)
+        return compress(image, factor, low_percentile, high_percentile, stats=self.stats_for(image))
+
+    def reduce_color_depth(self, image, bits=4):
+        if isinstance(image, deepimage.DeepImage):
+            return deepimage.reduce_color_depth(image, bits)
+        return self.band_executor.reduce_color_depth(image, bits)
+
+    def compress_local_range(self, image, factor=0.7, tiles=8, low_percentile=0.0, high_percentile=100.0):
+        """Local compression works on 8-bit samples; a DeepImage is converted first."""
+        # Runs on the range worker too: convert here rather than through display_cache
+        if isinstance(image, deepimage.DeepImage):
+            image = deepimage.to_wx_image(image)
+        return self.band_executor.compress_local_range(image, factor, tiles, low_percentile, high_percentile)
+
+    def update_undo_items(self):
+        self.undo_item.Enable(self.edits.can_undo())
+        self.redo_item.Enable(self.edits.can_redo())
+
+    def show_edit_result(self):
+        """Show the output of the current edit steps, recomputing only what is not cached."""
+        self.current_image = self.edits.result()
+        self.display_image()
+        self.update_undo_items()
+
+    def on_undo(self, event):
+        if self.edits.undo():
+            self.show_edit_result()
+            self.statusbar.SetStatusText("Undone.")
+
+    def on_redo(self, event):
+        if self.edits.redo():
+            self.show_edit_result()
+            self.statusbar.SetStatusText("Redone.")
+
+    def steps_before_compress(self):
+        """The edit steps without a trailing compress step (the input of that step)."""
+        steps = self.edits.steps
+        if steps and steps[-1].name == 'compress':
+            return steps[:-1]
+        return steps
+
+    def set_compress_step(self, **params):
+        """Set the parameters of the trailing compress step, adding one if needed."""
+        if self.edits.steps and self.edits.steps[-1].name == 'compress':
+            self.edits.set_params(len(self.edits.steps) - 1, **params)
+        else:
+            self.edits.apply('compress', **params)
+
+    def apply_point_steps(self, image, steps):
+        """Run consecutive compress/quantize edit steps as one fused lookup-table pass."""
+        if isinstance(image, deepimage.DeepImage):
+            # The fused tables are 8-bit; run the steps one after another
+            for step in steps:
+                image = self.edits.operations[step.name](image, **dict(step.params))
+            return image
+        point_pipeline = imageops.PointPipeline((step.name, dict(step.params)) for step in steps)
+        stats = self.stats_for(image) if point_pipeline.needs_stats() else None
+        return self.band_executor.apply_point_pipeline(point_pipeline, image, stats)
+
+    def slider_factor(self):
+        return self.factor_slider.GetValue() / 100.0
+
+    def on_factor_drag(self, event):
+        self.factor_label.SetLabel(f"Factor: {self.slider_factor():.2f}")
+        if self.original_image is None:
+            return
+        if self.preview_timer is None or not self.preview_timer.IsRunning():
+            self.preview_timer = wx.CallLater(self.PREVIEW_DELAY_MS, self.request_range_preview)
+
+    def request_range_preview(self):
+        size = self.scrolled_window.GetClientSize()
+        self.range_worker.request('preview', self.edits.source, self.slider_factor(),
+                                  (size.width, size.height), self.steps_before_compress(),
+                                  self.compress_percentiles())
+
+    def compress_percentiles(self):
+        """
+        (low, high) percentiles of the trailing compress step, which the
+        slider changes the factor of; the full range if there is none.
+        """
+        params = {}
+        if self.edits.steps and self.edits.steps[-1].name == 'compress':
+            params = dict(self.edits.steps[-1].params)
+        low = params.get('low_percentile')
+        high = params.get('high_percentile')
+        return (0.0 if low is None else low, 100.0 if high is None else high)
+
+    def on_factor_release(self, event):
+        self.factor_label.SetLabel(f"Factor: {self.slider_factor():.2f}")
+        if self.original_image is None:
+            return
+        if self.preview_timer is not None:
+            self.preview_timer.Stop()
+        self.set_compress_step(factor=self.slider_factor())
+        self.update_undo_items()
+        self.range_worker.request('full', self.edits.source, self.slider_factor(), None, self.edits.steps, None)
+        self.show_progress("Reducing dynamic range...")
+
+    def render_range(self, kind, source, factor, size, steps, percentiles):
         """
-        if factor >= 1.0:
+        Runs on the range worker thread. The full render evaluates the edit
+        steps; a preview is one LUT application on a window-sized proxy of
+        the compress step's input, using that input's cached histograms and
+        the (low, high) percentiles the compress step will keep.
+        """
+        image = self.edits.result(steps)
+        if kind == 'full':
             return image
+        stats = self.stats_for(image)
+        proxy = self.preview_proxy_for(image, size)
+        low, high = percentiles
+        if isinstance(image, deepimage.DeepImage):
+            return deepimage.to_wx_image(deepimage.compress_dynamic_range(proxy, factor, low, high, stats))
+        return imageops.compress_dynamic_range(proxy, factor, low, high, stats)
+
+    def preview_proxy_for(self, image, size):
+        if self.preview_proxy is None or self.preview_proxy[0] is not image or self.preview_proxy[1] != size:
+            if isinstance(image, deepimage.DeepImage):
+                # Subsampling keeps the full-precision samples for the compression
+                step = max(1, math.ceil(max(image.GetWidth() / size[0], image.GetHeight() / size[1])))
+                proxy = image.subsampled(step)
+            else:
+                scale = min(size[0] / image.GetWidth(), size[1] / image.GetHeight(), 1.0)
+                proxy = pyramid.ImagePyramid(image).scaled(image.GetWidth() * scale, image.GetHeight() * scale)
+            self.preview_proxy = (image, size, proxy)
+        return self.preview_proxy[2]
 
-        width = image.GetWidth()
-        height = image.GetHeight()
-        data = bytearray(image.GetData())
-
-        pixels = []
-        for i in range(0, len(data), 3):
-            r = data[i]
-            g = data[i+1]
-            b = data[i+2]
-            pixels.append((r, g, b))
-
-        r_vals = [p[0] for p in pixels]
-        g_vals = [p[1] for p in pixels]
-        b_vals = [p[2] for p in pixels]
-
-        r_min, r_max = min(r_vals), max(r_vals)
-        g_min, g_max = min(g_vals), max(g_vals)
-        b_min, b_max = min(b_vals), max(b_vals)
-
-        # Map to a reduced global range (same for all channels)
-        new_min = int((1 - factor) * 128)         # e.g., 38 for factor=0.7
-        new_max = 255 - new_min                   # e.g., 217
-        new_range = new_max - new_min
-
-        for i, (r, g, b) in enumerate(pixels):
-            # Red
-            r_new = new_min + ((r - r_min) * new_range // (r_max - r_min)) if r_max > r_min else new_min
-            # Green
-            g_new = new_min + ((g - g_min) * new_range // (g_max - g_min)) if g_max > g_min else new_min
-            # Blue
-            b_new = new_min + ((b - b_min) * new_range // (b_max - b_min)) if b_max > b_min else new_min
-
-            r_new = max(0, min(255, r_new))
-            g_new = max(0, min(255, g_new))
-            b_new = max(0, min(255, b_new))
-
-            idx = i * 3
-            data[idx] = r_new
-            data[idx+1] = g_new
-            data[idx+2] = b_new
-
-        new_image = wx.Image(width, height)
-        new_image.SetData(bytes(data))
-        if image.HasAlpha():
-            new_image.SetAlpha(image.GetAlpha())
-        return new_image
+    def on_range_finished(self, args, generation, image, error):
+        # Called on the range worker thread
+        wx.CallAfter(self.on_range_rendered, args, generation, image, error)
+
+    def on_range_rendered(self, args, generation, image, error):
+        kind, source = args[0], args[1]
+        if not self.range_worker.is_current(generation) or source is not self.edits.source:
+            return
+        if kind == 'full':
+            self.hide_progress()
+        if error is not None:
+            wx.MessageBox(f"Error reducing dynamic range: {error}", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if kind == 'preview':
+            # The preview is of a still frame; playback resumes with the full render
+            self.animation_timer.Stop()
+            self.scrolled_window.set_image(image)
+            return
+        if args[4] != self.edits.steps:
+            return
+        self.current_image = image
+        self.display_image()
+        self.statusbar.SetStatusText(f"Dynamic range reduced (factor {args[2]:.2f}).")
 
     def on_reduce_colors(self, event):
         if self.current_image is None:
             wx.MessageBox("No image loaded!", "Info", wx.OK | wx.ICON_INFORMATION)
             return
         try:
-            compressed_image = self.compress_dynamic_range(self.current_image, factor=0.7)
-            self.current_image = compressed_image
-            self.display_image()
+            self.set_compress_step(factor=self.slider_factor(), low_percentile=None, high_percentile=None)
+            self.show_edit_result()
             self.statusbar.SetStatusText("Dynamic range reduced (hazy effect applied).")
         except Exception as e:
             wx.MessageBox(f"Error reducing dynamic range: {str(e)}", "Error", wx.OK | wx.ICON_ERROR)
 
+    def on_reduce_robust(self, event):
+        if self.current_image is None:
+            wx.MessageBox("No image loaded!", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+        try:
+            low, high = self.ROBUST_PERCENTILES
+            self.set_compress_step(factor=self.slider_factor(), low_percentile=low, high_percentile=high)
+            self.show_edit_result()
+            self.statusbar.SetStatusText(
+                f"Dynamic range reduced between the {low}th and {high}th percentiles.")
+        except Exception as e:
+            wx.MessageBox(f"Error reducing dynamic range: {str(e)}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def on_reduce_local(self, event):
+        if self.current_image is None:
+            wx.MessageBox("No image loaded!", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+        try:
+            low, high = self.ROBUST_PERCENTILES
+            self.edits.apply('local', factor=self.slider_factor(), tiles=self.LOCAL_RANGE_TILES,
+                             low_percentile=low, high_percentile=high)
+            self.show_edit_result()
+            self.statusbar.SetStatusText(
+                f"Local dynamic range reduced ({self.LOCAL_RANGE_TILES}×{self.LOCAL_RANGE_TILES} tiles).")
+        except Exception as e:
+            wx.MessageBox(f"Error reducing dynamic range: {str(e)}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def on_quantize(self, event):
+        if self.current_image is None:
+            wx.MessageBox("No image loaded!", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+        try:
+            self.edits.apply('quantize', bits=4)
+            self.show_edit_result()
+            self.statusbar.SetStatusText("Color depth reduced to 4 bits per channel.")
+        except Exception as e:
+            wx.MessageBox(f"Error reducing colors: {str(e)}", "Error", wx.OK | wx.ICON_ERROR)
+
+    def on_ignore_transparent(self, event):
+        self.ignore_transparent = self.ignore_transparent_item.IsChecked()
+        if self.original_image is None:
+            return
+        # The cached edit results were computed with the other statistics
+        self.edits.replace_source(self.edits.source)
+        self.show_edit_result()
+
     def on_save(self, event):
         if self.current_image is None:
             wx.MessageBox("No image to save!", "Info", wx.OK | wx.ICON_INFORMATION)
@@ -378,10 +1061,99 @@ class UniversalImageViewer(wx.Frame):
                 wx.MessageBox("Unsupported file format for saving.", "Error", wx.OK | wx.ICON_ERROR)
                 return
             bitmap_type = self.supported_formats[file_ext]
-            if not self.current_image.SaveFile(output_path, bitmap_type):
-                wx.MessageBox("Failed to save image!", "Error", wx.OK | wx.ICON_ERROR)
-            else:
-                self.statusbar.SetStatusText(f"Image saved to {output_path}")
+
+        def save(image):
+            self.saver.save(image, output_path, bitmap_type, self.on_save_finished)
+            self.show_progress(f"Saving {os.path.basename(output_path)}...")
+
+        self.with_full_resolution(save)
+
+    def with_full_resolution(self, then):
+        """
+        Call then(image) with the edited image at full resolution. If only a
+        reduced draft is loaded, the full decode and the edits run on a
+        saver thread first and then is called on the GUI thread after them.
+        """
+        if self.draft_scale <= 1.0:
+            then(self.current_image)
+            return
+        path = self.image_path
+        steps = self.edits.steps
+
+        def render():
+            source = imageloader.decode_image(path, self.supported_formats)
+            if source is None:
+                raise IOError("The file could not be decoded")
+            return source, self.edits.result_for(source, steps)
+
+        def rendered(result, error):
+            # Called on a saver thread
+            wx.CallAfter(self.on_full_resolution_rendered, path, steps, then, result, error)
+
+        self.saver.prepare(render, rendered)
+        self.show_progress(f"Loading {os.path.basename(path)} at full resolution...")
+
+    def on_full_resolution_rendered(self, path, steps, then, result, error):
+        self.hide_progress()
+        if error is not None:
+            wx.MessageBox(f"Failed to load the full resolution image: {error}", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        source, image = result
+        if path == self.image_path and self.draft_scale > 1.0:
+            self.decoder.cancel()
+            self.replace_draft(source, steps, image)
+        then(image)
+
+    def on_save_finished(self, path, error):
+        # Called on a saver thread
+        wx.CallAfter(self.on_image_saved, path, error)
+
+    def on_image_saved(self, path, error):
+        self.hide_progress()
+        if error is not None:
+            wx.MessageBox(f"Failed to save image: {error}", "Error", wx.OK | wx.ICON_ERROR)
+        else:
+            self.statusbar.SetStatusText(f"Image saved to {path}")
+
+    def on_export(self, event):
+        if self.current_image is None:
+            wx.MessageBox("No image to export!", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+        exports = imagesaver.DEFAULT_EXPORTS
+        with wx.MultiChoiceDialog(self, "Files to write:", "Export As",
+                                  [target.label for target in exports]) as choice_dialog:
+            choice_dialog.SetSelections(list(range(len(exports))))
+            if choice_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            targets = [exports[i] for i in choice_dialog.GetSelections()]
+        if not targets:
+            return
+        default_name = os.path.splitext(os.path.basename(self.image_path or "image"))[0]
+        with wx.FileDialog(self, "Export As (the extension is chosen per file)", defaultFile=default_name,
+                           wildcard="All files (*.*)|*.*", style=wx.FD_SAVE) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            base_path = os.path.splitext(file_dialog.GetPath())[0]
+
+        def export(image):
+            # The export formats are 8-bit; Save keeps 16 bits for PNM
+            self.saver.export(self.display_version(image), base_path, targets, self.on_export_progress)
+            self.show_progress(f"Exporting {len(targets)} files...")
+
+        self.with_full_resolution(export)
+
+    def on_export_progress(self, done, total, path, error):
+        # Called on a saver thread
+        wx.CallAfter(self.on_file_exported, done, total, path, error)
+
+    def on_file_exported(self, done, total, path, error):
+        if error is not None:
+            wx.MessageBox(f"Failed to export {os.path.basename(path)}: {error}", "Error", wx.OK | wx.ICON_ERROR)
+        if done < total:
+            self.statusbar.SetStatusText(f"Exported {done} of {total} files...")
+            return
+        self.hide_progress()
+        self.statusbar.SetStatusText(f"Exported {total} files to {os.path.dirname(path)}")
 
     def on_about(self, event):
         info = wx.AboutDialogInfo()
@@ -397,6 +1169,17 @@ class UniversalImageViewer(wx.Frame):
         message = f"Supported Image Formats:\n{formats_list}\nTotal: {len(self.supported_formats)} formats"
         wx.MessageBox(message, "Supported Formats", wx.OK | wx.ICON_INFORMATION)
 
+    def on_thumbnail_stats(self, event):
+        stats = self.thumbnails.stats()
+        message = (f"Location: {stats['path']}\n"
+                   f"Thumbnails: {stats['entries']}\n"
+                   f"Size: {self.format_file_size(stats['bytes'])} of "
+                   f"{self.format_file_size(stats['max_bytes'])}\n"
+                   f"Hits: {stats['hits']}  Misses: {stats['misses']}\n"
+                   f"Generated: {stats['generated']}  Evicted: {stats['evicted']}  "
+                   f"Pending: {stats['pending']}")
+        wx.MessageBox(message, "Thumbnail Cache", wx.OK | wx.ICON_INFORMATION)
+
     def on_exit(self, event):
         self.Close()
 
@@ -0,0 +1,51 @@
+"""
+Atomic file replacement: a file is written under a temporary name in the
+same folder and renamed over its target only once it is complete, so the
+target is never left half written, and may even be the file being read.
+"""
+import contextlib
+import os
+import secrets
+
+
+def create_temp_file(path):
+    """
+    Create an empty temporary file next to path and return its name. It is
+    created with mode 0o666 like any plain write, so the umask applies as
+    usual, without reading the umask (which can only be done by changing it
+    for the whole process).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = '.' + os.path.basename(path) + '.'
+    while True:
+        temp_path = os.path.join(directory, prefix + secrets.token_hex(4) + '.tmp')
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return temp_path
+
+
+@contextlib.contextmanager
+def replacing(path):
+    """
+    Context manager yielding a temporary path to write the new contents of
+    path to. When the block completes the file is flushed to disk, given
+    the permissions of the file it replaces, if any, and renamed over path;
+    if the block raises it is removed and path is left untouched.
+    """
+    temp_path = create_temp_file(path)
+    try:
+        yield temp_path
+        with open(temp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
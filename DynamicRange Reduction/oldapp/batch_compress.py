@@ -0,0 +1,132 @@
+"""
+Headless batch dynamic range compression.
+
+Usage (from this folder):
+    python -m batch_compress INPUT_DIR OUTPUT_DIR [--factor 0.7] [--workers N]
+                             [--stream] [--strip-mb 16]
+
+Every supported image in INPUT_DIR is compressed with compress_dynamic_range
+and written under the same name to OUTPUT_DIR. Files are spread over a process
+pool; each worker handles one image at a time and is recycled after a number
+of files, so memory per worker stays bounded. No wx.App frame is created.
+With --stream, PPM/PGM and uncompressed TIFF files are processed strip by
+strip from memory-mapped files (see streaming.py) instead of being decoded.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import wx
+
+import imageops
+import streaming
+
+# Recycle a worker after this many files so a leaking handler or a
+# fragmented heap cannot grow without bound over a long run.
+TASKS_PER_WORKER = 50
+
+
+def find_images(folder_path, supported_formats):
+    supported_files = []
+    for filename in sorted(os.listdir(folder_path)):
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext in supported_formats:
+            supported_files.append(os.path.join(folder_path, filename))
+    return supported_files
+
+
+def compress_file(input_path, output_path, factor, strip_bytes=None):
+    """
+    Compress one file. Runs in a worker process. If strip_bytes is given,
+    files streaming.py can handle are streamed in strips of that size.
+    Returns (input_path, input_bytes, error message or None).
+    """
+    supported_formats = imageops.get_supported_formats()
+    file_ext = os.path.splitext(input_path)[1].lower()
+    bitmap_type = supported_formats.get(file_ext, wx.BITMAP_TYPE_ANY)
+    input_bytes = os.path.getsize(input_path)
+    try:
+        if strip_bytes and file_ext in streaming.STREAMING_EXTENSIONS:
+            streaming.compress_file_streaming(input_path, output_path, factor, strip_bytes)
+            return input_path, input_bytes, None
+        image = wx.Image(input_path, bitmap_type)
+        if not image.IsOk():
+            return input_path, input_bytes, "failed to load image"
+        compressed_image = imageops.compress_dynamic_range(image, factor)
+        del image
+        if not compressed_image.SaveFile(output_path, bitmap_type):
+            return input_path, input_bytes, "failed to save image"
+    except Exception as e:
+        return input_path, input_bytes, str(e)
+    return input_path, input_bytes, None
+
+
+def run_batch(input_dir, output_dir, factor=0.7, workers=None, strip_bytes=None):
+    """
+    Compress every supported image in input_dir into output_dir.
+    Returns (files_done, failures, bytes_read, seconds). Raises ValueError
+    if output_dir is input_dir, which would overwrite the originals.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.samefile(input_dir, output_dir):
+        raise ValueError("The output folder must not be the input folder")
+    imageops.init_headless()
+    input_paths = find_images(input_dir, imageops.get_supported_formats())
+    output_paths = [os.path.join(output_dir, os.path.basename(p)) for p in input_paths]
+
+    files_done = 0
+    failures = []
+    bytes_read = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=imageops.init_headless,
+                             max_tasks_per_child=TASKS_PER_WORKER) as executor:
+        results = executor.map(compress_file, input_paths, output_paths,
+                               [factor] * len(input_paths), [strip_bytes] * len(input_paths))
+        for input_path, input_bytes, error in results:
+            bytes_read += input_bytes
+            if error is None:
+                files_done += 1
+            else:
+                failures.append((input_path, error))
+    return files_done, failures, bytes_read, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch_compress",
+        description="Compress the dynamic range of every image in a folder.")
+    parser.add_argument("input_dir", help="folder containing the source images")
+    parser.add_argument("output_dir", help="folder to write the compressed images to")
+    parser.add_argument("--factor", type=float, default=0.7,
+                        help="1.0 = no change, 0.0 = completely flat gray (default: 0.7)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream PPM/PGM and uncompressed TIFF files strip by strip")
+    parser.add_argument("--strip-mb", type=float, default=16,
+                        help="strip size in MB for --stream (default: 16)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a folder: {args.input_dir}")
+
+    try:
+        files_done, failures, bytes_read, seconds = run_batch(
+            args.input_dir, args.output_dir, args.factor, args.workers,
+            int(args.strip_mb * 1024 * 1024) if args.stream else None)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for input_path, error in failures:
+        print(f"Error: {input_path}: {error}", file=sys.stderr)
+    seconds = max(seconds, 1e-9)
+    print(f"Processed {files_done} files ({len(failures)} failed) in {seconds:.2f} s: "
+          f"{files_done / seconds:.1f} files/sec, "
+          f"{bytes_read / (1024 * 1024) / seconds:.1f} MB/sec")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Benchmarks for the pixel-processing and display hot paths.
+
+Usage (from this folder, no display needed):
+    python -m benchmark [--sizes 0.3 1 4 12 24 50 100] [--repeat 3]
+                        [--cases compress local reduce scale load frames] [--output results.json]
+
+Each (case, implementation, size) runs in its own subprocess on a synthetic
+image so that the peak RSS reported is that of the run alone. Results are
+printed as a table and written as JSON, so runs can be compared across commits.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import wx
+
+import deepimage
+import imageloader
+import imageops
+import parallel
+import pyramid
+
+DEFAULT_SIZES = [0.3, 1, 4, 12, 24, 50, 100]
+# The pure-Python implementations take minutes beyond this size
+DEFAULT_MAX_PYTHON_MP = 4
+# Window size used for the fit-to-window scaling case
+DISPLAY_SIZE = (1600, 1000)
+# The frames case splits the test image into this many animation frames
+ANIMATION_FRAMES = 300
+
+
+def synthetic_image(megapixels, seed=0):
+    """
+    Build a deterministic 4:3 RGB test image of about the given size:
+    a gradient with noise, so every channel has a realistic range.
+    """
+    width = max(1, int(round(math.sqrt(megapixels * 1e6 * 4 / 3))))
+    height = max(1, int(round(width * 3 / 4)))
+    image = wx.Image(width, height, clear=False)
+    if imageops.np is not None:
+        np = imageops.np
+        rng = np.random.default_rng(seed)
+        data = imageops.image_array(image)
+        gradient = (np.arange(width, dtype=np.int64) * 200 // max(1, width - 1)).astype(np.uint8)
+        data[...] = gradient[None, :, None]
+        data += rng.integers(0, 40, size=(1, width, 3), dtype=np.uint8)
+        data[::7] += 13
+    else:
+        row = random.Random(seed).randbytes(width * 3)
+        image.GetDataBuffer()[:] = row * height
+    return image
+
+
+def implementations(case):
+    """Implementation names available for a case in this environment."""
+    has_numpy = imageops.np is not None
+    if case == 'compress':
+        return ['python'] + (['numpy', 'numpy-threads', 'numpy-16bit'] if has_numpy else [])
+    if case == 'local':
+        return ['numpy', 'numpy-threads'] if has_numpy else []
+    if case == 'reduce':
+        return ['translate'] + (['numpy', 'numpy-inplace', 'numpy-threads'] if has_numpy else [])
+    if case == 'scale':
+        return ['wx-scale', 'pyramid', 'pyramid-cached']
+    if case == 'load':
+        return ['png', 'jpeg', 'bmp'] + (['jpeg-draft'] if imageloader.PILImage is not None else [])
+    if case == 'frames':
+        return ['one-thread', 'threads']
+    raise ValueError(f"Unknown case: {case}")
+
+
+def fit_size(image):
+    scale = min(DISPLAY_SIZE[0] / image.GetWidth(), DISPLAY_SIZE[1] / image.GetHeight())
+    return int(image.GetWidth() * scale), int(image.GetHeight() * scale)
+
+
+def prepare(case, impl, image, workdir):
+    """Return a zero-argument callable running one iteration of case/impl."""
+    if case == 'compress':
+        if impl == 'python':
+            return lambda: imageops.compress_dynamic_range_python(image, 0.7)
+        if impl == 'numpy-threads':
+            executor = parallel.BandExecutor()
+            return lambda: executor.compress_dynamic_range(image, 0.7)
+        if impl == 'numpy-16bit':
+            # The same image widened to 16 bits, for the cost of the deep path
+            deep = deepimage.DeepImage(imageops.image_array(image).astype(imageops.np.uint16) * 257)
+            return lambda: deepimage.compress_dynamic_range(deep, 0.7)
+        return lambda: imageops.compress_dynamic_range_numpy(image, 0.7)
+
+    if case == 'local':
+        if impl == 'numpy-threads':
+            executor = parallel.BandExecutor()
+            return lambda: executor.compress_local_range(image, 0.7, 8, 0.5, 99.5)
+        return lambda: imageops.compress_local_range(image, 0.7, 8, 0.5, 99.5)
+
+    if case == 'reduce':
+        if impl == 'translate':
+            imageops.np = None
+            return lambda: imageops.reduce_color_depth(image, 4)
+        if impl == 'numpy-inplace':
+            return lambda: imageops.reduce_color_depth(image, 4, inplace=True)
+        if impl == 'numpy-threads':
+            executor = parallel.BandExecutor()
+            return lambda: executor.reduce_color_depth(image, 4)
+        return lambda: imageops.reduce_color_depth(image, 4)
+
+    if case == 'scale':
+        width, height = fit_size(image)
+        if impl == 'wx-scale':
+            return lambda: image.Scale(width, height, wx.IMAGE_QUALITY_HIGH)
+        if impl == 'pyramid':
+            return lambda: pyramid.ImagePyramid(image).scaled(width, height)
+        image_pyramid = pyramid.ImagePyramid(image)
+        image_pyramid.scaled(width, height)
+        return lambda: image_pyramid.scaled(width, height)
+
+    if case == 'load':
+        formats = imageops.get_supported_formats()
+        file_format = impl.split('-')[0]
+        path = os.path.join(workdir, f"bench.{file_format}")
+        if not image.SaveFile(path, formats['.' + file_format]):
+            raise RuntimeError(f"Could not write {file_format} test file")
+        # jpeg-draft decodes at the reduced scale used for fit-to-window
+        draft_size = fit_size(image) if impl == 'jpeg-draft' else None
+        return lambda: imageloader.decode_image(path, formats, draft_size)
+
+    if case == 'frames':
+        # Bands of rows stand in for the frames of an animation of the same total size
+        frame_height = max(1, image.GetHeight() // ANIMATION_FRAMES)
+        frames = [image.GetSubImage(wx.Rect(0, y, image.GetWidth(), frame_height))
+                  for y in range(0, image.GetHeight() - frame_height + 1, frame_height)]
+        executor = parallel.BandExecutor(1 if impl == 'one-thread' else None)
+        return lambda: executor.compress_frames(frames, 0.7)
+
+    raise ValueError(f"Unknown case: {case}")
+
+
+def run_case(case, impl, megapixels, repeat):
+    """Run one benchmark in this process and return its result dict."""
+    imageops.init_headless()
+    image = synthetic_image(megapixels)
+    pixels = image.GetWidth() * image.GetHeight()
+    with tempfile.TemporaryDirectory() as workdir:
+        func = prepare(case, impl, image, workdir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    best = min(times)
+    # ru_maxrss is in KB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'case': case,
+        'impl': impl,
+        'megapixels': megapixels,
+        'width': image.GetWidth(),
+        'height': image.GetHeight(),
+        'seconds': best,
+        'mean_seconds': sum(times) / len(times),
+        'pixels_per_sec': pixels / best if best > 0 else None,
+        'peak_rss_mb': peak_rss_mb,
+    }
+
+
+def run_in_subprocess(case, impl, megapixels, repeat):
+    command = [sys.executable, '-m', 'benchmark', '--run-one', case, impl,
+               str(megapixels), '--repeat', str(repeat)]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        return {'case': case, 'impl': impl, 'megapixels': megapixels,
+                'error': completed.stderr.strip().splitlines()[-1:] or ['failed']}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit or None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'wx': wx.VERSION_STRING,
+        'numpy': imageops.np.__version__ if imageops.np is not None else None,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_result(result):
+    label = f"{result['case']:<9} {result['impl']:<15} {result['megapixels']:>6} MP"
+    if 'error' in result:
+        print(f"{label}  error: {result['error'][0]}")
+        return
+    print(f"{label}  {result['seconds'] * 1000:>10.1f} ms  "
+          f"{result['pixels_per_sec'] / 1e6:>9.1f} MP/s  {result['peak_rss_mb']:>8.0f} MB RSS")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Benchmark the image processing hot paths.")
+    parser.add_argument("--sizes", type=float, nargs='+', default=DEFAULT_SIZES,
+                        help="image sizes in megapixels")
+    parser.add_argument("--cases", nargs='+', default=['compress', 'local', 'reduce', 'scale', 'load', 'frames'],
+                        choices=['compress', 'local', 'reduce', 'scale', 'load', 'frames'])
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--max-python-mp", type=float, default=DEFAULT_MAX_PYTHON_MP,
+                        help="skip the pure-Python implementations above this size")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write")
+    parser.add_argument("--run-one", nargs=3, metavar=('CASE', 'IMPL', 'MP'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        case, impl, megapixels = args.run_one
+        print(json.dumps(run_case(case, impl, float(megapixels), args.repeat)))
+        return 0
+
+    results = []
+    for case in args.cases:
+        for impl in implementations(case):
+            for megapixels in args.sizes:
+                if impl == 'python' and megapixels > args.max_python_mp:
+                    continue
+                result = run_in_subprocess(case, impl, megapixels, args.repeat)
+                print_result(result)
+                results.append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
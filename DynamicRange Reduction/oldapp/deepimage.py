@@ -0,0 +1,240 @@
+"""
+High bit depth images: 16-bit integer and 32-bit float samples.
+
+wx.Image only holds 8 bits per channel, so 16-bit PNM/TIFF scans lose
+precision when wx decodes them. DeepImage keeps the samples in a NumPy
+array; range compression and quantization run on the full-precision
+samples, and to_wx_image converts to 8-bit only when the image is shown.
+Processing a 16-bit image costs about twice the memory and time of the
+8-bit path: the same per-channel lookup tables are used, with 65536
+entries instead of 256.
+"""
+try:
+    import wx
+except ImportError:
+    wx = None
+
+import streaming
+from imageops import np
+from pixelbuffer import PixelBuffer
+
+
+class DeepImage:
+    """
+    An image held as a NumPy array of shape (H, W, C), C being 1 (gray) or
+    3 (RGB): uint16 samples from 0 to maxval, or float32 samples from 0.0
+    to 1.0. Alpha, if any, is a separate (H, W) plane of the same type.
+    GetWidth, GetHeight, HasAlpha and SaveFile match wx.Image, so code that
+    only sizes or saves images takes either.
+    """
+
+    def __init__(self, pixels, maxval=None, alpha=None):
+        if maxval is None:
+            maxval = 1.0 if pixels.dtype.kind == 'f' else 65535
+        self.pixels = pixels
+        self.maxval = maxval
+        self.alpha = alpha
+
+    @property
+    def is_float(self):
+        return self.pixels.dtype.kind == 'f'
+
+    @property
+    def channels(self):
+        return self.pixels.shape[2]
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes + (self.alpha.nbytes if self.alpha is not None else 0)
+
+    def GetWidth(self):
+        return self.pixels.shape[1]
+
+    def GetHeight(self):
+        return self.pixels.shape[0]
+
+    def HasAlpha(self):
+        return self.alpha is not None
+
+    def with_pixels(self, pixels):
+        """A DeepImage of new pixels sharing this image's maxval and alpha plane."""
+        return DeepImage(pixels, self.maxval, self.alpha)
+
+    def subsampled(self, step):
+        """Every step-th pixel in both directions, as views of this image's arrays."""
+        alpha = self.alpha[::step, ::step] if self.alpha is not None else None
+        return DeepImage(self.pixels[::step, ::step], self.maxval, alpha)
+
+    def SaveFile(self, path, bitmap_type):
+        """
+        Save as 16-bit PNM when bitmap_type is wx.BITMAP_TYPE_PNM and the
+        samples are integers, otherwise as 8-bit through wx.Image.
+        """
+        if bitmap_type == wx.BITMAP_TYPE_PNM and not self.is_float:
+            return save_pnm(self, path)
+        return to_wx_image(self).SaveFile(path, bitmap_type)
+
+
+def load_deep_image(path):
+    """
+    Load a 16-bit or float PNM/TIFF file as a DeepImage. Returns None for
+    8-bit files, which wx decodes without loss. Raises ValueError for
+    layouts that cannot be read (e.g. compressed TIFF) and for TIFF files
+    that are not gray or RGB (e.g. CMYK or WhiteIsZero), so that
+    imageloader leaves them to wx.
+    """
+    raster = streaming.open_raster(path, deep=True)
+    if raster.dtype.itemsize == 1:
+        return None
+    native = raster.dtype.newbyteorder('=')
+    samples = np.empty((raster.height, raster.width, raster.channels), dtype=native)
+    for first_row, strip in raster.iter_strips():
+        samples[first_row:first_row + len(strip)] = strip
+    if raster.alpha_kind is not None:
+        return DeepImage(samples[..., :-1], raster.maxval, samples[..., -1])
+    if raster.channels not in (1, 3):
+        raise ValueError(f"Unsupported number of channels: {raster.channels}")
+    return DeepImage(samples, raster.maxval)
+
+
+def save_pnm(image, path):
+    """Write an integer DeepImage as a raw PGM/PPM with its maxval (alpha is dropped)."""
+    magic = 'P5' if image.channels == 1 else 'P6'
+    with open(path, 'wb') as f:
+        f.write(f"{magic}\n{image.GetWidth()} {image.GetHeight()}\n{image.maxval}\n".encode('ascii'))
+        f.write(image.pixels.astype('>u2' if image.maxval > 255 else 'u1').tobytes())
+    return True
+
+
+def output_bounds(factor, maxval):
+    """(new_min, new_range) of compress_dynamic_range for samples up to maxval."""
+    if isinstance(maxval, float):
+        new_min = (1 - factor) / 2
+        return new_min, maxval - 2 * new_min
+    new_min = int((1 - factor) * (maxval + 1) / 2)
+    return new_min, maxval - 2 * new_min
+
+
+class DeepStats:
+    """
+    Per-channel statistics of a DeepImage, with the percentile definition
+    of imageops.ChannelStats. Integer images are counted once into
+    (maxval + 1)-bin histograms; float images are kept and searched.
+    ignore_transparent leaves out pixels with alpha 0, as for
+    imageops.channel_histograms.
+    """
+
+    def __init__(self, image, ignore_transparent=False):
+        self.maxval = image.maxval
+        self.channels = image.channels
+        mask = image.alpha != 0 if ignore_transparent and image.alpha is not None else None
+        if mask is not None and not mask.any():
+            mask = None
+        channels = [image.pixels[..., c] if mask is None else image.pixels[..., c][mask]
+                    for c in range(self.channels)]
+        if image.is_float:
+            self._values = channels
+            self._cumulative = None
+        else:
+            self._cumulative = [np.cumsum(np.bincount(values.ravel(), minlength=image.maxval + 1))
+                                for values in channels]
+
+    def percentile(self, channel, percent):
+        """Smallest value v such that at least percent % of the samples are <= v."""
+        if self._cumulative is None:
+            values = self._values[channel]
+            if percent <= 0:
+                return float(values.min())
+            if percent >= 100:
+                return float(values.max())
+            return float(np.percentile(values, percent, method='inverted_cdf'))
+        cumulative = self._cumulative[channel]
+        if percent <= 0:
+            return int(np.searchsorted(cumulative, 0, side='right'))
+        return min(self.maxval, int(np.searchsorted(cumulative, percent / 100 * cumulative[-1], side='left')))
+
+    def percentile_range(self, low_percentile=0.0, high_percentile=100.0):
+        lows = [self.percentile(c, low_percentile) for c in range(self.channels)]
+        highs = [self.percentile(c, high_percentile) for c in range(self.channels)]
+        return lows, highs
+
+
+def range_table(lo, hi, new_min, new_range, maxval):
+    """imageops.range_lut (with clip_input) for integer samples up to maxval, as a NumPy array."""
+    if hi <= lo:
+        return np.full(maxval + 1, max(0, min(maxval, new_min)), dtype=np.uint16)
+    values = np.clip(np.arange(maxval + 1, dtype=np.int64), lo, hi)
+    return np.clip(new_min + (values - lo) * new_range // (hi - lo), 0, maxval).astype(np.uint16)
+
+
+def compress_dynamic_range(image, factor=0.7, low_percentile=None, high_percentile=None, stats=None,
+                           ignore_transparent=False):
+    """
+    imageops.compress_dynamic_range at full precision: same factor and
+    percentile semantics, with the output range scaled to maxval.
+    """
+    if factor >= 1.0:
+        return image
+    if stats is None and ignore_transparent and image.alpha is not None:
+        stats = DeepStats(image, ignore_transparent=True)
+    pixels = image.pixels
+    if low_percentile is None and high_percentile is None and stats is None:
+        lows = [pixels[..., c].min() for c in range(image.channels)]
+        highs = [pixels[..., c].max() for c in range(image.channels)]
+    else:
+        if stats is None:
+            stats = DeepStats(image)
+        lows, highs = stats.percentile_range(
+            0.0 if low_percentile is None else low_percentile,
+            100.0 if high_percentile is None else high_percentile)
+    new_min, new_range = output_bounds(factor, image.maxval)
+    out = np.empty_like(pixels)
+    for c, (lo, hi) in enumerate(zip(lows, highs)):
+        if image.is_float:
+            target = out[..., c]
+            np.clip(pixels[..., c], lo, hi, out=target)
+            target -= lo
+            target *= new_range / (hi - lo) if hi > lo else 0.0
+            target += new_min
+        else:
+            table = range_table(int(lo), int(hi), new_min, new_range, image.maxval)
+            np.take(table, pixels[..., c], out=out[..., c], mode='clip')
+    return image.with_pixels(out)
+
+
+def reduce_color_depth(image, bits=4):
+    """imageops.reduce_color_depth on the full-precision samples: 2**bits levels per channel."""
+    if bits < 1 or bits > 16:
+        raise ValueError("Bits must be between 1 and 16")
+    if image.is_float:
+        levels = 2 ** bits
+        out = np.floor(image.pixels * levels)
+        np.clip(out, 0, levels - 1, out=out)
+        out /= levels
+        return image.with_pixels(out.astype(np.float32))
+    step = max(1, (image.maxval + 1) // 2 ** bits)
+    table = (np.arange(image.maxval + 1) // step * step).astype(np.uint16)
+    return image.with_pixels(np.take(table, image.pixels, mode='clip'))
+
+
+def to_8bit(samples, maxval, out):
+    """Write samples scaled from [0, maxval] to [0, 255], rounded, into the uint8 array out."""
+    if isinstance(maxval, float):
+        scaled = samples * (255 / maxval)
+        scaled += 0.5
+        np.clip(scaled, 0, 255, out=scaled)
+        out[...] = scaled
+    else:
+        table = ((np.arange(maxval + 1) * 255 + maxval // 2) // maxval).astype(np.uint8)
+        np.take(table, samples, out=out, mode='clip')
+
+
+def to_wx_image(image):
+    """Convert to an 8-bit wx.Image for display; gray is spread over R, G and B."""
+    buffer = PixelBuffer.new(image.GetWidth(), image.GetHeight(), alpha=image.alpha is not None)
+    dst = buffer.array()
+    for c in range(3):
+        to_8bit(image.pixels[..., min(c, image.channels - 1)], image.maxval, dst[..., c])
+    if image.alpha is not None:
+        to_8bit(image.alpha, image.maxval, buffer.alpha_array())
+    return buffer.to_image()
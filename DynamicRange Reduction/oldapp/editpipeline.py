@@ -0,0 +1,189 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import imagecache
+
+# name is a key of EditPipeline.operations; params is a sorted tuple of
+# (keyword, value) pairs so that steps can be hashed and compared.
+EditStep = namedtuple('EditStep', ['name', 'params'])
+
+
+def make_step(name, **params):
+    return EditStep(name, tuple(sorted(params.items())))
+
+
+class EditPipeline:
+    """
+    Non-destructive edit history: a source image followed by a list of
+    steps, each an operation from operations applied with its parameters.
+
+    The output of every stage is memoized under a key chaining the keys of
+    all the stages before it, so undo, redo and changing the parameters of
+    one step only recompute the steps after it. Cached outputs are capped
+    at max_cache_mb in total and evicted least recently used first.
+
+    If fuse is given, a run of two or more uncached steps whose names are
+    all in fusable is computed by a single fuse(image, steps) call instead
+    of step by step; only the output of the last step of the run is cached.
+    """
+
+    def __init__(self, operations, max_cache_mb=256, fuse=None, fusable=()):
+        """operations maps step names to functions f(image, **params) -> image."""
+        self.operations = operations
+        self.fuse = fuse
+        self.fusable = set(fusable)
+        self.max_cache_bytes = int(max_cache_mb * 1024 * 1024)
+        self.cache_bytes = 0
+        self.source = None
+        self.steps = ()
+        self.undo_stack = []
+        self.redo_stack = []
+        self._source_id = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def set_source(self, image):
+        """Start a new history on image, dropping the old one and its cache."""
+        with self._lock:
+            self.source = image
+            self._source_id += 1
+            self.steps = ()
+            self.undo_stack = []
+            self.redo_stack = []
+            self._cache.clear()
+            self.cache_bytes = 0
+
+    def replace_source(self, image, steps=None, result=None):
+        """
+        Swap in another version of the same source, e.g. a full resolution
+        decode of a reduced one, keeping the steps and the undo history.
+        result, if given, is the output of steps on image computed
+        elsewhere (see result_for), and is cached.
+        """
+        with self._lock:
+            self.source = image
+            self._source_id += 1
+            self._cache.clear()
+            self.cache_bytes = 0
+            source_id = self._source_id
+        if result is not None and steps:
+            self._cache_put(source_id, self._keys(source_id, steps)[-1], result)
+
+    def apply(self, name, **params):
+        """Append a step."""
+        self._change(self.steps + (make_step(name, **params),))
+
+    def set_params(self, index, **params):
+        """Change some parameters of step index; later steps are recomputed."""
+        step = self.steps[index]
+        merged = dict(step.params)
+        merged.update(params)
+        steps = list(self.steps)
+        steps[index] = make_step(step.name, **merged)
+        self._change(tuple(steps))
+
+    def _change(self, steps):
+        self.undo_stack.append(self.steps)
+        self.redo_stack = []
+        self.steps = steps
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return False
+        self.redo_stack.append(self.steps)
+        self.steps = self.undo_stack.pop()
+        return True
+
+    def redo(self):
+        if not self.redo_stack:
+            return False
+        self.undo_stack.append(self.steps)
+        self.steps = self.redo_stack.pop()
+        return True
+
+    def result(self, steps=None):
+        """
+        Return the image produced by steps (the current steps by default),
+        starting from the latest stage that is still cached.
+
+        The lock is only held to look up and store cache entries, not while
+        the operations run, so a render on a worker thread does not block
+        the GUI thread's own calls.
+        """
+        if steps is None:
+            steps = self.steps
+        with self._lock:
+            source_id = self._source_id
+            keys = self._keys(source_id, steps)
+            image = self.source
+            start = 0
+            for i in range(len(keys) - 1, -1, -1):
+                cached = self._cache.get(keys[i])
+                if cached is not None:
+                    self._cache.move_to_end(keys[i])
+                    image = cached
+                    start = i + 1
+                    break
+        return self._run(image, steps, start, source_id, keys)
+
+    def result_for(self, source, steps=None):
+        """
+        Return the image produced by steps (the current steps by default)
+        from another version of the source, e.g. a full resolution decode
+        of a draft, without using or filling the cache. Safe to call from a
+        worker thread while the pipeline is in use.
+        """
+        if steps is None:
+            steps = self.steps
+        return self._run(source, steps, 0)
+
+    def _run(self, image, steps, start, source_id=None, keys=None):
+        """Apply steps[start:] to image, caching each stage under keys if given."""
+        remaining = steps[start:]
+        if (self.fuse is not None and len(remaining) > 1
+                and all(step.name in self.fusable for step in remaining)):
+            image = self.fuse(image, remaining)
+            if keys is not None:
+                self._cache_put(source_id, keys[-1], image)
+            return image
+
+        for i in range(start, len(steps)):
+            step = steps[i]
+            image = self.operations[step.name](image, **dict(step.params))
+            if keys is not None:
+                self._cache_put(source_id, keys[i], image)
+        return image
+
+    @staticmethod
+    def _keys(source_id, steps):
+        """Cache keys of the output of each of steps, chaining the keys before it."""
+        keys = []
+        key = ('source', source_id)
+        for step in steps:
+            key = (key, step)
+            keys.append(key)
+        return keys
+
+    def _cache_put(self, source_id, key, image):
+        """Cache image under key, unless the source changed since source_id was read."""
+        nbytes = imagecache.image_nbytes(image)
+        if nbytes > self.max_cache_bytes:
+            return
+        with self._lock:
+            if source_id != self._source_id:
+                return
+            # Another thread may have computed the same stage meanwhile
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self.cache_bytes -= imagecache.image_nbytes(previous)
+            self._cache[key] = image
+            self.cache_bytes += nbytes
+            while self.cache_bytes > self.max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self.cache_bytes -= imagecache.image_nbytes(evicted)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+DEFAULT_BATCH_SIZE = 256
+# Longest time a found path waits in a batch before it is yielded
+DEFAULT_BATCH_SECONDS = 0.1
+
+
+def scan_images(folder, supported_formats, recursive=False,
+                batch_size=DEFAULT_BATCH_SIZE, batch_seconds=DEFAULT_BATCH_SECONDS):
+    """
+    Yield lists of paths of the images in folder (and its subfolders if
+    recursive), whose extension is a key of supported_formats.
+
+    os.scandir gives the entry types with the names, so files are filtered
+    without a stat call per entry. A batch is yielded once it holds
+    batch_size paths or batch_seconds have passed since the last one, so
+    the first images arrive quickly even on slow network mounts. Paths are
+    sorted within a batch; subfolders that cannot be read are skipped, and
+    symlinked folders are not followed. Raises OSError if folder itself
+    cannot be read.
+    """
+    pending = [folder]
+    batch = []
+    last_yield = time.monotonic()
+    while pending:
+        directory = pending.pop()
+        subdirectories = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    dot = name.rfind('.')
+                    try:
+                        if recursive and entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(entry.path)
+                            continue
+                        if dot <= 0 or name[dot:].lower() not in supported_formats or not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    batch.append(entry.path)
+                    if len(batch) >= batch_size or time.monotonic() - last_yield >= batch_seconds:
+                        batch.sort()
+                        yield batch
+                        batch = []
+                        last_yield = time.monotonic()
+        except OSError:
+            if directory is folder:
+                raise
+            continue
+        # Visit subfolders in name order
+        subdirectories.sort(reverse=True)
+        pending.extend(subdirectories)
+    if batch:
+        batch.sort()
+        yield batch
+
+
+class FolderScanner:
+    """
+    Runs scan_images on a background thread, one scan at a time.
+
+    on_batch(generation, paths) is called on the scan thread for every
+    batch and on_done(generation, count, error) once the scan ends. A new
+    scan or cancel() stops the previous scan at its next batch.
+    """
+
+    def __init__(self, supported_formats, on_batch, on_done):
+        self.supported_formats = supported_formats
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def scan(self, folder, recursive=False):
+        """Start scanning folder, superseding any running scan. Returns its generation."""
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+        thread = threading.Thread(target=self._run, args=(folder, recursive, generation),
+                                  name="folder-scan", daemon=True)
+        thread.start()
+        return generation
+
+    def cancel(self):
+        with self._lock:
+            self.generation += 1
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _run(self, folder, recursive, generation):
+        count = 0
+        error = None
+        try:
+            for batch in scan_images(folder, self.supported_formats, recursive):
+                if not self.is_current(generation):
+                    return
+                count += len(batch)
+                self.on_batch(generation, batch)
+        except Exception as e:
+            error = str(e)
+        if self.is_current(generation):
+            self.on_done(generation, count, error)
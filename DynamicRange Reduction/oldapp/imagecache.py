@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+
+import imageloader
+
+
+def image_nbytes(image):
+    """Approximate memory held by a decoded wx.Image (RGB plus optional alpha) or DeepImage."""
+    nbytes = getattr(image, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    pixels = image.GetWidth() * image.GetHeight()
+    return pixels * (4 if image.HasAlpha() else 3)
+
+
+class ImageCache:
+    """
+    LRU cache of decoded wx.Image objects keyed by path, capped at a memory
+    budget in MB. Neighbouring files can be decoded ahead of time on a
+    background thread with prefetch(); deep is passed on to
+    imageloader.decode_image.
+    """
+
+    def __init__(self, supported_formats, budget_mb=512, deep=False):
+        self.supported_formats = supported_formats
+        self.deep = deep
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.total_bytes = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefetch_paths = []
+        self._prefetch_condition = threading.Condition()
+        self._prefetch_thread = threading.Thread(target=self._run_prefetch, name="image-prefetch", daemon=True)
+        self._prefetch_thread.start()
+
+    @property
+    def budget_mb(self):
+        return self.budget_bytes / (1024 * 1024)
+
+    def set_budget(self, budget_mb):
+        with self._lock:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            self._evict()
+
+    def get(self, path):
+        """Return the cached image for path (marking it most recently used), or None."""
+        with self._lock:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+            return image
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._images
+
+    def put(self, path, image):
+        nbytes = image_nbytes(image)
+        with self._lock:
+            if path in self._images:
+                self.total_bytes -= image_nbytes(self._images.pop(path))
+            if nbytes > self.budget_bytes:
+                return
+            self._images[path] = image
+            self.total_bytes += nbytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.total_bytes = 0
+
+    def _evict(self):
+        while self.total_bytes > self.budget_bytes and self._images:
+            _, image = self._images.popitem(last=False)
+            self.total_bytes -= image_nbytes(image)
+
+    def prefetch(self, paths):
+        """
+        Decode paths in the background, in order, skipping any already cached.
+        Replaces whatever an earlier prefetch() call had not reached yet.
+        """
+        with self._prefetch_condition:
+            self._prefetch_paths = list(paths)
+            self._prefetch_condition.notify()
+
+    def _run_prefetch(self):
+        while True:
+            with self._prefetch_condition:
+                while not self._prefetch_paths:
+                    self._prefetch_condition.wait()
+                path = self._prefetch_paths.pop(0)
+            if path in self:
+                continue
+            try:
+                image = imageloader.decode_image(path, self.supported_formats, deep=self.deep)
+            except Exception:
+                image = None
+            if image is not None:
+                self.put(path, image)
@@ -0,0 +1,106 @@
+import os
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+import deepimage
+import streaming
+import workers
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.jfif')
+
+
+def can_decode_draft(path):
+    """True if path can be decoded at reduced scale (a JPEG, with Pillow installed)."""
+    return PILImage is not None and os.path.splitext(path)[1].lower() in JPEG_EXTENSIONS
+
+
+def decode_jpeg_draft(path, min_size):
+    """
+    Decode a JPEG at 1/2, 1/4 or 1/8 scale with the DCT scaling of libjpeg,
+    through Pillow's draft mode: the smallest scale that is still at least
+    min_size (width, height) is used, and the skipped detail is never
+    decoded. Returns None if no reduced scale fits min_size.
+    """
+    with PILImage.open(path) as pil_image:
+        if pil_image.format != 'JPEG':
+            return None
+        full_size = pil_image.size
+        pil_image.draft('RGB', (max(1, int(min_size[0])), max(1, int(min_size[1]))))
+        if pil_image.size == full_size:
+            return None
+        rgb = pil_image.convert('RGB')
+        return wx.Image(rgb.width, rgb.height, rgb.tobytes())
+
+
+def decode_image(path, supported_formats, draft_size=None, deep=False):
+    """
+    Decode an image file into a wx.Image, trying the type matching the
+    extension first and wx.BITMAP_TYPE_ANY second. Returns None on failure.
+    With draft_size, JPEG files are decoded at the smallest reduced scale
+    still covering draft_size when possible (see decode_jpeg_draft).
+    With deep, 16-bit and float PNM/TIFF files are returned as a
+    deepimage.DeepImage instead of being truncated to 8 bits.
+    Safe to call from a worker thread.
+    """
+    if (deep and deepimage.np is not None
+            and os.path.splitext(path)[1].lower() in streaming.STREAMING_EXTENSIONS):
+        try:
+            image = deepimage.load_deep_image(path)
+        except (OSError, ValueError, KeyError):
+            image = None
+        if image is not None:
+            return image
+    if draft_size is not None and can_decode_draft(path):
+        try:
+            image = decode_jpeg_draft(path, draft_size)
+        except Exception:
+            image = None
+        if image is not None:
+            return image
+    file_ext = os.path.splitext(path)[1].lower()
+    if file_ext in supported_formats:
+        bitmap_type = supported_formats[file_ext]
+        image = wx.Image(path, bitmap_type)
+    else:
+        image = wx.Image(path, wx.BITMAP_TYPE_ANY)
+    if not image.IsOk():
+        image = wx.Image(path, wx.BITMAP_TYPE_ANY)
+        if not image.IsOk():
+            return None
+    return image
+
+
+class BackgroundDecoder(workers.LatestOnlyWorker):
+    """
+    Decodes images on a single worker thread. A new request supersedes
+    any older one, so rapid open/next actions never pile up decodes.
+    """
+
+    def __init__(self, supported_formats, callback, deep=False):
+        """
+        callback(path, draft_size, generation, image, error) is called on
+        the worker thread for the newest request only, with the draft_size
+        the request was made with. image is None if decoding failed; error
+        holds the exception message if decoding raised.
+        deep: see decode_image.
+        """
+        self.supported_formats = supported_formats
+        self.deep = deep
+        self.decoded_callback = callback
+        super(BackgroundDecoder, self).__init__(self.decode, self.on_decoded, name="image-decoder")
+
+    def decode(self, path, draft_size=None):
+        return decode_image(path, self.supported_formats, draft_size, self.deep)
+
+    def on_decoded(self, args, generation, image, error):
+        path = args[0]
+        draft_size = args[1] if len(args) > 1 else None
+        self.decoded_callback(path, draft_size, generation, image, error)
@@ -0,0 +1,602 @@
+import bisect
+import functools
+import itertools
+
+# Only needed for wx.Image files and buffers; streaming and the batch
+# tools use the lookup table functions without it
+try:
+    import wx
+except ImportError:
+    wx = None
+
+import pixelbuffer
+from pixelbuffer import PixelBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_console_app = None
+
+
+def get_supported_formats(verbose=False):
+    """Get supported formats with safe constant handling"""
+    formats = {
+        # Bitmap formats
+        '.bmp': wx.BITMAP_TYPE_BMP,
+        '.bitmap': wx.BITMAP_TYPE_BMP,
+        # JPEG formats
+        '.jpg': wx.BITMAP_TYPE_JPEG,
+        '.jpeg': wx.BITMAP_TYPE_JPEG,
+        '.jpe': wx.BITMAP_TYPE_JPEG,
+        '.jfif': wx.BITMAP_TYPE_JPEG,
+        # PNG format
+        '.png': wx.BITMAP_TYPE_PNG,
+        # GIF format
+        '.gif': wx.BITMAP_TYPE_GIF,
+        # TIFF formats
+        '.tif': wx.BITMAP_TYPE_TIF,
+        '.tiff': wx.BITMAP_TYPE_TIF,
+        # PCX format
+        '.pcx': wx.BITMAP_TYPE_PCX,
+        # ICO format
+        '.ico': wx.BITMAP_TYPE_ICO,
+        '.icon': wx.BITMAP_TYPE_ICO,
+        # CUR format (cursor)
+        '.cur': wx.BITMAP_TYPE_CUR,
+        # ANI format (animated cursor)
+        '.ani': wx.BITMAP_TYPE_ANI,
+        # PNM formats
+        '.pnm': wx.BITMAP_TYPE_PNM,
+        '.pbm': wx.BITMAP_TYPE_PNM,
+        '.pgm': wx.BITMAP_TYPE_PNM,
+        '.ppm': wx.BITMAP_TYPE_PNM,
+        # XPM format
+        '.xpm': wx.BITMAP_TYPE_XPM,
+    }
+    # Add conditional formats that might not be available in all wxPython versions
+    conditional_formats = {
+        'BITMAP_TYPE_WEBP': ('.webp', 'WEBP format'),
+        'BITMAP_TYPE_ICNS': ('.icns', 'Apple Icon format'),
+        'BITMAP_TYPE_TGA': ('.tga', 'Targa format'),
+    }
+    for const_name, (extension, description) in conditional_formats.items():
+        if hasattr(wx, const_name):
+            formats[extension] = getattr(wx, const_name)
+            if verbose:
+                print(f"Added support for {description} ({extension})")
+        elif verbose:
+            print(f"Note: {description} ({extension}) not available in this wxPython version")
+    return formats
+
+
+def init_headless():
+    """
+    Make wx.Image file loading and saving usable without a display.
+    Creates a console-only wx.AppConsole (no frame, no GUI toolkit) if no
+    app exists yet and registers the image handlers it does not add itself.
+    """
+    global _console_app
+    if wx.GetApp() is None:
+        _console_app = wx.AppConsole()
+    handler_names = [
+        'BMPHandler', 'PNGHandler', 'JPEGHandler', 'GIFHandler', 'TIFFHandler',
+        'PCXHandler', 'PNMHandler', 'XPMHandler', 'ICOHandler', 'CURHandler',
+        'ANIHandler', 'TGAHandler', 'IFFHandler',
+    ]
+    for name in handler_names:
+        if not hasattr(wx, name):
+            continue
+        handler = getattr(wx, name)()
+        if wx.Image.FindHandler(handler.GetName()) is None:
+            wx.Image.AddHandler(handler)
+
+
+def image_array(image):
+    """
+    Return an (H, W, 3) uint8 NumPy view onto the RGB data of a wx.Image
+    or PixelBuffer. No copy is made: writing to the array writes to the image.
+    """
+    return pixelbuffer.as_pixel_buffer(image).array()
+
+
+def channel_min_max(pixels, channels=3):
+    """
+    Per-channel (mins, maxs) of the first channels of an (..., C) array.
+    Reducing each strided channel separately is several times faster than
+    reducing an (N, C) array along axis 0.
+    """
+    mins = [int(pixels[..., c].min()) for c in range(channels)]
+    maxs = [int(pixels[..., c].max()) for c in range(channels)]
+    return mins, maxs
+
+
+def masked_histograms(pixels, mask=None, channels=3):
+    """
+    256-bin histograms (NumPy arrays) of the first channels of an (..., C)
+    uint8 array, counting only the pixels where the boolean mask is True.
+    """
+    if mask is None:
+        return [np.bincount(pixels[..., c].ravel(), minlength=256) for c in range(channels)]
+    return [np.bincount(pixels[..., c][mask], minlength=256) for c in range(channels)]
+
+
+def range_output_bounds(factor):
+    """Return (new_min, new_range) of the compressed output range for a factor."""
+    new_min = int((1 - factor) * 128)         # e.g., 38 for factor=0.7
+    new_max = 255 - new_min                   # e.g., 217
+    return new_min, new_max - new_min
+
+
+def range_lut(lo, hi, new_min, new_range, clip_input=False):
+    """
+    Build a 256-entry lookup table (as bytes) mapping [lo, hi] onto
+    [new_min, new_min + new_range] with the same integer division
+    (and clamping) as the per-pixel loop.
+    clip_input: map values outside [lo, hi] like lo and hi, as needed
+    when lo and hi are percentiles rather than the true min and max.
+    """
+    if hi <= lo:
+        return bytes([max(0, min(255, new_min))]) * 256
+    table = bytearray(256)
+    for v in range(256):
+        if clip_input:
+            v_in = min(max(v, lo), hi)
+        else:
+            v_in = v
+        table[v] = max(0, min(255, new_min + (v_in - lo) * new_range // (hi - lo)))
+    return bytes(table)
+
+
+def lut_array(table):
+    """View a 256-entry bytes lookup table as a NumPy uint8 array."""
+    return np.frombuffer(table, dtype=np.uint8)
+
+
+IDENTITY_TABLE = bytes(range(256))
+
+
+def apply_channel_luts(image, tables, inplace=False):
+    """
+    Return an image (wx.Image or PixelBuffer, like image) with the 256-entry
+    lookup table tables[c] applied to RGB channel c, in a single pass over
+    the pixels. Alpha is carried over. inplace: write into image's own
+    buffer and return image.
+    """
+    src = pixelbuffer.as_pixel_buffer(image)
+    dst = src if inplace else PixelBuffer.new(src.width, src.height)
+    if np is not None:
+        src_pixels = src.array()
+        dst_pixels = dst.array()
+        for c, table in enumerate(tables):
+            np.take(lut_array(table), src_pixels[..., c], out=dst_pixels[..., c])
+    else:
+        # One channel at a time, so the only temporary is a third of the image
+        for c, table in enumerate(tables):
+            dst.channel(c)[:] = src.channel(c).tobytes().translate(table)
+    if not inplace:
+        dst.share_alpha_from(src)
+    return pixelbuffer.same_kind(image, dst)
+
+
+class ChannelStats:
+    """
+    Per-channel 256-bin histograms of an RGB image. Built in one pass over
+    the pixels; the min/max and any percentiles are then read off the
+    histograms, so an image only has to be scanned once however many
+    factors or percentiles are tried on it.
+    """
+
+    def __init__(self, histograms):
+        self.histograms = [list(h) for h in histograms]
+        self.pixel_count = sum(self.histograms[0])
+        self._cumulative = [list(itertools.accumulate(h)) for h in self.histograms]
+
+    @classmethod
+    def from_image(cls, image, ignore_transparent=False):
+        return cls(channel_histograms(image, ignore_transparent))
+
+    def percentile(self, channel, percent):
+        """Smallest value v such that at least percent % of the pixels are <= v."""
+        cumulative = self._cumulative[channel]
+        if percent <= 0:
+            # Lowest value actually present
+            return bisect.bisect_right(cumulative, 0)
+        target = percent / 100 * self.pixel_count
+        return min(255, bisect.bisect_left(cumulative, target))
+
+    def percentile_range(self, low_percentile=0.0, high_percentile=100.0):
+        """Per-channel (lows, highs) at the given percentiles; 0 and 100 give min and max."""
+        lows = [self.percentile(c, low_percentile) for c in range(len(self.histograms))]
+        highs = [self.percentile(c, high_percentile) for c in range(len(self.histograms))]
+        return lows, highs
+
+    def remapped(self, tables):
+        """
+        Return the stats of the image after tables[c] is applied to channel c,
+        without touching the pixels: each bin moves to its mapped value.
+        """
+        histograms = []
+        for histogram, table in zip(self.histograms, tables):
+            remapped = [0] * 256
+            for value, count in enumerate(histogram):
+                remapped[table[value]] += count
+            histograms.append(remapped)
+        return ChannelStats(histograms)
+
+
+def channel_histograms(image, ignore_transparent=False):
+    """
+    Return one 256-bin histogram per RGB channel of a wx.Image or PixelBuffer.
+    ignore_transparent: leave out fully transparent pixels (alpha 0), whose
+    colour is invisible, unless no pixel is visible at all.
+    """
+    src = pixelbuffer.as_pixel_buffer(image)
+    ignore_transparent = ignore_transparent and src.alpha is not None
+    if np is not None:
+        mask = src.opaque_mask() if ignore_transparent else None
+        if mask is not None and not mask.any():
+            mask = None
+        return [h.tolist() for h in masked_histograms(src.array(), mask)]
+    ignore_transparent = ignore_transparent and any(src.alpha)
+    histograms = []
+    for c in range(3):
+        channel = src.channel(c).tobytes()
+        if ignore_transparent:
+            # Keeps the bytes whose alpha is non-zero
+            channel = bytes(itertools.compress(channel, src.alpha))
+        histograms.append([channel.count(v) for v in range(256)])
+    return histograms
+
+
+def compress_dynamic_range(image, factor=0.7, low_percentile=None, high_percentile=None, stats=None,
+                           ignore_transparent=False):
+    """
+    Compress the dynamic range to create a hazy/washed-out look.
+    factor: 1.0 = no change, 0.0 = completely flat gray.
+    low_percentile/high_percentile: map these per-channel percentiles
+    (e.g. 0.5 and 99.5) instead of the min and max, so a few hot or dead
+    pixels do not decide the mapping. Values outside them are clipped.
+    stats: a ChannelStats for image, reused instead of rescanning the pixels.
+    ignore_transparent: take the range from the visible pixels only
+    (see channel_histograms).
+    Uses the NumPy engine when NumPy is available, the pure-Python loop otherwise.
+    """
+    if stats is None and ignore_transparent and image.HasAlpha() and factor < 1.0:
+        stats = ChannelStats.from_image(image, ignore_transparent=True)
+    if low_percentile is not None or high_percentile is not None or stats is not None:
+        return compress_dynamic_range_percentile(
+            image, factor,
+            0.0 if low_percentile is None else low_percentile,
+            100.0 if high_percentile is None else high_percentile,
+            stats)
+    if np is not None:
+        return compress_dynamic_range_numpy(image, factor)
+    return compress_dynamic_range_python(image, factor)
+
+
+def compress_dynamic_range_percentile(image, factor=0.7, low_percentile=0.0,
+                                      high_percentile=100.0, stats=None):
+    """
+    compress_dynamic_range driven by per-channel histograms: the mapping
+    runs from the low to the high percentile of each channel.
+    """
+    if factor >= 1.0:
+        return image
+    if stats is None:
+        stats = ChannelStats.from_image(image)
+    return apply_channel_luts(image, compress_tables(stats, factor, low_percentile, high_percentile))
+
+
+def compress_tables(stats, factor=0.7, low_percentile=None, high_percentile=None):
+    """Per-channel compress_dynamic_range lookup tables for an image with these stats."""
+    if factor >= 1.0:
+        return [IDENTITY_TABLE] * len(stats.histograms)
+    lows, highs = stats.percentile_range(
+        0.0 if low_percentile is None else low_percentile,
+        100.0 if high_percentile is None else high_percentile)
+    new_min, new_range = range_output_bounds(factor)
+    return [range_lut(lo, hi, new_min, new_range, clip_input=True)
+            for lo, hi in zip(lows, highs)]
+
+
+def compress_dynamic_range_numpy(image, factor=0.7):
+    """
+    Vectorized compress_dynamic_range: per-channel min/max, then one
+    256-entry lookup table per channel applied straight into the new image.
+    """
+    if factor >= 1.0:
+        return image
+
+    mins, maxs = channel_min_max(image_array(image))
+    new_min, new_range = range_output_bounds(factor)
+    tables = [range_lut(lo, hi, new_min, new_range) for lo, hi in zip(mins, maxs)]
+    return apply_channel_luts(image, tables)
+
+
+def compress_dynamic_range_python(image, factor=0.7):
+    """
+    Pure-Python compress_dynamic_range, used when NumPy is not installed:
+    the min and max of each channel are read from a strided view of the
+    pixel buffer, then applied as bytes.translate tables.
+
+    This takes the place of the original per-pixel loop, which built a
+    list of (r, g, b) tuples of about 100 bytes per pixel; PixelBuffer was
+    introduced to remove those. The tables hold the loop's own integer
+    division for every input value, so the bytes produced are the same.
+    """
+    if factor >= 1.0:
+        return image
+
+    src = pixelbuffer.as_pixel_buffer(image)
+    # Map to a reduced global range (same for all channels)
+    new_min, new_range = range_output_bounds(factor)
+    tables = []
+    for c in range(3):
+        channel = src.channel(c).tobytes()
+        tables.append(range_lut(min(channel), max(channel), new_min, new_range))
+    return apply_channel_luts(image, tables)
+
+
+# Tiles of the local range compression are never smaller than this many pixels
+MIN_LOCAL_TILE = 16
+# Width of the column strips LocalRangeMap.remap works in
+LOCAL_STRIP_COLUMNS = 256
+
+
+def tile_edges(length, tiles):
+    """Pixel boundaries of tiles equal parts of length, as an int array of tiles + 1 entries."""
+    return np.arange(tiles + 1) * length // tiles
+
+
+def tile_grid(height, width, tiles):
+    """(y_edges, x_edges) of a grid of up to tiles x tiles tiles of at least MIN_LOCAL_TILE pixels."""
+    tiles_y = max(1, min(tiles, height // MIN_LOCAL_TILE))
+    tiles_x = max(1, min(tiles, width // MIN_LOCAL_TILE))
+    return tile_edges(height, tiles_y), tile_edges(width, tiles_x)
+
+
+def tile_histograms(pixels, y_edges, x_edges, rows=None):
+    """
+    256-bin histograms of the tiles of an (H, W, 3) array, for the tile rows
+    in rows (all by default), as an array of shape (3, rows, tiles_x, 256).
+    Each tile row takes one bincount per channel: every pixel value is
+    offset by 256 times its tile column.
+    """
+    tiles_x = len(x_edges) - 1
+    if rows is None:
+        rows = range(len(y_edges) - 1)
+    column_offsets = np.repeat(np.arange(tiles_x, dtype=np.intp) * 256, np.diff(x_edges))
+    histograms = np.empty((3, len(rows), tiles_x, 256), dtype=np.int64)
+    for k, i in enumerate(rows):
+        band = pixels[y_edges[i]:y_edges[i + 1]]
+        for c in range(3):
+            histograms[c, k] = np.bincount((band[..., c] + column_offsets).ravel(),
+                                           minlength=tiles_x * 256).reshape(tiles_x, 256)
+    return histograms
+
+
+def tile_interpolation(length, edges):
+    """
+    For every pixel along one axis, the indices of the two nearest tile
+    centres and the weight of the second, for bilinear interpolation.
+    Pixels beyond the first or last centre use that tile alone.
+    """
+    centres = (edges[:-1] + edges[1:] - 1) / 2
+    positions = np.arange(length)
+    first = np.clip(np.searchsorted(centres, positions, side='right') - 1, 0, len(centres) - 1)
+    second = np.minimum(first + 1, len(centres) - 1)
+    gap = centres[second] - centres[first]
+    weight = np.where(gap > 0, (positions - centres[first]) / np.where(gap > 0, gap, 1), 0.0)
+    return first, second, np.clip(weight, 0.0, 1.0).astype(np.float32)
+
+
+class LocalRangeMap:
+    """
+    Tile-based (CLAHE-style) compress_dynamic_range of an (H, W, 3) array.
+
+    The image is split into a tiles x tiles grid and every tile gets its own
+    compress_dynamic_range table per channel, from the tile's percentiles.
+    The percentiles of all tiles are read at once from the cumulative sums
+    of the tile histograms. Each pixel is mapped through the tables of the
+    four nearest tile centres, bilinearly interpolated, so there are no
+    seams. Tiles whose range is already narrower than the output range are
+    not stretched, so noise in flat areas is not amplified. The cost is
+    O(pixels) whatever the tile size.
+    """
+
+    def __init__(self, pixels, factor=0.7, tiles=8, low_percentile=0.0, high_percentile=100.0,
+                 histograms=None):
+        """histograms: tile_histograms of pixels for this grid, if already computed."""
+        height, width = pixels.shape[:2]
+        self.pixels = pixels
+        self.y_edges, self.x_edges = tile_grid(height, width, tiles)
+        if histograms is None:
+            histograms = tile_histograms(pixels, self.y_edges, self.x_edges)
+        self.luts = self.tile_luts(histograms, factor, low_percentile, high_percentile)
+        self.rows = tile_interpolation(height, self.y_edges)
+        self.columns = tile_interpolation(width, self.x_edges)
+
+    @staticmethod
+    def tile_luts(histograms, factor, low_percentile, high_percentile):
+        """Per-tile tables as float32 of shape (3, tiles_y, tiles_x, 256), matching range_lut."""
+        cumulative = np.cumsum(histograms, axis=-1)
+        counts = cumulative[..., -1:]
+
+        # Same definition as ChannelStats.percentile, for all tiles at once
+        def percentile(percent):
+            if percent <= 0:
+                return (cumulative <= 0).sum(axis=-1)
+            return np.minimum(255, (cumulative < counts * (percent / 100)).sum(axis=-1))
+
+        lo = percentile(low_percentile)[..., None]
+        hi = percentile(high_percentile)[..., None]
+        new_min, new_range = range_output_bounds(factor)
+        narrow = hi - lo < new_range
+        widened_lo = np.clip((lo + hi - new_range) // 2, 0, 255 - new_range)
+        lo = np.where(narrow, widened_lo, lo)
+        hi = np.where(narrow, widened_lo + new_range, hi)
+        values = np.arange(256)
+        mapped = new_min + (np.clip(values, lo, hi) - lo) * new_range // np.maximum(hi - lo, 1)
+        mapped = np.where(hi > lo, mapped, new_min)
+        return np.clip(mapped, 0, 255).astype(np.float32)
+
+    def row_table(self, channel, tile_row):
+        """
+        The tables of one tile row blended across columns, as a flat
+        (W * 256,) table. 0.5 is added so that truncating rounds.
+        """
+        first, second, weight = self.columns
+        luts = self.luts[channel, tile_row]
+        table = luts[first] * (1 - weight)[:, None]
+        table += luts[second] * weight[:, None]
+        table += 0.5
+        return table.ravel()
+
+    def remap(self, dst, start=0, stop=None):
+        """Write the mapped rows start:stop of the source into the (H, W, 3) array dst."""
+        if stop is None:
+            stop = self.pixels.shape[0]
+        width = self.pixels.shape[1]
+        first, second, weight = self.rows
+        # Work in blocks of LOCAL_STRIP_COLUMNS columns, so the part of a
+        # blended table that a block looks up in stays in the CPU cache
+        strip = min(width, LOCAL_STRIP_COLUMNS)
+        offsets = np.arange(strip, dtype=np.intp) * 256
+        chunk_rows = max(1, (1 << 16) // strip)
+        tables = {}
+        row = start
+        while row < stop:
+            # Rows between two tile centres share their pair of blended tables
+            pair = (first[row], second[row])
+            end = row + 1
+            while end < stop and end - row < chunk_rows and (first[end], second[end]) == pair:
+                end += 1
+            tables = {key: tables[key] if key in tables else self.row_table(*key)
+                      for key in [(c, i) for c in range(3) for i in pair]}
+            row_weight = weight[row:end, None]
+            for x0 in range(0, width, strip):
+                x1 = min(width, x0 + strip)
+                for c in range(3):
+                    indices = self.pixels[row:end, x0:x1, c] + offsets[:x1 - x0]
+                    top = np.take(tables[c, pair[0]][x0 * 256:x1 * 256], indices)
+                    if pair[1] != pair[0]:
+                        bottom = np.take(tables[c, pair[1]][x0 * 256:x1 * 256], indices)
+                        bottom -= top
+                        bottom *= row_weight
+                        top += bottom
+                    dst[row:end, x0:x1, c] = top
+            row = end
+
+
+def compress_local_range(image, factor=0.7, tiles=8, low_percentile=0.0, high_percentile=100.0):
+    """
+    Local (tile-based) compress_dynamic_range: every region of the image is
+    compressed from its own range, see LocalRangeMap. factor has the same
+    meaning as for compress_dynamic_range. Needs NumPy.
+    """
+    if factor >= 1.0:
+        return image
+    if np is None:
+        raise RuntimeError("Local range compression needs NumPy")
+    src = pixelbuffer.as_pixel_buffer(image)
+    dst = PixelBuffer.new(src.width, src.height)
+    LocalRangeMap(src.array(), factor, tiles, low_percentile, high_percentile).remap(dst.array())
+    dst.share_alpha_from(src)
+    return pixelbuffer.same_kind(image, dst)
+
+
+@functools.lru_cache(maxsize=None)
+def quantize_table(bits):
+    """
+    Return the 256-entry quantization table for a bit depth as bytes,
+    suitable for bytes.translate. Tables are cached across calls.
+    """
+    if bits < 1 or bits > 8:
+        raise ValueError("Bits must be between 1 and 8")
+    levels = 2 ** bits
+    scale = 256 // levels
+    return bytes((v // scale) * scale for v in range(256))
+
+
+def reduce_color_depth(image, bits=4, inplace=False):
+    """
+    Reduce the color depth of the image by quantizing each RGB channel.
+    bits: number of bits per channel (e.g., 4 => 16 levels per channel)
+    inplace: if True, quantize the image's own pixel buffer and return the
+    same image without allocating a new one.
+    Returns an image (wx.Image or PixelBuffer, like image) with reduced color depth.
+    """
+    table = quantize_table(bits)
+    src = pixelbuffer.as_pixel_buffer(image)
+    dst = src if inplace else PixelBuffer.new(src.width, src.height)
+
+    if np is not None:
+        np.take(lut_array(table), np.frombuffer(src.data, dtype=np.uint8),
+                out=np.frombuffer(dst.data, dtype=np.uint8))
+    else:
+        dst.data[:] = src.data.tobytes().translate(table)
+
+    if not inplace:
+        dst.share_alpha_from(src)
+    return pixelbuffer.same_kind(image, dst)
+
+
+class PointPipeline:
+    """
+    A chain of per-channel point operations fused into one 256-entry
+    lookup table per channel, applied in a single pass over the pixels.
+
+    Operations are 'compress' (compress_dynamic_range) and 'quantize'
+    (reduce_color_depth). A compress step depends on the statistics of its
+    input; those are derived by pushing the source histograms through the
+    tables of the steps before it, so a whole chain costs at most one
+    histogram pass plus one remap pass, whatever its length, and gives the
+    same pixels as running the operations one after another.
+    """
+
+    OPERATIONS = ('compress', 'quantize')
+
+    def __init__(self, steps=()):
+        """steps: optional (name, params dict) pairs to start with."""
+        self.steps = []
+        for name, params in steps:
+            self.add(name, **params)
+
+    def add(self, name, **params):
+        if name not in self.OPERATIONS:
+            raise ValueError(f"Not a point operation: {name}")
+        self.steps.append((name, params))
+        return self
+
+    def compress(self, factor=0.7, low_percentile=None, high_percentile=None):
+        return self.add('compress', factor=factor, low_percentile=low_percentile,
+                        high_percentile=high_percentile)
+
+    def quantize(self, bits=4):
+        return self.add('quantize', bits=bits)
+
+    def needs_stats(self):
+        return any(name == 'compress' and params.get('factor', 0.7) < 1.0
+                   for name, params in self.steps)
+
+    def tables(self, stats=None):
+        """Return the fused per-channel tables; stats are needed if needs_stats()."""
+        tables = [IDENTITY_TABLE] * 3
+        for name, params in self.steps:
+            if name == 'quantize':
+                step_tables = [quantize_table(params.get('bits', 4))] * 3
+            elif params.get('factor', 0.7) >= 1.0:
+                # No change, and no stats needed
+                continue
+            else:
+                step_tables = compress_tables(stats.remapped(tables), **params)
+            tables = [table.translate(step_table) for table, step_table in zip(tables, step_tables)]
+        return tables
+
+    def apply(self, image, stats=None, inplace=False, ignore_transparent=False):
+        """Run the chain on image; stats are computed from image when needed and not given."""
+        if stats is None and self.needs_stats():
+            stats = ChannelStats.from_image(image, ignore_transparent)
+        return apply_channel_luts(image, self.tables(stats), inplace)
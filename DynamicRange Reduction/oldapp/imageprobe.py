@@ -0,0 +1,170 @@
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import streaming
+
+# bit_depth is per channel; channels counts the alpha channel if there is one
+ImageInfo = namedtuple('ImageInfo', ['format', 'width', 'height', 'bit_depth', 'channels',
+                                     'has_alpha', 'file_size'])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Colour type -> channels
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) do not
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def probe_png(f):
+    header = f.read(33)
+    if header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        raise ValueError("Not a PNG file")
+    width, height, bit_depth, colour_type = struct.unpack('>IIBB', header[16:26])
+    channels = PNG_CHANNELS[colour_type]
+    has_alpha = colour_type in (4, 6)
+    if not has_alpha:
+        # A tRNS chunk before the image data makes a key colour transparent
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', chunk)
+            if chunk_type == b'tRNS':
+                has_alpha = True
+                channels += 1
+                break
+            if chunk_type in (b'IDAT', b'IEND'):
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    if colour_type == 3:
+        bit_depth = 8
+    return 'PNG', width, height, bit_depth, channels, has_alpha
+
+
+def probe_jpeg(f):
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError("Not a JPEG file")
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("No frame header in JPEG file")
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            raise ValueError("No frame header in JPEG file")
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD9:
+            # Markers without a length field
+            continue
+        (length,) = struct.unpack('>H', f.read(2))
+        if code in JPEG_SOF_MARKERS:
+            precision, height, width, components = struct.unpack('>BHHB', f.read(6))
+            return 'JPEG', width, height, precision, components, False
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_bmp(f):
+    header = f.read(70)
+    if header[:2] != b'BM':
+        raise ValueError("Not a BMP file")
+    (header_size,) = struct.unpack('<I', header[14:18])
+    if header_size == 12:
+        width, height, _, bits = struct.unpack('<HHHH', header[18:26])
+    else:
+        width, height, _, bits = struct.unpack('<iiHH', header[18:30])
+    # Only V3 and later headers have an alpha mask
+    has_alpha = bits == 32 and header_size >= 56 and struct.unpack('<I', header[66:70])[0] != 0
+    channels = 4 if has_alpha else 3
+    return 'BMP', abs(width), abs(height), 8 if bits >= 8 else bits, channels, has_alpha
+
+
+def probe_gif(f):
+    header = f.read(13)
+    if header[:6] not in (b'GIF87a', b'GIF89a'):
+        raise ValueError("Not a GIF file")
+    width, height, packed = struct.unpack('<HHB', header[6:11])
+    if packed & 0x80:
+        f.seek(3 << ((packed & 7) + 1), os.SEEK_CUR)
+    # Look for a graphic control extension with the transparency flag before the first frame
+    has_alpha = False
+    while True:
+        introducer = f.read(1)
+        if introducer != b'!':
+            break
+        label = f.read(1)
+        if label == b'\xf9':
+            block = f.read(6)
+            has_alpha = len(block) == 6 and bool(block[1] & 1)
+            break
+        # Skip the data sub-blocks of other extensions
+        size = f.read(1)
+        while size and size[0]:
+            f.seek(size[0], os.SEEK_CUR)
+            size = f.read(1)
+    return 'GIF', width, height, 8, 4 if has_alpha else 3, has_alpha
+
+
+def probe_tiff(f):
+    _, tags = streaming.read_tiff_ifd(f)
+    width = tags[streaming.TAG_IMAGE_WIDTH][0]
+    height = tags[streaming.TAG_IMAGE_LENGTH][0]
+    bit_depth = tags.get(streaming.TAG_BITS_PER_SAMPLE, [1])[0]
+    channels = tags.get(streaming.TAG_SAMPLES_PER_PIXEL, [1])[0]
+    extra = tags.get(streaming.TAG_EXTRA_SAMPLES, [])
+    has_alpha = any(value in streaming.EXTRA_SAMPLES_ALPHA for value in extra) or (not extra and channels in (2, 4))
+    return 'TIFF', width, height, bit_depth, channels, has_alpha
+
+
+def probe_pnm(f):
+    magic, width, height, maxval = streaming.read_pnm_header(f)
+    if magic not in ('P1', 'P2', 'P3', 'P4', 'P5', 'P6'):
+        raise ValueError(f"Unsupported PNM type {magic}")
+    channels = 3 if magic in ('P3', 'P6') else 1
+    return 'PNM', width, height, maxval.bit_length(), channels, False
+
+
+# Probes by leading bytes; PNM is recognised by its 'P1'-'P6' magic
+PROBES = [
+    (PNG_SIGNATURE, probe_png),
+    (b'\xff\xd8', probe_jpeg),
+    (b'BM', probe_bmp),
+    (b'GIF8', probe_gif),
+    (b'II*\x00', probe_tiff),
+    (b'MM\x00*', probe_tiff),
+]
+
+
+def probe_image(path):
+    """
+    Read the format, size, bit depth and alpha of path from its header
+    only, without decoding any pixels. Returns an ImageInfo, or None if the
+    file cannot be read or is not a PNG, JPEG, BMP, GIF, TIFF or PNM file.
+    """
+    try:
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            start = f.read(8)
+            f.seek(0)
+            if start[:1] == b'P' and start[1:2] in b'123456':
+                probe = probe_pnm
+            else:
+                probe = next((func for magic, func in PROBES if start.startswith(magic)), None)
+            if probe is None:
+                return None
+            return ImageInfo(*probe(f), file_size)
+    except (OSError, ValueError, KeyError, IndexError, struct.error):
+        return None
+
+
+def probe_images(paths, workers=None):
+    """
+    Probe many files on a thread pool; returns {path: ImageInfo or None}.
+    The probes mostly wait on small reads, so threads overlap them well,
+    which matters most on network drives.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-probe") as pool:
+        return dict(zip(paths, pool.map(probe_image, paths)))
@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import wx
+
+import atomicfile
+import thumbcache
+
+# One output of an export: base path + suffix + extension, scaled so the
+# longer side is at most max_size (None keeps the size), with JPEG quality
+# quality (None uses the wx default).
+ExportTarget = namedtuple('ExportTarget', ['label', 'suffix', 'extension', 'max_size', 'quality'])
+
+DEFAULT_EXPORTS = (
+    ExportTarget("Full size PNG", '', '.png', None, None),
+    ExportTarget("Web JPEG (2048 px, quality 85)", '_web', '.jpg', 2048, 85),
+    ExportTarget("Thumbnail JPEG (256 px, quality 80)", '_thumb', '.jpg', 256, 80),
+)
+
+
+def save_image_atomic(image, path, bitmap_type):
+    """
+    Encode image into a temporary file next to path, then rename it over
+    path, so path is never left half written. Raises IOError if encoding
+    fails.
+    """
+    with atomicfile.replacing(path) as temp_path:
+        if not image.SaveFile(temp_path, bitmap_type):
+            raise IOError(f"Could not encode {os.path.basename(path)}")
+
+
+def export_image(image, path, target, supported_formats):
+    """Scale and encode image for one ExportTarget and save it atomically to path."""
+    bitmap_type = supported_formats.get(target.extension)
+    if bitmap_type is None:
+        raise ValueError(f"No encoder for {target.extension} files")
+    output = image
+    if target.max_size is not None and max(image.GetWidth(), image.GetHeight()) > target.max_size:
+        output = thumbcache.make_thumbnail(image, target.max_size)
+    if target.quality is not None:
+        if output is image:
+            # Options are stored on the image; keep them off the caller's copy
+            output = image.Copy()
+        output.SetOption(wx.IMAGE_OPTION_QUALITY, target.quality)
+    save_image_atomic(output, path, bitmap_type)
+
+
+class ImageSaver:
+    """
+    Encodes and writes images on a small thread pool, so large PNG or TIFF
+    files never block the GUI thread. Every write is atomic. Callbacks are
+    called on the pool threads.
+    """
+
+    def __init__(self, supported_formats, workers=None):
+        """workers: threads encoding at once, up to 4 by default."""
+        self.supported_formats = supported_formats
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="image-saver")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def prepare(self, render, callback):
+        """
+        Call render() in the background, e.g. to decode and edit the full
+        resolution of an image before saving it; callback(result, error)
+        is called when done, error being None or the exception message.
+        """
+        def run():
+            try:
+                result = render()
+                error = None
+            except Exception as e:
+                result = None
+                error = str(e)
+            callback(result, error)
+            return error
+
+        return self._pool.submit(run)
+
+    def save(self, image, path, bitmap_type, callback=None):
+        """
+        Save image to path in the background; callback(path, error) is
+        called when done, error being None or the exception message.
+        Returns the Future of the write.
+        """
+        def run():
+            try:
+                save_image_atomic(image, path, bitmap_type)
+                error = None
+            except Exception as e:
+                error = str(e)
+            if callback is not None:
+                callback(path, error)
+            return error
+
+        return self._pool.submit(run)
+
+    def export(self, image, base_path, targets=DEFAULT_EXPORTS, progress=None):
+        """
+        Write image once per ExportTarget, all targets encoding concurrently.
+        progress(done, total, path, error) is called as each file finishes.
+        Returns the Futures of the writes.
+        """
+        lock = threading.Lock()
+        finished = [0]
+
+        def run(target):
+            path = base_path + target.suffix + target.extension
+            try:
+                export_image(image, path, target, self.supported_formats)
+                error = None
+            except Exception as e:
+                error = str(e)
+            with lock:
+                finished[0] += 1
+                done = finished[0]
+            if progress is not None:
+                progress(done, len(targets), path, error)
+            return error
+
+        return [self._pool.submit(run, target) for target in targets]
@@ -0,0 +1,175 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import imageops
+import pixelbuffer
+from imageops import np
+from pixelbuffer import PixelBuffer
+
+
+class BandExecutor:
+    """
+    Runs the per-pixel operations of imageops on all cores.
+
+    The pixel buffer is split into bands of rows that are processed on a
+    thread pool; the NumPy reductions and np.take calls used per band
+    release the GIL, so bands run in parallel. Global statistics (min/max,
+    histograms) are reduced across the bands before any remapping, so
+    results are identical to the single-threaded functions. Without NumPy
+    every method falls back to imageops. Images are wx.Images or
+    PixelBuffers; results are of the same kind as the input.
+    """
+
+    def __init__(self, workers=None, min_band_rows=64):
+        """workers: number of threads, the CPU count by default."""
+        self.workers = workers or os.cpu_count() or 1
+        self.min_band_rows = min_band_rows
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="band-worker")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def bands(self, height):
+        """Split height rows into (start, stop) bands, about two per worker."""
+        count = max(1, min(self.workers * 2, height // self.min_band_rows))
+        return [(i * height // count, (i + 1) * height // count) for i in range(count)]
+
+    def map_bands(self, func, height):
+        """Call func(start, stop) for every band and return the results in order."""
+        bands = self.bands(height)
+        if len(bands) == 1:
+            return [func(*bands[0])]
+        return list(self._pool.map(lambda band: func(*band), bands))
+
+    def channel_min_max(self, image):
+        if np is None:
+            return imageops.ChannelStats.from_image(image).percentile_range(0.0, 100.0)
+        src = imageops.image_array(image)
+        results = self.map_bands(lambda start, stop: imageops.channel_min_max(src[start:stop]),
+                                 len(src))
+        mins = [min(band_mins[c] for band_mins, _ in results) for c in range(3)]
+        maxs = [max(band_maxs[c] for _, band_maxs in results) for c in range(3)]
+        return mins, maxs
+
+    def channel_stats(self, image, ignore_transparent=False):
+        """imageops.ChannelStats of image, with the histograms summed over bands."""
+        if np is None:
+            return imageops.ChannelStats.from_image(image, ignore_transparent)
+        src_buffer = pixelbuffer.as_pixel_buffer(image)
+        src = src_buffer.array()
+        alpha = src_buffer.alpha_array() if ignore_transparent else None
+        if alpha is not None and not alpha.any():
+            # Nothing is visible; count every pixel like channel_histograms
+            alpha = None
+
+        def band_histograms(start, stop):
+            mask = alpha[start:stop] != 0 if alpha is not None else None
+            return imageops.masked_histograms(src[start:stop], mask)
+
+        results = self.map_bands(band_histograms, len(src))
+        return imageops.ChannelStats([sum(band[c] for band in results).tolist() for c in range(3)])
+
+    def apply_channel_luts(self, image, tables, inplace=False):
+        """Parallel imageops.apply_channel_luts."""
+        if np is None:
+            return imageops.apply_channel_luts(image, tables, inplace)
+        src_buffer = pixelbuffer.as_pixel_buffer(image)
+        dst_buffer = src_buffer if inplace else PixelBuffer.new(src_buffer.width, src_buffer.height)
+        src = src_buffer.array()
+        dst = dst_buffer.array()
+        luts = [imageops.lut_array(table) for table in tables]
+
+        def remap(start, stop):
+            for c, lut in enumerate(luts):
+                np.take(lut, src[start:stop, :, c], out=dst[start:stop, :, c])
+
+        self.map_bands(remap, src_buffer.height)
+        if not inplace:
+            dst_buffer.share_alpha_from(src_buffer)
+        return pixelbuffer.same_kind(image, dst_buffer)
+
+    def compress_dynamic_range(self, image, factor=0.7, low_percentile=None, high_percentile=None, stats=None,
+                               ignore_transparent=False):
+        """Parallel imageops.compress_dynamic_range."""
+        if factor >= 1.0:
+            return image
+        if np is None:
+            return imageops.compress_dynamic_range(image, factor, low_percentile, high_percentile, stats,
+                                                   ignore_transparent)
+        if stats is None and ignore_transparent and image.HasAlpha():
+            stats = self.channel_stats(image, ignore_transparent=True)
+        if stats is None and low_percentile is None and high_percentile is None:
+            mins, maxs = self.channel_min_max(image)
+            new_min, new_range = imageops.range_output_bounds(factor)
+            tables = [imageops.range_lut(lo, hi, new_min, new_range) for lo, hi in zip(mins, maxs)]
+        else:
+            if stats is None:
+                stats = self.channel_stats(image)
+            tables = imageops.compress_tables(stats, factor, low_percentile, high_percentile)
+        return self.apply_channel_luts(image, tables)
+
+    def compress_local_range(self, image, factor=0.7, tiles=8, low_percentile=0.0, high_percentile=100.0):
+        """Parallel imageops.compress_local_range: tile rows are counted and bands remapped on the pool."""
+        if factor >= 1.0:
+            return image
+        if np is None:
+            return imageops.compress_local_range(image, factor, tiles, low_percentile, high_percentile)
+        src_buffer = pixelbuffer.as_pixel_buffer(image)
+        src = src_buffer.array()
+        height, width = src.shape[:2]
+        y_edges, x_edges = imageops.tile_grid(height, width, tiles)
+        histograms = np.concatenate(list(self._pool.map(
+            lambda i: imageops.tile_histograms(src, y_edges, x_edges, [i]), range(len(y_edges) - 1))), axis=1)
+        local_map = imageops.LocalRangeMap(src, factor, tiles, low_percentile, high_percentile, histograms)
+        dst_buffer = PixelBuffer.new(width, height)
+        dst = dst_buffer.array()
+        self.map_bands(lambda start, stop: local_map.remap(dst, start, stop), height)
+        dst_buffer.share_alpha_from(src_buffer)
+        return pixelbuffer.same_kind(image, dst_buffer)
+
+    def reduce_color_depth(self, image, bits=4, inplace=False):
+        """Parallel imageops.reduce_color_depth."""
+        return self.apply_channel_luts(image, [imageops.quantize_table(bits)] * 3, inplace)
+
+    def apply_point_pipeline(self, point_pipeline, image, stats=None, inplace=False, ignore_transparent=False):
+        """Parallel imageops.PointPipeline.apply."""
+        if stats is None and point_pipeline.needs_stats():
+            stats = self.channel_stats(image, ignore_transparent)
+        return self.apply_channel_luts(image, point_pipeline.tables(stats), inplace)
+
+    # Animations: the frames are spread over the pool, one frame per task,
+    # so the work scales with the cores however many frames there are.
+
+    def map_frames(self, func, frames):
+        """Call func(frame) for every frame on the pool and return the results in order."""
+        return list(self._pool.map(func, frames))
+
+    def frames_stats(self, frames, ignore_transparent=False):
+        """One imageops.ChannelStats counting the pixels of all frames together."""
+        results = self.map_frames(lambda frame: imageops.channel_histograms(frame, ignore_transparent), frames)
+        return imageops.ChannelStats([[sum(counts) for counts in zip(*(histograms[c] for histograms in results))]
+                                      for c in range(3)])
+
+    def compress_frames(self, frames, factor=0.7, low_percentile=None, high_percentile=None,
+                        ignore_transparent=False):
+        """
+        compress_dynamic_range over the frames of an animation: the range is
+        taken from all frames in one statistics pass, so every frame gets
+        the same mapping and the animation does not flicker.
+        """
+        if factor >= 1.0:
+            return list(frames)
+        return self.apply_point_pipeline_frames(
+            imageops.PointPipeline().compress(factor, low_percentile, high_percentile), frames, ignore_transparent)
+
+    def apply_point_pipeline_frames(self, point_pipeline, frames, ignore_transparent=False):
+        """imageops.PointPipeline.apply over the frames of an animation, with shared statistics."""
+        stats = self.frames_stats(frames, ignore_transparent) if point_pipeline.needs_stats() else None
+        tables = point_pipeline.tables(stats)
+        return self.map_frames(lambda frame: imageops.apply_channel_luts(frame, tables), frames)
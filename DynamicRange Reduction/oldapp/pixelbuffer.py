@@ -0,0 +1,111 @@
+"""
+Compact pixel storage for the image operations.
+
+A PixelBuffer is an RGB image held as one contiguous buffer of
+width * height * 3 bytes, plus an optional alpha plane of width * height
+bytes, with no Python object per pixel. The buffers belong to a wx.Image
+and are viewed through GetDataBuffer and GetAlphaBuffer, so wrapping an
+image and getting it back never copies pixels. (Handing wx a Python
+buffer with SetDataBuffer would avoid nothing here, and would leave the
+image pointing at memory it does not own.)
+"""
+try:
+    import wx
+except ImportError:
+    wx = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class PixelBuffer:
+    """
+    Pixels of a wx.Image. data is a writable memoryview of the RGB bytes
+    (row by row, 3 bytes per pixel) and alpha one of the alpha plane, or
+    None. GetWidth, GetHeight and HasAlpha match wx.Image, so code that
+    only sizes images takes either.
+    """
+
+    __slots__ = ('image', 'width', 'height', 'channels', 'data', 'alpha')
+
+    def __init__(self, image):
+        self.image = image
+        self.width = image.GetWidth()
+        self.height = image.GetHeight()
+        self.channels = 3
+        self.data = image.GetDataBuffer()
+        self.alpha = image.GetAlphaBuffer() if image.HasAlpha() else None
+
+    @classmethod
+    def new(cls, width, height, alpha=False):
+        """An uninitialized buffer, with an alpha plane if alpha."""
+        image = wx.Image(width, height, clear=False)
+        if alpha:
+            image.InitAlpha()
+        return cls(image)
+
+    @property
+    def nbytes(self):
+        return len(self.data) + (len(self.alpha) if self.alpha is not None else 0)
+
+    def GetWidth(self):
+        return self.width
+
+    def GetHeight(self):
+        return self.height
+
+    def HasAlpha(self):
+        return self.alpha is not None
+
+    def to_image(self):
+        """The wx.Image holding the pixels; it shares them with this buffer."""
+        return self.image
+
+    def array(self):
+        """(H, W, 3) uint8 NumPy view of the RGB data."""
+        return np.frombuffer(self.data, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def alpha_array(self):
+        """(H, W) uint8 NumPy view of the alpha plane, or None."""
+        if self.alpha is None:
+            return None
+        return np.frombuffer(self.alpha, dtype=np.uint8).reshape(self.height, self.width)
+
+    def channel(self, c):
+        """Strided memoryview of RGB channel c, without copying."""
+        return self.data[c::3]
+
+    def opaque_mask(self):
+        """(H, W) boolean NumPy mask of the pixels that are not fully transparent, or None."""
+        if self.alpha is None:
+            return None
+        return self.alpha_array() != 0
+
+    def share_alpha_from(self, other):
+        """
+        Use the alpha plane of other as this buffer's alpha, without copying
+        it. The point operations never change alpha, so their outputs and
+        input can all point at one plane. The image keeps a reference to
+        the image owning the plane, which must outlive it.
+        """
+        if other.alpha is None:
+            return
+        self.image.SetAlphaBuffer(other.alpha)
+        self.image.alpha_owner = getattr(other.image, 'alpha_owner', other.image)
+        self.alpha = self.image.GetAlphaBuffer()
+
+
+def as_pixel_buffer(image):
+    """image as a PixelBuffer: a PixelBuffer is returned as is, a wx.Image is wrapped."""
+    if isinstance(image, PixelBuffer):
+        return image
+    return PixelBuffer(image)
+
+
+def same_kind(image, buffer):
+    """The result of an operation on image: buffer if image is a PixelBuffer, else its wx.Image."""
+    if isinstance(image, PixelBuffer):
+        return buffer
+    return buffer.image
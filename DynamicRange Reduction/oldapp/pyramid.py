@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+import wx
+
+from imagecache import image_nbytes
+
+# Stop halving once either side would drop below this many pixels
+MIN_LEVEL_SIZE = 32
+
+
+class ImagePyramid:
+    """
+    Mip-style pyramid over a wx.Image for fast fit-to-window and zoom.
+
+    Level 0 is the image itself; each further level halves both sides with
+    a box filter (wx.Image.ShrinkBy). Levels are built on first use and
+    kept. scaled() resamples from the smallest level that is still at least
+    as large as the target, and remembers its results keyed by target size,
+    up to max_cached_sizes results and max_cached_mb of pixels. Results
+    larger than the image (zoomed in) are not remembered: they are cheap to
+    redo from level 0 and would hold many times the image's memory.
+    """
+
+    def __init__(self, image, max_cached_sizes=8, max_cached_mb=128):
+        self.image = image
+        self.levels = [image]
+        self.max_cached_sizes = max_cached_sizes
+        self.max_cached_bytes = int(max_cached_mb * 1024 * 1024)
+        self._scaled = OrderedDict()
+        self._scaled_bytes = 0
+
+    def level_for(self, width, height):
+        """Return the smallest level whose size is at least (width, height)."""
+        level = self.levels[0]
+        index = 0
+        while True:
+            half_width = level.GetWidth() // 2
+            half_height = level.GetHeight() // 2
+            if (half_width < width or half_height < height
+                    or half_width < MIN_LEVEL_SIZE or half_height < MIN_LEVEL_SIZE):
+                return level
+            index += 1
+            if index == len(self.levels):
+                self.levels.append(level.ShrinkBy(2, 2))
+            level = self.levels[index]
+
+    def scaled(self, width, height, quality=wx.IMAGE_QUALITY_HIGH):
+        """Return the image resampled to (width, height)."""
+        width = max(1, int(width))
+        height = max(1, int(height))
+        key = (width, height, quality)
+        entry = self._scaled.get(key)
+        if entry is not None:
+            self._scaled.move_to_end(key)
+            return entry[0]
+        level = self.level_for(width, height)
+        if level.GetWidth() == width and level.GetHeight() == height:
+            # A level is kept anyway, so remembering it costs nothing
+            self._cache_put(key, level, 0)
+            return level
+        image = level.Scale(width, height, quality)
+        if width <= self.image.GetWidth() and height <= self.image.GetHeight():
+            self._cache_put(key, image, image_nbytes(image))
+        return image
+
+    def _cache_put(self, key, image, nbytes):
+        if nbytes > self.max_cached_bytes:
+            return
+        self._scaled[key] = (image, nbytes)
+        self._scaled_bytes += nbytes
+        while len(self._scaled) > self.max_cached_sizes or self._scaled_bytes > self.max_cached_bytes:
+            _, (_, evicted_bytes) = self._scaled.popitem(last=False)
+            self._scaled_bytes -= evicted_bytes
@@ -0,0 +1,365 @@
+"""
+Strip-wise dynamic range compression for images larger than RAM.
+
+Raw PPM/PGM (P6/P5) and uncompressed 8-bit TIFF files are memory-mapped
+and processed in two passes over row strips: the first gathers per-channel
+min/max, the second remaps each strip through the compress_dynamic_range
+lookup tables and writes it straight to the output file. Peak memory is
+bounded by strip_bytes, not by the image size.
+"""
+import os
+import struct
+
+import atomicfile
+import imageops
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_STRIP_BYTES = 16 * 1024 * 1024
+
+PNM_EXTENSIONS = ('.pnm', '.pgm', '.ppm')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+STREAMING_EXTENSIONS = PNM_EXTENSIONS + TIFF_EXTENSIONS
+
+# TIFF tags used by the reader and writer
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_PHOTOMETRIC = 262
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_ROWS_PER_STRIP = 278
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_PLANAR_CONFIGURATION = 284
+TAG_EXTRA_SAMPLES = 338
+TAG_SAMPLE_FORMAT = 339
+SAMPLE_FORMAT_FLOAT = 3
+PHOTOMETRIC_BLACK_IS_ZERO = 1
+PHOTOMETRIC_RGB = 2
+# ExtraSamples values of associated (premultiplied) and unassociated alpha
+EXTRA_SAMPLES_ALPHA = (1, 2)
+
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+TIFF_TYPE_FORMATS = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i'}
+
+
+class RasterFile:
+    """
+    Memory-mapped raster. segments is a list of (first_row, row_count,
+    file_offset) runs of rows stored contiguously. dtype is the NumPy
+    sample type in the file (uint8 unless opened with deep=True) and
+    maxval the sample value of full intensity. A fourth channel is alpha;
+    alpha_kind is its TIFF ExtraSamples value.
+    """
+
+    def __init__(self, path, width, height, channels, segments, dtype='u1', maxval=255, alpha_kind=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.segments = segments
+        self.dtype = np.dtype(dtype) if np is not None else dtype
+        self.maxval = maxval
+        self.alpha_kind = alpha_kind
+
+    @property
+    def row_bytes(self):
+        return self.width * self.channels * self.dtype.itemsize
+
+    def iter_strips(self, strip_bytes=DEFAULT_STRIP_BYTES):
+        """Yield (first_row, array) with arrays of shape (rows, width, channels)."""
+        strip_rows = max(1, strip_bytes // self.row_bytes)
+        data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        try:
+            for first_row, row_count, offset in self.segments:
+                for row in range(0, row_count, strip_rows):
+                    rows = min(strip_rows, row_count - row)
+                    start = offset + row * self.row_bytes
+                    strip = data[start:start + rows * self.row_bytes].view(self.dtype)
+                    yield first_row + row, strip.reshape(rows, self.width, self.channels)
+        finally:
+            del data
+
+
+def read_pnm_header(f):
+    """
+    Parse a PNM header; returns (magic, width, height, maxval) with f at the
+    pixel data. Bitmaps (P1/P4) have no maxval field and report 1.
+    """
+    tokens = []
+    while len(tokens) < (3 if tokens[:1] in ([b'P1'], [b'P4']) else 4):
+        c = f.read(1)
+        if not c:
+            raise ValueError("Truncated PNM header")
+        if c == b'#':
+            while c not in (b'\n', b'\r', b''):
+                c = f.read(1)
+        elif c.isspace():
+            continue
+        else:
+            token = c
+            while True:
+                c = f.read(1)
+                if not c or c.isspace():
+                    break
+                token += c
+            tokens.append(token)
+    magic = tokens[0].decode('ascii')
+    maxval = int(tokens[3]) if len(tokens) > 3 else 1
+    return magic, int(tokens[1]), int(tokens[2]), maxval
+
+
+def open_pnm(path, deep=False):
+    """deep: also accept 16-bit files (big-endian samples, maxval above 255)."""
+    with open(path, 'rb') as f:
+        magic, width, height, maxval = read_pnm_header(f)
+        offset = f.tell()
+    if magic not in ('P5', 'P6'):
+        raise ValueError(f"Only raw PGM/PPM (P5/P6) can be streamed, not {magic}")
+    if maxval > 255 and not deep:
+        raise ValueError("Only 8-bit PNM files can be streamed")
+    channels = 3 if magic == 'P6' else 1
+    return RasterFile(path, width, height, channels, [(0, height, offset)],
+                      '>u2' if maxval > 255 else 'u1', maxval)
+
+
+def read_tiff_ifd(f):
+    """Read the first IFD of a classic TIFF file; returns (byte_order, {tag: values})."""
+    header = f.read(8)
+    if header[:2] == b'II':
+        byte_order = '<'
+    elif header[:2] == b'MM':
+        byte_order = '>'
+    else:
+        raise ValueError("Not a TIFF file")
+    magic, ifd_offset = struct.unpack(byte_order + 'HI', header[2:8])
+    if magic != 42:
+        raise ValueError("Only classic (non-BigTIFF) TIFF files are supported")
+    f.seek(ifd_offset)
+    (entry_count,) = struct.unpack(byte_order + 'H', f.read(2))
+    entries = f.read(12 * entry_count)
+    tags = {}
+    for i in range(entry_count):
+        tag, field_type, count, value = struct.unpack(
+            byte_order + 'HHI4s', entries[i * 12:i * 12 + 12])
+        if field_type not in TIFF_TYPE_FORMATS:
+            continue
+        size = TIFF_TYPE_SIZES[field_type] * count
+        if size > 4:
+            position = f.tell()
+            (value_offset,) = struct.unpack(byte_order + 'I', value)
+            f.seek(value_offset)
+            value = f.read(size)
+            f.seek(position)
+        values = struct.unpack(f"{byte_order}{count}{TIFF_TYPE_FORMATS[field_type]}", value[:size])
+        tags[tag] = list(values)
+    return byte_order, tags
+
+
+def open_tiff(path, deep=False):
+    """deep: also accept 16-bit integer and 32-bit float samples."""
+    with open(path, 'rb') as f:
+        byte_order, tags = read_tiff_ifd(f)
+    width = tags[TAG_IMAGE_WIDTH][0]
+    height = tags[TAG_IMAGE_LENGTH][0]
+    channels = tags.get(TAG_SAMPLES_PER_PIXEL, [1])[0]
+    bits = tags.get(TAG_BITS_PER_SAMPLE, [1])
+    if tags.get(TAG_COMPRESSION, [1])[0] != 1:
+        raise ValueError("Only uncompressed TIFF files can be streamed")
+    if len(set(bits)) != 1:
+        raise ValueError("TIFF channels of different bit depths cannot be streamed")
+    is_float = tags.get(TAG_SAMPLE_FORMAT, [1])[0] == SAMPLE_FORMAT_FLOAT
+    if bits[0] == 8 and not is_float:
+        dtype, maxval = 'u1', 255
+    elif deep and bits[0] == 16 and not is_float:
+        dtype, maxval = byte_order + 'u2', 65535
+    elif deep and bits[0] == 32 and is_float:
+        dtype, maxval = byte_order + 'f4', 1.0
+    elif deep:
+        raise ValueError("Only 8-bit, 16-bit and 32-bit float TIFF files are supported")
+    else:
+        raise ValueError("Only 8-bit TIFF files can be streamed")
+    if channels > 1 and tags.get(TAG_PLANAR_CONFIGURATION, [1])[0] != 1:
+        raise ValueError("Only chunky (interleaved) TIFF files can be streamed")
+    if channels not in (1, 3, 4):
+        raise ValueError(f"Unsupported TIFF samples per pixel: {channels}")
+    # Other interpretations (WhiteIsZero, palette, CMYK, YCbCr, ...) would be
+    # remapped as if they were gray or RGB
+    photometric = tags.get(TAG_PHOTOMETRIC, [None])[0]
+    if photometric != (PHOTOMETRIC_BLACK_IS_ZERO if channels == 1 else PHOTOMETRIC_RGB):
+        raise ValueError(f"Unsupported TIFF photometric interpretation: {photometric}")
+    alpha_kind = None
+    if channels == 4:
+        alpha_kind = tags.get(TAG_EXTRA_SAMPLES, [0])[0]
+        if alpha_kind not in EXTRA_SAMPLES_ALPHA:
+            raise ValueError("Only RGB TIFF files with an alpha channel as fourth sample are supported")
+    rows_per_strip = min(tags.get(TAG_ROWS_PER_STRIP, [height])[0], height)
+    offsets = tags[TAG_STRIP_OFFSETS]
+    row_bytes = width * channels * bits[0] // 8
+
+    # Merge strips that follow each other in the file into longer runs
+    segments = []
+    for i, offset in enumerate(offsets):
+        first_row = i * rows_per_strip
+        row_count = min(rows_per_strip, height - first_row)
+        if row_count <= 0:
+            break
+        if segments:
+            last_row, last_count, last_offset = segments[-1]
+            if last_offset + last_count * row_bytes == offset:
+                segments[-1] = (last_row, last_count + row_count, last_offset)
+                continue
+        segments.append((first_row, row_count, offset))
+    return RasterFile(path, width, height, channels, segments, dtype, maxval, alpha_kind)
+
+
+def open_raster(path, deep=False):
+    file_ext = os.path.splitext(path)[1].lower()
+    if file_ext in PNM_EXTENSIONS:
+        return open_pnm(path, deep)
+    if file_ext in TIFF_EXTENSIONS:
+        return open_tiff(path, deep)
+    raise ValueError(f"Streaming is only supported for PPM/PGM and TIFF, not {file_ext}")
+
+
+def tiff_header(width, height, channels, rows_per_strip, alpha_kind=2):
+    """
+    Build a little-endian baseline TIFF header and IFD for uncompressed
+    8-bit data stored in strips right after it. Returns the header bytes.
+    A fourth channel is marked as alpha of the ExtraSamples kind alpha_kind.
+    """
+    row_bytes = width * channels
+    strip_count = (height + rows_per_strip - 1) // rows_per_strip
+    byte_counts = [min(rows_per_strip, height - i * rows_per_strip) * row_bytes
+                   for i in range(strip_count)]
+    entry_count = 11 if channels == 4 else 10
+    ifd_size = 2 + entry_count * 12 + 4
+    bits_offset = 8 + ifd_size
+    offsets_offset = bits_offset + 2 * channels
+    counts_offset = offsets_offset + 4 * strip_count
+    data_offset = counts_offset + 4 * strip_count
+    strip_offsets = []
+    position = data_offset
+    for count in byte_counts:
+        strip_offsets.append(position)
+        position += count
+
+    def entry(tag, field_type, count, value):
+        if field_type == TIFF_SHORT and count == 1:
+            return struct.pack('<HHIHH', tag, field_type, count, value, 0)
+        return struct.pack('<HHII', tag, field_type, count, value)
+
+    def array_entry(tag, offset, values):
+        if len(values) == 1:
+            return entry(tag, TIFF_LONG, 1, values[0])
+        return entry(tag, TIFF_LONG, len(values), offset)
+
+    photometric = 1 if channels == 1 else 2
+    entries = [
+        entry(TAG_IMAGE_WIDTH, TIFF_LONG, 1, width),
+        entry(TAG_IMAGE_LENGTH, TIFF_LONG, 1, height),
+        entry(TAG_BITS_PER_SAMPLE, TIFF_SHORT, channels, 8) if channels == 1
+        else entry(TAG_BITS_PER_SAMPLE, TIFF_SHORT, channels, bits_offset),
+        entry(TAG_COMPRESSION, TIFF_SHORT, 1, 1),
+        entry(TAG_PHOTOMETRIC, TIFF_SHORT, 1, photometric),
+        array_entry(TAG_STRIP_OFFSETS, offsets_offset, strip_offsets),
+        entry(TAG_SAMPLES_PER_PIXEL, TIFF_SHORT, 1, channels),
+        entry(TAG_ROWS_PER_STRIP, TIFF_LONG, 1, rows_per_strip),
+        array_entry(TAG_STRIP_BYTE_COUNTS, counts_offset, byte_counts),
+        entry(TAG_PLANAR_CONFIGURATION, TIFF_SHORT, 1, 1),
+    ]
+    if channels == 4:
+        entries.append(entry(TAG_EXTRA_SAMPLES, TIFF_SHORT, 1, alpha_kind))
+    header = b'II' + struct.pack('<HI', 42, 8)
+    header += struct.pack('<H', entry_count) + b''.join(entries) + struct.pack('<I', 0)
+    header += struct.pack(f'<{channels}H', *([8] * channels))
+    header += struct.pack(f'<{strip_count}I', *strip_offsets)
+    header += struct.pack(f'<{strip_count}I', *byte_counts)
+    assert len(header) == data_offset
+    return header
+
+
+def output_header(output_path, raster, rows_per_strip):
+    file_ext = os.path.splitext(output_path)[1].lower()
+    if file_ext in PNM_EXTENSIONS:
+        if raster.channels == 4:
+            raise ValueError("PNM output cannot hold an alpha channel")
+        magic = 'P6' if raster.channels == 3 else 'P5'
+        return f"{magic}\n{raster.width} {raster.height}\n255\n".encode('ascii')
+    if file_ext in TIFF_EXTENSIONS:
+        return tiff_header(raster.width, raster.height, raster.channels, rows_per_strip,
+                           raster.alpha_kind or 2)
+    raise ValueError(f"Streaming output must be PPM/PGM or TIFF, not {file_ext}")
+
+
+def channel_range(raster, strip_bytes=DEFAULT_STRIP_BYTES):
+    """First pass: per-channel (mins, maxs) of the colour channels."""
+    color_channels = min(raster.channels, 3)
+    mins = [255] * color_channels
+    maxs = [0] * color_channels
+    for _, strip in raster.iter_strips(strip_bytes):
+        strip_mins, strip_maxs = imageops.channel_min_max(strip, color_channels)
+        mins = [min(a, b) for a, b in zip(mins, strip_mins)]
+        maxs = [max(a, b) for a, b in zip(maxs, strip_maxs)]
+    return mins, maxs
+
+
+def compress_file_streaming(input_path, output_path, factor=0.7, strip_bytes=DEFAULT_STRIP_BYTES):
+    """
+    Compress the dynamic range of a file too large to load, strip by strip.
+    Same result as compress_dynamic_range on the decoded image. The output
+    format (PPM/PGM or TIFF) follows the extension of output_path; an alpha
+    channel in a TIFF is copied unchanged. The output is written to a
+    temporary file next to output_path and renamed over it when complete,
+    so output_path may be input_path.
+    """
+    if np is None:
+        raise RuntimeError("Streaming compression needs NumPy")
+    raster = open_raster(input_path)
+    strip_rows = max(1, strip_bytes // raster.row_bytes)
+    header = output_header(output_path, raster, strip_rows)
+
+    mins, maxs = channel_range(raster, strip_bytes)
+    new_min, new_range = imageops.range_output_bounds(min(factor, 1.0))
+    if factor >= 1.0:
+        luts = [np.arange(256, dtype=np.uint8)] * len(mins)
+    else:
+        luts = [imageops.lut_array(imageops.range_lut(lo, hi, new_min, new_range))
+                for lo, hi in zip(mins, maxs)]
+
+    out = np.empty((strip_rows, raster.width, raster.channels), dtype=np.uint8)
+    with atomicfile.replacing(output_path) as temp_path:
+        with open(temp_path, 'wb') as f:
+            write_remapped(f, header, raster, luts, out, strip_bytes)
+
+
+def write_remapped(f, header, raster, luts, out, strip_bytes):
+    """Second pass: write header, then every strip of raster remapped through luts, into f."""
+    strip_rows = len(out)
+    f.write(header)
+    # Segments may split the image at other row counts than strip_rows,
+    # so collect output rows until a full output strip is ready.
+    filled = 0
+    for _, strip in raster.iter_strips(strip_bytes):
+        row = 0
+        while row < len(strip):
+            rows = min(strip_rows - filled, len(strip) - row)
+            source = strip[row:row + rows]
+            target = out[filled:filled + rows]
+            for c, lut in enumerate(luts):
+                np.take(lut, source[..., c], out=target[..., c])
+            if raster.channels == 4:
+                target[..., 3] = source[..., 3]
+            filled += rows
+            row += rows
+            if filled == strip_rows:
+                f.write(out)
+                filled = 0
+    if filled:
+        f.write(out[:filled])
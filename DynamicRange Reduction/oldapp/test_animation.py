@@ -0,0 +1,130 @@
+import io
+import struct
+
+import pytest
+
+wx = pytest.importorskip('wx')
+np = pytest.importorskip('numpy')
+
+import animation
+
+
+def gif_bytes(width, height, frames):
+    """
+    A GIF with a global colour table and one image block per
+    (left, top, width, height, delay_ms, disposal), with dummy image data.
+    """
+    data = b'GIF89a' + struct.pack('<HHBBB', width, height, 0x81, 0, 0) + b'\0' * 12
+    # A comment extension, skipped
+    data += b'!\xfe\x05hello\x00'
+    for left, top, frame_width, frame_height, delay, disposal in frames:
+        data += b'!\xf9\x04' + struct.pack('<BHB', disposal << 2, delay // 10, 0) + b'\x00'
+        # A local colour table of 4 entries, then the LZW code size and two sub-blocks
+        data += b',' + struct.pack('<HHHHB', left, top, frame_width, frame_height, 0x81) + b'\0' * 12
+        data += b'\x02\x03abc\x01d\x00'
+    return data + b';'
+
+
+def ani_bytes(chunks):
+    body = b'ACON'
+    for chunk_id, payload in chunks:
+        body += chunk_id + struct.pack('<I', len(payload)) + payload + b'\0' * (len(payload) & 1)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def anih(frames, steps, jiffies):
+    return struct.pack('<9I', 36, frames, steps, 0, 0, 0, 0, jiffies, 1)
+
+
+def test_read_gif_layout():
+    frames = [(0, 0, 4, 3, 50, 0), (1, 1, 2, 1, 0, animation.DISPOSE_BACKGROUND)]
+    width, height, layout = animation.read_gif_layout(io.BytesIO(gif_bytes(4, 3, frames)))
+    assert (width, height) == (4, 3)
+    assert layout == [animation.GifFrame(*frame) for frame in frames]
+    with pytest.raises(ValueError):
+        animation.read_gif_layout(io.BytesIO(b'PNG'))
+
+
+def test_read_gif_layout_without_trailer():
+    data = gif_bytes(4, 3, [(0, 0, 4, 3, 50, 0), (0, 0, 4, 3, 50, 0)])
+    _, _, layout = animation.read_gif_layout(io.BytesIO(data[:-1]))
+    assert len(layout) == 2
+
+
+def test_read_ani_sequence():
+    data = ani_bytes([
+        (b'LIST', b'INFOodd'),
+        (b'anih', anih(3, 4, 6)),
+        (b'rate', struct.pack('<4I', 6, 12, 3, 60)),
+        (b'seq ', struct.pack('<4I', 0, 2, 1, 2)),
+    ])
+    assert animation.read_ani_sequence(io.BytesIO(data)) == ([0, 2, 1, 2], [100, 200, 50, 1000])
+    # Without rate and seq chunks: every frame in order at the header rate
+    data = ani_bytes([(b'anih', anih(3, 0, 3))])
+    assert animation.read_ani_sequence(io.BytesIO(data)) == ([0, 1, 2], [50, 50, 50])
+    with pytest.raises(ValueError):
+        animation.read_ani_sequence(io.BytesIO(b'RIFF\0\0\0\0WAVE'))
+
+
+def test_play_delay():
+    assert animation.play_delay(50) == 50
+    assert animation.play_delay(animation.MIN_DELAY_MS - 10) == animation.DEFAULT_DELAY_MS
+
+
+def solid(width, height, colour, alpha=None):
+    image = wx.Image(width, height, bytes(colour) * (width * height))
+    if alpha is not None:
+        image.SetAlpha(bytes(alpha))
+    return image
+
+
+def rgba(image):
+    pixels = np.frombuffer(image.GetData(), dtype=np.uint8).reshape(image.GetHeight(), image.GetWidth(), 3)
+    alpha = (np.frombuffer(image.GetAlpha(), dtype=np.uint8).reshape(pixels.shape[:2]) if image.HasAlpha()
+             else np.full(pixels.shape[:2], 255, dtype=np.uint8))
+    return np.dstack([pixels, alpha])
+
+
+def test_load_gif_composites_frames(tmp_path, monkeypatch):
+    red, green, blue, white = (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 255)
+    layout = [
+        (0, 0, 4, 3, 0, 0),
+        # The second pixel of this frame is transparent
+        (1, 1, 2, 1, 50, animation.DISPOSE_BACKGROUND),
+        (0, 0, 1, 1, 50, animation.DISPOSE_PREVIOUS),
+        (3, 2, 1, 1, 10, 0),
+    ]
+    decoded = [solid(4, 3, red), solid(2, 1, green, alpha=[255, 0]), solid(1, 1, blue), solid(1, 1, white)]
+    path = tmp_path / 'image.gif'
+    path.write_bytes(gif_bytes(4, 3, layout))
+    monkeypatch.setattr(animation, 'load_frame', lambda path, bitmap_type, index: decoded[index])
+
+    result = animation.load_gif(str(path), wx.BITMAP_TYPE_GIF, 4)
+    assert result.delays == [animation.DEFAULT_DELAY_MS, 50, 50, animation.DEFAULT_DELAY_MS]
+    canvas = np.zeros((3, 4, 4), dtype=np.uint8)
+    canvas[...] = red + (255,)
+    assert not result.frames[0].HasAlpha()
+    assert np.array_equal(rgba(result.frames[0]), canvas)
+    canvas[1, 1] = green + (255,)
+    assert np.array_equal(rgba(result.frames[1]), canvas)
+    # The second frame's area is cleared to transparent after it is shown
+    canvas[1, 1:3] = 0
+    canvas[0, 0] = blue + (255,)
+    assert np.array_equal(rgba(result.frames[2]), canvas)
+    # The third frame is undone after it is shown
+    canvas[0, 0] = red + (255,)
+    canvas[2, 3] = white + (255,)
+    assert np.array_equal(rgba(result.frames[3]), canvas)
+
+
+def test_load_ani_follows_the_sequence(tmp_path, monkeypatch):
+    path = tmp_path / 'cursor.ani'
+    path.write_bytes(ani_bytes([
+        (b'anih', anih(2, 3, 6)),
+        (b'seq ', struct.pack('<3I', 1, 0, 1)),
+    ]))
+    decoded = [solid(2, 2, (1, 2, 3)), solid(2, 2, (4, 5, 6))]
+    monkeypatch.setattr(animation, 'load_frame', lambda path, bitmap_type, index: decoded[index])
+    result = animation.load_ani(str(path), wx.BITMAP_TYPE_ANI, 2)
+    assert result.frames == [decoded[1], decoded[0], decoded[1]]
+    assert result.delays == [100, 100, 100]
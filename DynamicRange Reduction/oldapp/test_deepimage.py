@@ -0,0 +1,192 @@
+import struct
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import deepimage
+import streaming
+
+
+def write_pnm16(path, pixels, maxval=65535):
+    height, width, channels = pixels.shape
+    with open(path, 'wb') as f:
+        f.write(f"{'P6' if channels == 3 else 'P5'}\n{width} {height}\n{maxval}\n".encode('ascii'))
+        f.write(pixels.astype('>u2').tobytes())
+
+
+def write_tiff_deep(path, pixels, photometric=None, extra_samples=None):
+    """A big-endian, single-strip TIFF of 16-bit integer or 32-bit float samples."""
+    height, width, channels = pixels.shape
+    is_float = pixels.dtype.kind == 'f'
+    bits = 32 if is_float else 16
+    if photometric is None:
+        photometric = 1 if channels == 1 else 2
+    data = pixels.astype('>f4' if is_float else '>u2').tobytes()
+
+    def entry(tag, field_type, value):
+        if field_type == streaming.TIFF_SHORT:
+            return struct.pack('>HHIHH', tag, field_type, 1, value, 0)
+        return struct.pack('>HHII', tag, field_type, 1, value)
+
+    entries = [
+        (streaming.TAG_IMAGE_WIDTH, streaming.TIFF_LONG, width),
+        (streaming.TAG_IMAGE_LENGTH, streaming.TIFF_LONG, height),
+        (streaming.TAG_COMPRESSION, streaming.TIFF_SHORT, 1),
+        (streaming.TAG_PHOTOMETRIC, streaming.TIFF_SHORT, photometric),
+        (streaming.TAG_STRIP_OFFSETS, streaming.TIFF_LONG, None),
+        (streaming.TAG_SAMPLES_PER_PIXEL, streaming.TIFF_SHORT, channels),
+        (streaming.TAG_ROWS_PER_STRIP, streaming.TIFF_LONG, height),
+        (streaming.TAG_STRIP_BYTE_COUNTS, streaming.TIFF_LONG, len(data)),
+        (streaming.TAG_PLANAR_CONFIGURATION, streaming.TIFF_SHORT, 1),
+        (streaming.TAG_SAMPLE_FORMAT, streaming.TIFF_SHORT, 3 if is_float else 1),
+    ]
+    if extra_samples is not None:
+        entries.append((streaming.TAG_EXTRA_SAMPLES, streaming.TIFF_SHORT, extra_samples))
+    # BitsPerSample holds one value per channel, after the IFD
+    bits_offset = 8 + 2 + 12 * (len(entries) + 1) + 4
+    data_offset = bits_offset + 2 * channels
+    entries.append((streaming.TAG_BITS_PER_SAMPLE, streaming.TIFF_SHORT, bits))
+    ifd = b''
+    for tag, field_type, value in sorted(entries, key=lambda e: e[0]):
+        if tag == streaming.TAG_BITS_PER_SAMPLE and channels > 1:
+            ifd += struct.pack('>HHII', tag, field_type, channels, bits_offset)
+        else:
+            ifd += entry(tag, field_type, data_offset if value is None else value)
+    with open(path, 'wb') as f:
+        f.write(b'MM' + struct.pack('>HI', 42, 8))
+        f.write(struct.pack('>H', len(entries)) + ifd + struct.pack('>I', 0))
+        f.write(struct.pack(f'>{channels}H', *([bits] * channels)))
+        f.write(data)
+
+
+def random_samples(height, width, channels, maxval=65535, seed=0):
+    return np.random.default_rng(seed).integers(0, maxval + 1, (height, width, channels)).astype(np.uint16)
+
+
+@pytest.mark.parametrize('channels', [1, 3])
+def test_load_16bit_pnm(tmp_path, channels):
+    pixels = random_samples(5, 7, channels, maxval=4095)
+    path = str(tmp_path / ('image.ppm' if channels == 3 else 'image.pgm'))
+    write_pnm16(path, pixels, maxval=4095)
+    image = deepimage.load_deep_image(path)
+    assert image.maxval == 4095 and not image.HasAlpha()
+    assert (image.GetWidth(), image.GetHeight(), image.channels) == (7, 5, channels)
+    assert image.pixels.dtype == np.uint16
+    assert np.array_equal(image.pixels, pixels)
+
+
+def test_save_pnm_round_trip(tmp_path):
+    pixels = random_samples(4, 6, 3)
+    path = str(tmp_path / 'image.ppm')
+    deepimage.save_pnm(deepimage.DeepImage(pixels), path)
+    assert np.array_equal(deepimage.load_deep_image(path).pixels, pixels)
+
+
+def test_load_16bit_tiff(tmp_path):
+    pixels = random_samples(6, 9, 3)
+    path = str(tmp_path / 'image.tif')
+    write_tiff_deep(path, pixels)
+    image = deepimage.load_deep_image(path)
+    assert image.maxval == 65535
+    assert np.array_equal(image.pixels, pixels)
+
+
+def test_load_float_tiff(tmp_path):
+    pixels = np.random.default_rng(1).random((4, 3, 1), dtype=np.float32)
+    path = str(tmp_path / 'image.tif')
+    write_tiff_deep(path, pixels)
+    image = deepimage.load_deep_image(path)
+    assert image.is_float and image.maxval == 1.0
+    assert np.array_equal(image.pixels, pixels)
+
+
+def test_alpha_needs_extra_samples(tmp_path):
+    pixels = random_samples(3, 4, 4)
+    path = str(tmp_path / 'image.tif')
+    write_tiff_deep(path, pixels, extra_samples=2)
+    image = deepimage.load_deep_image(path)
+    assert image.channels == 3 and image.HasAlpha()
+    assert np.array_equal(image.pixels, pixels[..., :3])
+    assert np.array_equal(image.alpha, pixels[..., 3])
+    # A fourth sample of unspecified meaning is not taken as alpha
+    write_tiff_deep(path, pixels, extra_samples=0)
+    with pytest.raises(ValueError):
+        deepimage.load_deep_image(path)
+
+
+def test_cmyk_is_rejected(tmp_path):
+    path = str(tmp_path / 'image.tif')
+    write_tiff_deep(path, random_samples(3, 4, 4), photometric=5)
+    with pytest.raises(ValueError):
+        deepimage.load_deep_image(path)
+
+
+def test_8bit_files_are_left_to_wx(tmp_path):
+    path = str(tmp_path / 'image.pgm')
+    with open(path, 'wb') as f:
+        f.write(b'P5 2 2 255\n\0\1\2\3')
+    assert deepimage.load_deep_image(path) is None
+
+
+def test_compress_dynamic_range():
+    pixels = random_samples(9, 11, 3, seed=2)
+    pixels[..., 1] = 1000  # a flat channel
+    image = deepimage.DeepImage(pixels)
+    new_min, new_range = deepimage.output_bounds(0.6, 65535)
+    result = deepimage.compress_dynamic_range(image, 0.6)
+    for c in (0, 2):
+        channel = pixels[..., c].astype(np.int64)
+        lo, hi = channel.min(), channel.max()
+        assert np.array_equal(result.pixels[..., c], new_min + (channel - lo) * new_range // (hi - lo))
+    assert (result.pixels[..., 1] == new_min).all()
+    assert deepimage.compress_dynamic_range(image, 1.0) is image
+
+
+def test_compress_percentiles_and_transparency():
+    pixels = np.zeros((1, 100, 1), dtype=np.uint16)
+    pixels[0, :, 0] = np.arange(100) * 100
+    alpha = np.full((1, 100), 65535, dtype=np.uint16)
+    alpha[0, 90:] = 0
+    image = deepimage.DeepImage(pixels, alpha=alpha)
+    assert deepimage.DeepStats(image).percentile_range(10.0, 90.0) == ([900], [8900])
+    assert deepimage.DeepStats(image, ignore_transparent=True).percentile(0, 100.0) == 8900
+    new_min, new_range = deepimage.output_bounds(0.5, 65535)
+    result = deepimage.compress_dynamic_range(image, 0.5, ignore_transparent=True)
+    # The transparent samples above the visible range are clipped to the top
+    assert result.pixels[0, 0, 0] == new_min
+    assert (result.pixels[0, 89:, 0] == new_min + new_range).all()
+    assert result.alpha is alpha
+
+
+def test_compress_float():
+    pixels = np.array([[[0.2], [0.4], [0.6]]], dtype=np.float32)
+    result = deepimage.compress_dynamic_range(deepimage.DeepImage(pixels), 0.5)
+    assert np.allclose(result.pixels[..., 0], [0.25, 0.5, 0.75])
+    assert result.pixels.dtype == np.float32
+
+
+def test_reduce_color_depth():
+    pixels = random_samples(5, 5, 3, seed=4)
+    result = deepimage.reduce_color_depth(deepimage.DeepImage(pixels), 4)
+    assert np.array_equal(result.pixels, pixels // 4096 * 4096)
+    floats = deepimage.DeepImage(np.array([[[0.0], [0.49], [0.5], [1.0]]], dtype=np.float32))
+    assert deepimage.reduce_color_depth(floats, 1).pixels.ravel().tolist() == [0.0, 0.0, 0.5, 0.5]
+    with pytest.raises(ValueError):
+        deepimage.reduce_color_depth(floats, 17)
+
+
+def test_subsampled_shares_memory():
+    image = deepimage.DeepImage(random_samples(8, 8, 3), alpha=np.zeros((8, 8), dtype=np.uint16))
+    small = image.subsampled(2)
+    assert (small.GetWidth(), small.GetHeight()) == (4, 4)
+    assert np.shares_memory(small.pixels, image.pixels)
+    assert np.shares_memory(small.alpha, image.alpha)
+
+
+def test_to_8bit():
+    out = np.empty(4, dtype=np.uint8)
+    deepimage.to_8bit(np.array([0, 257, 32896, 65535], dtype=np.uint16), 65535, out)
+    assert out.tolist() == [0, 1, 128, 255]
+    deepimage.to_8bit(np.array([0.0, 0.5, 1.0, 2.0], dtype=np.float32), 1.0, out)
+    assert out.tolist() == [0, 128, 255, 255]
@@ -0,0 +1,121 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import editpipeline
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def edits(calls):
+    # NumPy arrays stand in for images: the pipeline only needs their nbytes
+    def add(image, value):
+        calls.append(('add', value))
+        return image + value
+
+    def scale(image, by):
+        calls.append(('scale', by))
+        return image * by
+
+    pipeline = editpipeline.EditPipeline({'add': add, 'scale': scale})
+    pipeline.set_source(np.arange(6, dtype=np.int64))
+    return pipeline
+
+
+def test_undo_redo(edits):
+    assert not edits.can_undo() and not edits.can_redo()
+    edits.apply('add', value=1)
+    edits.apply('scale', by=3)
+    assert list(edits.result()) == [3, 6, 9, 12, 15, 18]
+    assert edits.undo()
+    assert edits.steps == (editpipeline.make_step('add', value=1),)
+    assert list(edits.result()) == [1, 2, 3, 4, 5, 6]
+    assert edits.can_redo()
+    assert edits.redo() and len(edits.steps) == 2
+    assert not edits.redo()
+    edits.undo()
+    edits.apply('scale', by=2)
+    # A new step drops the redo history
+    assert not edits.can_redo()
+    edits.undo()
+    edits.undo()
+    assert not edits.undo()
+    assert edits.result() is edits.source
+
+
+def test_cached_stages_are_reused(edits, calls):
+    edits.apply('add', value=1)
+    edits.apply('scale', by=3)
+    first = edits.result()
+    assert calls == [('add', 1), ('scale', 3)]
+    assert edits.result() is first
+    edits.undo()
+    edits.result()
+    edits.redo()
+    assert edits.result() is first
+    assert len(calls) == 2
+
+
+def test_set_params_recomputes_later_steps_only(edits, calls):
+    edits.apply('add', value=1)
+    edits.apply('scale', by=3)
+    edits.result()
+    edits.set_params(1, by=2)
+    assert list(edits.result()) == [2, 4, 6, 8, 10, 12]
+    assert calls[2:] == [('scale', 2)]
+    # The old parameters are still one undo away, and still cached
+    edits.undo()
+    edits.result()
+    assert len(calls) == 3
+
+
+def test_replace_source_keeps_steps(edits, calls):
+    edits.apply('add', value=1)
+    edits.result()
+    edits.replace_source(np.zeros(6, dtype=np.int64))
+    assert edits.steps == (editpipeline.make_step('add', value=1),)
+    assert list(edits.result()) == [1] * 6
+    assert calls == [('add', 1), ('add', 1)]
+    edits.set_source(np.zeros(2, dtype=np.int64))
+    assert edits.steps == () and not edits.can_undo()
+
+
+def test_cache_budget():
+    # Each stage is 8 KB; the budget holds two
+    pipeline = editpipeline.EditPipeline({'add': lambda image, value: image + value},
+                                         max_cache_mb=20 / 1024)
+    pipeline.set_source(np.zeros(1024, dtype=np.int64))
+    for value in range(1, 5):
+        pipeline.apply('add', value=value)
+    assert pipeline.result()[0] == 10
+    assert pipeline.cache_bytes <= pipeline.max_cache_bytes
+    assert len(pipeline._cache) == 2
+
+
+def test_fused_runs(calls):
+    def fuse(image, steps):
+        calls.append(('fuse', len(steps)))
+        for step in steps:
+            image = image + dict(step.params)['value']
+        return image
+
+    pipeline = editpipeline.EditPipeline({'add': lambda image, value: image + value,
+                                          'neg': lambda image: -image},
+                                         fuse=fuse, fusable=('add',))
+    pipeline.set_source(np.zeros(4, dtype=np.int64))
+    pipeline.apply('add', value=1)
+    pipeline.apply('add', value=2)
+    assert list(pipeline.result()) == [3] * 4
+    assert calls == [('fuse', 2)]
+    # Only the output of the last fused step is cached
+    pipeline.undo()
+    assert list(pipeline.result()) == [1] * 4
+    assert calls == [('fuse', 2)]
+    pipeline.redo()
+    pipeline.apply('neg')
+    assert list(pipeline.result()) == [-3] * 4
+    assert calls == [('fuse', 2)]
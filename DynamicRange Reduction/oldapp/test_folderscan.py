@@ -0,0 +1,73 @@
+import os
+import threading
+
+import pytest
+
+import folderscan
+
+FORMATS = {'.png': 1, '.jpg': 2}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for name in ['b.png', 'a.JPG', 'notes.txt', '.png', 'sub/d.png', 'sub/c.jpg', 'sub/deeper/e.png', 'other/f.png']:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+    (tmp_path / 'folder.png').mkdir()
+    return tmp_path
+
+
+def scan(folder, **kwargs):
+    return list(folderscan.scan_images(str(folder), FORMATS, **kwargs))
+
+
+def relative(folder, batches):
+    return [[os.path.relpath(path, str(folder)).replace(os.sep, '/') for path in batch] for batch in batches]
+
+
+def test_top_level_only(folder):
+    # Extensions match in any case; dot files, other types and folders do not
+    assert relative(folder, scan(folder)) == [['a.JPG', 'b.png']]
+
+
+def test_recursive_order(folder):
+    paths = [path for batch in relative(folder, scan(folder, recursive=True)) for path in batch]
+    assert sorted(paths) == ['a.JPG', 'b.png', 'other/f.png', 'sub/c.jpg', 'sub/d.png', 'sub/deeper/e.png']
+    # The folder itself first, then its subfolders in name order
+    assert paths[:2] == ['a.JPG', 'b.png']
+    assert paths.index('other/f.png') < paths.index('sub/c.jpg')
+
+
+def test_batches_are_sorted_and_bounded(tmp_path):
+    for i in range(25):
+        (tmp_path / f'{24 - i:02}.png').write_bytes(b'')
+    batches = scan(tmp_path, batch_size=10, batch_seconds=3600)
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert all(batch == sorted(batch) for batch in batches)
+
+
+def test_missing_root_raises(tmp_path):
+    with pytest.raises(OSError):
+        scan(tmp_path / 'missing')
+
+
+def test_scanner_reports_batches_and_errors(folder):
+    done = threading.Event()
+    batches = []
+    results = []
+
+    def on_done(generation, count, error):
+        results.append((generation, count, error))
+        done.set()
+
+    scanner = folderscan.FolderScanner(FORMATS, lambda generation, paths: batches.append(paths), on_done)
+    generation = scanner.scan(str(folder), recursive=True)
+    assert done.wait(10)
+    assert results == [(generation, 6, None)]
+    assert sum(len(batch) for batch in batches) == 6
+
+    done.clear()
+    generation = scanner.scan(str(folder / 'missing'))
+    assert done.wait(10)
+    assert results[-1][:2] == (generation, 0) and results[-1][2] is not None
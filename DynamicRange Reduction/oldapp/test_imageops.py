@@ -0,0 +1,168 @@
+"""
+Tests of the image operations against the per-pixel code they replace.
+Run with pytest from this folder; wx and NumPy are needed.
+"""
+import math
+
+import pytest
+
+wx = pytest.importorskip('wx')
+np = pytest.importorskip('numpy')
+
+import imageops
+
+
+def baseline_compress(data, factor):
+    """The per-pixel loop compress_dynamic_range started as, on RGB bytes."""
+    if factor >= 1.0:
+        return bytes(data)
+    mins = [min(data[c::3]) for c in range(3)]
+    maxs = [max(data[c::3]) for c in range(3)]
+    new_min = int((1 - factor) * 128)
+    new_max = 255 - new_min
+    new_range = new_max - new_min
+    out = bytearray(data)
+    for i in range(len(data)):
+        lo, hi = mins[i % 3], maxs[i % 3]
+        value = new_min + ((data[i] - lo) * new_range // (hi - lo)) if hi > lo else new_min
+        out[i] = max(0, min(255, value))
+    return bytes(out)
+
+
+def baseline_quantize(data, bits):
+    """The per-pixel loop reduce_color_depth started as, on RGB bytes."""
+    scale = 256 // 2 ** bits
+    return bytes((v // scale) * scale for v in data)
+
+def make_image(width=37, height=23, seed=0, flat_channel=False):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(20, 230, (height, width, 3), dtype=np.uint8)
+    if flat_channel:
+        pixels[..., 1] = 77
+    return wx.Image(width, height, pixels.tobytes())
+
+
+@pytest.mark.parametrize('factor', [0.0, 0.3, 0.7, 1.0])
+@pytest.mark.parametrize('flat_channel', [False, True])
+def test_compress_engines_match_baseline(factor, flat_channel):
+    image = make_image(flat_channel=flat_channel)
+    expected = baseline_compress(image.GetData(), factor)
+    assert imageops.compress_dynamic_range_numpy(image, factor).GetData() == expected
+    assert imageops.compress_dynamic_range_python(image, factor).GetData() == expected
+    assert imageops.compress_dynamic_range(image, factor).GetData() == expected
+
+
+def test_compress_keeps_alpha():
+    image = make_image()
+    alpha = bytes(i % 256 for i in range(37 * 23))
+    image.SetAlpha(alpha)
+    assert imageops.compress_dynamic_range(image, 0.5).GetAlpha() == alpha
+
+
+@pytest.mark.parametrize('bits', [1, 4, 8])
+def test_reduce_color_depth_matches_baseline(bits):
+    image = make_image()
+    expected = baseline_quantize(image.GetData(), bits)
+    assert imageops.reduce_color_depth(image, bits).GetData() == expected
+
+
+def test_reduce_color_depth_in_place():
+    image = make_image()
+    expected = baseline_quantize(image.GetData(), 3)
+    assert imageops.reduce_color_depth(image, 3, inplace=True) is image
+    assert image.GetData() == expected
+
+
+@pytest.mark.parametrize('bits', [0, 9])
+def test_reduce_color_depth_rejects_bits(bits):
+    with pytest.raises(ValueError):
+        imageops.reduce_color_depth(make_image(), bits)
+
+
+def test_point_pipeline_matches_sequential_steps():
+    image = make_image(seed=1)
+    pipeline = imageops.PointPipeline().compress(0.6).quantize(5).compress(0.8, 1.0, 99.0).quantize(6)
+    sequential = imageops.compress_dynamic_range(image, 0.6)
+    sequential = imageops.reduce_color_depth(sequential, 5)
+    sequential = imageops.compress_dynamic_range(sequential, 0.8, 1.0, 99.0)
+    sequential = imageops.reduce_color_depth(sequential, 6)
+    assert pipeline.apply(image).GetData() == sequential.GetData()
+
+
+def test_point_pipeline_without_stats():
+    image = make_image(seed=2)
+    pipeline = imageops.PointPipeline().compress(1.0).quantize(4)
+    assert not pipeline.needs_stats()
+    assert pipeline.apply(image).GetData() == imageops.reduce_color_depth(image, 4).GetData()
+    with pytest.raises(ValueError):
+        pipeline.add('blur')
+
+
+def reference_local_range(pixels, factor, tiles, low_percentile, high_percentile):
+    """compress_local_range pixel by pixel, from the tile grid up, on an (H, W, 3) array."""
+    height, width = pixels.shape[:2]
+    tiles_y = max(1, min(tiles, height // imageops.MIN_LOCAL_TILE))
+    tiles_x = max(1, min(tiles, width // imageops.MIN_LOCAL_TILE))
+    y_edges = [i * height // tiles_y for i in range(tiles_y + 1)]
+    x_edges = [j * width // tiles_x for j in range(tiles_x + 1)]
+    new_min, new_range = imageops.range_output_bounds(factor)
+
+    def percentile(values, percent):
+        if percent <= 0:
+            return values[0]
+        return min(255, values[max(0, math.ceil(len(values) * percent / 100) - 1)])
+
+    def table(values):
+        lo, hi = percentile(values, low_percentile), percentile(values, high_percentile)
+        if hi - lo < new_range:
+            lo = min(max((lo + hi - new_range) // 2, 0), 255 - new_range)
+            hi = lo + new_range
+        return [new_min + (min(max(v, lo), hi) - lo) * new_range // (hi - lo) for v in range(256)]
+
+    luts = [[[table(sorted(pixels[y_edges[i]:y_edges[i + 1], x_edges[j]:x_edges[j + 1], c].ravel().tolist()))
+              for j in range(tiles_x)] for i in range(tiles_y)] for c in range(3)]
+
+    def neighbours(position, edges):
+        centres = [(edges[k] + edges[k + 1] - 1) / 2 for k in range(len(edges) - 1)]
+        if position <= centres[0]:
+            return 0, 0, 0.0
+        if position >= centres[-1]:
+            return len(centres) - 1, len(centres) - 1, 0.0
+        k = max(k for k in range(len(centres)) if centres[k] <= position)
+        return k, k + 1, (position - centres[k]) / (centres[k + 1] - centres[k])
+
+    out = np.empty_like(pixels)
+    for y in range(height):
+        i0, i1, wy = neighbours(y, y_edges)
+        for x in range(width):
+            j0, j1, wx_ = neighbours(x, x_edges)
+            for c in range(3):
+                v = pixels[y, x, c]
+                top = luts[c][i0][j0][v] * (1 - wx_) + luts[c][i0][j1][v] * wx_
+                bottom = luts[c][i1][j0][v] * (1 - wx_) + luts[c][i1][j1][v] * wx_
+                out[y, x, c] = int(top * (1 - wy) + bottom * wy + 0.5)
+    return out
+
+
+@pytest.mark.parametrize('percentiles', [(0.0, 100.0), (2.0, 98.0)])
+def test_local_range_matches_per_pixel_reference(percentiles):
+    rng = np.random.default_rng(3)
+    height, width = 53, 71
+    # A gradient under the noise, so the tiles have different ranges
+    pixels = rng.integers(0, 120, (height, width, 3)) + np.arange(width)[None, :, None] * 130 // width
+    pixels[:20, :20] = 90  # One flat tile
+    pixels = pixels.astype(np.uint8)
+    expected = reference_local_range(pixels, 0.6, 4, *percentiles)
+    image = wx.Image(width, height, pixels.tobytes())
+    result = np.frombuffer(imageops.compress_local_range(image, 0.6, 4, *percentiles).GetData(),
+                           dtype=np.uint8).reshape(height, width, 3)
+    # The blend is float32 rather than float64: values half way between two
+    # integers may round either way
+    difference = np.abs(result.astype(int) - expected)
+    assert difference.max() <= 1
+    assert (difference == 0).mean() > 0.99
+
+
+def test_local_range_without_change():
+    image = make_image()
+    assert imageops.compress_local_range(image, 1.0) is image
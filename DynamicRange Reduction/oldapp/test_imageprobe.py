@@ -0,0 +1,82 @@
+import struct
+
+import pytest
+
+import imageprobe
+import streaming
+
+
+def probe_bytes(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return imageprobe.probe_image(str(path))
+
+
+def png(colour_type, bit_depth=8, chunks=b''):
+    ihdr = struct.pack('>IIBBBBB', 640, 480, bit_depth, colour_type, 0, 0, 0)
+    return (imageprobe.PNG_SIGNATURE + struct.pack('>I', 13) + b'IHDR' + ihdr + b'\0' * 4
+            + chunks + struct.pack('>I', 0) + b'IDAT' + b'\0' * 4)
+
+
+def test_probe_png(tmp_path):
+    data = png(2)
+    assert probe_bytes(tmp_path, 'a.png', data) == ('PNG', 640, 480, 8, 3, False, len(data))
+    assert probe_bytes(tmp_path, 'b.png', png(6, 16))[3:6] == (16, 4, True)
+    # A tRNS chunk before the image data makes a key colour transparent
+    trns = struct.pack('>I', 6) + b'tRNS' + b'\0' * 10
+    assert probe_bytes(tmp_path, 'c.png', png(2, chunks=trns))[3:6] == (8, 4, True)
+    # Palette images report the depth of their palette entries
+    assert probe_bytes(tmp_path, 'd.png', png(3, 4))[3:6] == (8, 3, False)
+
+
+def test_probe_jpeg(tmp_path):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + b'\0' * 9
+    sof2 = b'\xff\xc2' + struct.pack('>HBHHB', 11, 8, 600, 800, 1) + b'\0' * 3
+    info = probe_bytes(tmp_path, 'a.jpg', b'\xff\xd8' + app0 + sof2)
+    assert info[:6] == ('JPEG', 800, 600, 8, 1, False)
+    # A DHT segment (C4) is not a frame header
+    dht = b'\xff\xc4' + struct.pack('>H', 4) + b'\0\0'
+    assert probe_bytes(tmp_path, 'b.jpg', b'\xff\xd8' + dht + sof2)[1:3] == (800, 600)
+    assert probe_bytes(tmp_path, 'c.jpg', b'\xff\xd8' + app0) is None
+
+
+def test_probe_bmp(tmp_path):
+    header = b'BM' + b'\0' * 12 + struct.pack('<IiiHH', 40, 320, -200, 1, 24) + b'\0' * 40
+    assert probe_bytes(tmp_path, 'a.bmp', header)[:6] == ('BMP', 320, 200, 8, 3, False)
+    v4 = b'BM' + b'\0' * 12 + struct.pack('<IiiHH', 108, 16, 16, 1, 32) + b'\0' * 36 + struct.pack('<I', 0xff000000)
+    assert probe_bytes(tmp_path, 'b.bmp', v4)[3:6] == (8, 4, True)
+
+
+def test_probe_gif(tmp_path):
+    screen = b'GIF89a' + struct.pack('<HHBBB', 50, 40, 0x80, 0, 0) + b'\0' * 6
+    control = b'!\xf9\x04\x01\x00\x00\x00\x00'
+    comment = b'!\xfe\x03abc\x00'
+    assert probe_bytes(tmp_path, 'a.gif', screen + b',')[:6] == ('GIF', 50, 40, 8, 3, False)
+    assert probe_bytes(tmp_path, 'b.gif', screen + comment + control)[:6] == ('GIF', 50, 40, 8, 4, True)
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+def test_probe_tiff(tmp_path, channels):
+    data = streaming.tiff_header(12, 34, channels, 34) + b'\0' * (12 * 34 * channels)
+    assert probe_bytes(tmp_path, 'a.tif', data)[:6] == ('TIFF', 12, 34, 8, channels, channels == 4)
+
+
+def test_probe_pnm(tmp_path):
+    assert probe_bytes(tmp_path, 'a.pgm', b'P5 12 34 65535\n')[:6] == ('PNM', 12, 34, 16, 1, False)
+    assert probe_bytes(tmp_path, 'a.ppm', b'P6\n# c\n5 6\n255\n')[:6] == ('PNM', 5, 6, 8, 3, False)
+    assert probe_bytes(tmp_path, 'a.pbm', b'P4\n8 2\n\0\0')[:6] == ('PNM', 8, 2, 1, 1, False)
+
+
+def test_unknown_and_broken_files(tmp_path):
+    assert probe_bytes(tmp_path, 'a.txt', b'hello world') is None
+    assert probe_bytes(tmp_path, 'a.png', imageprobe.PNG_SIGNATURE + b'\0\0') is None
+    assert probe_bytes(tmp_path, 'a.gif', b'GIF89a') is None
+    assert imageprobe.probe_image(str(tmp_path / 'missing.png')) is None
+
+
+def test_probe_images(tmp_path):
+    good = tmp_path / 'a.ppm'
+    good.write_bytes(b'P6 1 2 255\n')
+    result = imageprobe.probe_images([str(good), str(tmp_path / 'missing.png')], workers=2)
+    assert result[str(good)].width == 1
+    assert result[str(tmp_path / 'missing.png')] is None
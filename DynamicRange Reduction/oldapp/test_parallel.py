@@ -0,0 +1,62 @@
+import pytest
+
+wx = pytest.importorskip('wx')
+np = pytest.importorskip('numpy')
+
+import imageops
+import parallel
+
+
+@pytest.fixture
+def executor():
+    # Small bands, so even the test images are split over several workers
+    with parallel.BandExecutor(workers=3, min_band_rows=4) as band_executor:
+        yield band_executor
+
+
+def make_image(width=41, height=29, seed=0, alpha=False):
+    rng = np.random.default_rng(seed)
+    image = wx.Image(width, height, rng.integers(0, 256, (height, width, 3), dtype=np.uint8).tobytes())
+    if alpha:
+        image.SetAlpha(rng.integers(0, 256, width * height, dtype=np.uint8).tobytes())
+    return image
+
+
+def test_bands_cover_every_row_once(executor):
+    for height in (1, 7, 29, 1000):
+        bands = executor.bands(height)
+        assert bands[0][0] == 0 and bands[-1][1] == height
+        assert all(stop == start for (_, stop), (start, _) in zip(bands, bands[1:]))
+        assert len(bands) <= executor.workers * 2
+
+
+def test_channel_stats_match_single_threaded(executor):
+    image = make_image(alpha=True)
+    for ignore_transparent in (False, True):
+        expected = imageops.ChannelStats.from_image(image, ignore_transparent)
+        assert executor.channel_stats(image, ignore_transparent).histograms == expected.histograms
+    mins, maxs = executor.channel_min_max(image)
+    assert (mins, maxs) == imageops.channel_min_max(imageops.image_array(image))
+
+
+@pytest.mark.parametrize('percentiles', [(None, None), (1.0, 99.0)])
+def test_compress_matches_single_threaded(executor, percentiles):
+    image = make_image(alpha=True)
+    expected = imageops.compress_dynamic_range(image, 0.6, *percentiles)
+    result = executor.compress_dynamic_range(image, 0.6, *percentiles)
+    assert result.GetData() == expected.GetData()
+    assert result.GetAlpha() == image.GetAlpha()
+    assert executor.compress_dynamic_range(image, 1.0) is image
+
+
+def test_quantize_and_point_pipeline_match_single_threaded(executor):
+    image = make_image(seed=1)
+    assert executor.reduce_color_depth(image, 3).GetData() == imageops.reduce_color_depth(image, 3).GetData()
+    pipeline = imageops.PointPipeline().compress(0.7).quantize(4)
+    assert executor.apply_point_pipeline(pipeline, image).GetData() == pipeline.apply(image).GetData()
+
+
+def test_local_range_matches_single_threaded(executor):
+    image = make_image(width=97, height=71, seed=2)
+    expected = imageops.compress_local_range(image, 0.5, tiles=4)
+    assert executor.compress_local_range(image, 0.5, tiles=4).GetData() == expected.GetData()
@@ -0,0 +1,53 @@
+import gc
+import weakref
+
+import pytest
+
+wx = pytest.importorskip('wx')
+np = pytest.importorskip('numpy')
+
+import imageops
+from pixelbuffer import PixelBuffer
+
+
+def make_image(width=13, height=7, alpha=True):
+    rng = np.random.default_rng(0)
+    image = wx.Image(width, height, rng.integers(0, 256, width * height * 3, dtype=np.uint8).tobytes())
+    if alpha:
+        image.SetAlpha(rng.integers(0, 256, width * height, dtype=np.uint8).tobytes())
+    return image
+
+
+def test_share_alpha_from_does_not_copy():
+    source = PixelBuffer(make_image())
+    output = PixelBuffer.new(source.width, source.height)
+    output.share_alpha_from(source)
+    assert output.HasAlpha() and output.image.HasAlpha()
+    assert np.shares_memory(output.alpha_array(), source.alpha_array())
+    assert output.image.alpha_owner is source.image
+
+
+def test_share_alpha_from_without_alpha():
+    source = PixelBuffer(make_image(alpha=False))
+    output = PixelBuffer.new(source.width, source.height)
+    output.share_alpha_from(source)
+    assert not output.HasAlpha()
+    assert not hasattr(output.image, 'alpha_owner')
+
+
+def test_chained_outputs_keep_the_owner_alive():
+    source = make_image()
+    alpha = source.GetAlpha()
+    owner = weakref.ref(source)
+    compressed = imageops.compress_dynamic_range(source, 0.6)
+    quantized = imageops.reduce_color_depth(compressed, 3)
+    # Every output points at the image that owns the plane, not at its input
+    assert compressed.alpha_owner is source
+    assert quantized.alpha_owner is source
+    del source, compressed
+    gc.collect()
+    assert owner() is not None
+    assert quantized.GetAlpha() == alpha
+    del quantized
+    gc.collect()
+    assert owner() is None
@@ -0,0 +1,48 @@
+import pytest
+
+wx = pytest.importorskip('wx')
+
+import pyramid
+
+
+def test_levels_halve_down_to_the_target():
+    image_pyramid = pyramid.ImagePyramid(wx.Image(1000, 600))
+    level = image_pyramid.level_for(200, 100)
+    # 1000 -> 500 -> 250; 125 would be narrower than the target
+    assert (level.GetWidth(), level.GetHeight()) == (250, 150)
+    assert [lv.GetWidth() for lv in image_pyramid.levels] == [1000, 500, 250]
+    assert image_pyramid.level_for(2000, 2000) is image_pyramid.image
+
+
+def test_levels_stop_at_min_level_size():
+    image_pyramid = pyramid.ImagePyramid(wx.Image(1000, 100))
+    level = image_pyramid.level_for(1, 1)
+    assert level.GetHeight() >= pyramid.MIN_LEVEL_SIZE
+    assert level.GetHeight() // 2 < pyramid.MIN_LEVEL_SIZE
+
+
+def test_scaled_sizes_and_cache():
+    image_pyramid = pyramid.ImagePyramid(wx.Image(400, 300))
+    small = image_pyramid.scaled(100.7, 75.2)
+    assert (small.GetWidth(), small.GetHeight()) == (100, 75)
+    assert image_pyramid.scaled(100, 75) is small
+    # A level of exactly the target size is returned as is
+    assert image_pyramid.scaled(200, 150) is image_pyramid.levels[1]
+    assert image_pyramid.scaled(400, 300) is image_pyramid.image
+
+
+def test_zoomed_in_results_are_not_cached():
+    image_pyramid = pyramid.ImagePyramid(wx.Image(400, 300))
+    big = image_pyramid.scaled(1600, 1200)
+    assert (big.GetWidth(), big.GetHeight()) == (1600, 1200)
+    assert image_pyramid.scaled(1600, 1200) is not big
+
+
+def test_cache_stays_within_budget():
+    image_pyramid = pyramid.ImagePyramid(wx.Image(400, 300), max_cached_sizes=100, max_cached_mb=0.5)
+    for width in range(150, 400, 10):
+        image_pyramid.scaled(width, width * 3 // 4)
+    cached_bytes = sum(nbytes for _, nbytes in image_pyramid._scaled.values())
+    assert cached_bytes == image_pyramid._scaled_bytes <= image_pyramid.max_cached_bytes
+    # The most recent result is still there
+    assert (390, 292, wx.IMAGE_QUALITY_HIGH) in image_pyramid._scaled
@@ -0,0 +1,136 @@
+import os
+import struct
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import streaming
+
+
+def reference_compress(pixels, factor):
+    """compress_dynamic_range's integer mapping, channel by channel."""
+    new_min = int((1 - factor) * 128)
+    new_range = 255 - 2 * new_min
+    out = np.empty_like(pixels)
+    for c in range(pixels.shape[2]):
+        channel = pixels[..., c].astype(np.int64)
+        lo, hi = channel.min(), channel.max()
+        if hi > lo:
+            out[..., c] = new_min + (channel - lo) * new_range // (hi - lo)
+        else:
+            out[..., c] = new_min
+    return out
+
+
+def random_pixels(height, width, channels, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, channels), dtype=np.uint8)
+
+
+def write_pnm(path, pixels):
+    height, width, channels = pixels.shape
+    with open(path, 'wb') as f:
+        f.write(f"{'P6' if channels == 3 else 'P5'}\n# comment\n{width} {height}\n255\n".encode('ascii'))
+        f.write(pixels.tobytes())
+
+
+def write_tiff(path, pixels, rows_per_strip):
+    height, width, channels = pixels.shape
+    with open(path, 'wb') as f:
+        f.write(streaming.tiff_header(width, height, channels, rows_per_strip))
+        f.write(pixels.tobytes())
+
+
+def read_raster(path):
+    raster = streaming.open_raster(path)
+    pixels = np.empty((raster.height, raster.width, raster.channels), dtype=np.uint8)
+    for first_row, strip in raster.iter_strips(strip_bytes=raster.row_bytes * 3):
+        pixels[first_row:first_row + len(strip)] = strip
+    return pixels
+
+
+@pytest.mark.parametrize('channels', [1, 3, 4])
+def test_tiff_round_trip(tmp_path, channels):
+    pixels = random_pixels(19, 11, channels)
+    path = str(tmp_path / 'image.tif')
+    write_tiff(path, pixels, rows_per_strip=4)
+    raster = streaming.open_raster(path)
+    assert (raster.width, raster.height, raster.channels) == (11, 19, channels)
+    assert raster.alpha_kind == (2 if channels == 4 else None)
+    assert np.array_equal(read_raster(path), pixels)
+
+
+@pytest.mark.parametrize('channels', [1, 3])
+def test_pnm_round_trip(tmp_path, channels):
+    pixels = random_pixels(7, 5, channels)
+    path = str(tmp_path / ('image.ppm' if channels == 3 else 'image.pgm'))
+    write_pnm(path, pixels)
+    assert np.array_equal(read_raster(path), pixels)
+
+
+@pytest.mark.parametrize('output_name', ['out.ppm', 'out.tif'])
+def test_compress_file_streaming_matches_reference(tmp_path, output_name):
+    pixels = random_pixels(23, 37, 3, seed=3)
+    input_path = str(tmp_path / 'in.ppm')
+    write_pnm(input_path, pixels)
+    output_path = str(tmp_path / output_name)
+    # A few rows per strip, so several strips are read and written
+    streaming.compress_file_streaming(input_path, output_path, 0.7, strip_bytes=37 * 3 * 5)
+    assert np.array_equal(read_raster(output_path), reference_compress(pixels, 0.7))
+
+
+def test_compress_file_streaming_in_place_keeps_alpha(tmp_path):
+    pixels = random_pixels(9, 7, 4, seed=4)
+    path = str(tmp_path / 'image.tif')
+    write_tiff(path, pixels, rows_per_strip=2)
+    os.chmod(path, 0o640)
+    streaming.compress_file_streaming(path, path, 0.5)
+    result = read_raster(path)
+    assert np.array_equal(result[..., :3], reference_compress(pixels[..., :3], 0.5))
+    assert np.array_equal(result[..., 3], pixels[..., 3])
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(str(tmp_path)) == ['image.tif']
+
+
+def test_failed_write_leaves_output_untouched(tmp_path):
+    pixels = random_pixels(4, 4, 4)
+    input_path = str(tmp_path / 'in.tif')
+    write_tiff(input_path, pixels, rows_per_strip=4)
+    output_path = tmp_path / 'out.ppm'
+    output_path.write_bytes(b'old')
+    with pytest.raises(ValueError):
+        # PNM output cannot hold the alpha channel
+        streaming.compress_file_streaming(input_path, str(output_path))
+    assert output_path.read_bytes() == b'old'
+    assert sorted(os.listdir(str(tmp_path))) == ['in.tif', 'out.ppm']
+
+
+def set_tiff_short(path, tag, value):
+    """Overwrite the value of a one-SHORT entry of a TIFF written by write_tiff."""
+    with open(path, 'r+b') as f:
+        header = f.read(256)
+        value_offset = header.index(struct.pack('<HHI', tag, streaming.TIFF_SHORT, 1)) + 8
+        f.seek(value_offset)
+        f.write(struct.pack('<H', value))
+
+
+@pytest.mark.parametrize('tag, value', [
+    (streaming.TAG_PHOTOMETRIC, 5),  # CMYK
+    (streaming.TAG_PHOTOMETRIC, 0),  # WhiteIsZero
+    (streaming.TAG_EXTRA_SAMPLES, 0),  # unspecified fourth sample
+])
+def test_open_tiff_rejects_non_rgba(tmp_path, tag, value):
+    path = str(tmp_path / 'image.tif')
+    write_tiff(path, random_pixels(2, 2, 4), rows_per_strip=2)
+    set_tiff_short(path, tag, value)
+    with pytest.raises(ValueError):
+        streaming.open_raster(path)
+
+
+def test_open_raster_rejects_other_files(tmp_path):
+    path = tmp_path / 'image.ppm'
+    path.write_bytes(b'P3\n1 1\n255\n0 0 0\n')
+    with pytest.raises(ValueError):
+        streaming.open_raster(str(path))
+    with pytest.raises(ValueError):
+        streaming.open_raster(str(tmp_path / 'image.png'))
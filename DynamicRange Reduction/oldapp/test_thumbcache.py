@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import thumbcache
+
+
+class Thumbnail:
+    """The part of the wx.Image interface ThumbnailCache.put reads."""
+
+    def __init__(self, width, height, data, alpha=None):
+        self.width = width
+        self.height = height
+        self.data = data
+        self.alpha = alpha
+
+    def GetWidth(self):
+        return self.width
+
+    def GetHeight(self):
+        return self.height
+
+    def GetData(self):
+        return self.data
+
+    def HasAlpha(self):
+        return self.alpha is not None
+
+    def GetAlpha(self):
+        return self.alpha
+
+
+def make_files(folder, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(str(folder), f'image{i}.png')
+        with open(path, 'wb') as f:
+            f.write(b'x' * (i + 1))
+        paths.append(path)
+    return paths
+
+
+def stored_bytes(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute('SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails').fetchone()[0]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'cache' / 'thumbnails.sqlite')
+
+
+def test_put_keeps_one_entry_per_file(tmp_path, db_path):
+    cache = thumbcache.ThumbnailCache({}, db_path=db_path)
+    (path,) = make_files(tmp_path, 1)
+    cache.put(path, Thumbnail(2, 1, b'abcdef'))
+    cache.put(path, Thumbnail(2, 1, b'ghijkl', alpha=b'\x00\xff'))
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['bytes'] == cache.total_bytes() == stored_bytes(db_path)
+    # A file that is gone has no key, and is not stored
+    cache.put(str(tmp_path / 'missing.png'), Thumbnail(1, 1, b'abc'))
+    assert cache.stats()['entries'] == 1
+
+
+def test_eviction_keeps_the_budget(tmp_path, db_path):
+    cache = thumbcache.ThumbnailCache({}, db_path=db_path, max_mb=0.05)
+    paths = make_files(tmp_path, 40)
+    for path in paths:
+        # Random bytes do not compress, so each entry is about 3 KB
+        cache.put(path, Thumbnail(32, 32, os.urandom(32 * 32 * 3)))
+    assert cache.evicted > 0
+    assert cache.total_bytes() == stored_bytes(db_path) <= cache.max_bytes
+    with sqlite3.connect(db_path) as connection:
+        kept = {row[0] for row in connection.execute('SELECT path FROM thumbnails')}
+    # The least recently used entries went first
+    assert os.path.abspath(paths[-1]) in kept
+    assert os.path.abspath(paths[0]) not in kept
+
+
+def test_clear_and_reopen(tmp_path, db_path):
+    cache = thumbcache.ThumbnailCache({}, db_path=db_path)
+    for path in make_files(tmp_path, 3):
+        cache.put(path, Thumbnail(1, 1, b'abc'))
+    assert thumbcache.ThumbnailCache({}, db_path=db_path).total_bytes() == stored_bytes(db_path) > 0
+    cache.clear()
+    assert cache.total_bytes() == 0
+
+
+def test_total_of_an_older_database_is_summed_on_open(db_path):
+    os.makedirs(os.path.dirname(db_path))
+    thumbcache.ThumbnailCache({}, db_path=db_path)
+    with sqlite3.connect(db_path) as connection:
+        # As created before the running total was kept
+        connection.execute('DROP TRIGGER thumbnails_insert')
+        connection.execute('DROP TRIGGER thumbnails_delete')
+        connection.execute('DROP TABLE thumbnail_totals')
+        connection.execute("INSERT INTO thumbnails VALUES ('a', 1, 1, 128, 1, 1, 0, x'00', 777, 0)")
+    assert thumbcache.ThumbnailCache({}, db_path=db_path).total_bytes() == 777
+
+
+def test_open_errors(tmp_path):
+    corrupt = tmp_path / 'corrupt.sqlite'
+    corrupt.write_bytes(b'not a database' * 100)
+    with pytest.raises(sqlite3.Error):
+        thumbcache.ThumbnailCache({}, db_path=str(corrupt))
+    blocker = tmp_path / 'file'
+    blocker.write_bytes(b'')
+    with pytest.raises(OSError):
+        thumbcache.ThumbnailCache({}, db_path=str(blocker / 'thumbnails.sqlite'))
+
+
+def test_memory_database_is_shared_between_threads(tmp_path):
+    cache = thumbcache.ThumbnailCache({}, db_path=thumbcache.MEMORY_DB)
+    (path,) = make_files(tmp_path, 1)
+    cache.put(path, Thumbnail(1, 1, b'abc'))
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(cache.stats()['entries']))
+    thread.start()
+    thread.join()
+    assert seen == [1]
+    assert os.listdir(str(tmp_path)) == ['image0.png']
+
+
+def test_get_follows_the_file(tmp_path, db_path):
+    wx = pytest.importorskip('wx')
+    cache = thumbcache.ThumbnailCache({}, db_path=db_path)
+    (path,) = make_files(tmp_path, 1)
+    cache.put(path, wx.Image(2, 1, b'abcdef'))
+    assert cache.get(path).GetData() == b'abcdef'
+    assert cache.hits == 1
+    with open(path, 'ab') as f:
+        f.write(b'edited')
+    assert cache.get(path) is None
+    assert cache.misses == 1
@@ -0,0 +1,297 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+import imageloader
+
+DEFAULT_THUMB_SIZE = 128
+DEFAULT_MAX_MB = 512
+# db_path of a store kept in memory, for this process only
+MEMORY_DB = ':memory:'
+
+
+def default_cache_dir():
+    """Per-user cache folder for the viewer, following the platform's conventions."""
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'UniversalImageViewer')
+
+
+def make_thumbnail(image, thumb_size=DEFAULT_THUMB_SIZE):
+    """Scale image so its longer side is thumb_size, keeping the aspect ratio."""
+    width = image.GetWidth()
+    height = image.GetHeight()
+    scale = thumb_size / max(width, height)
+    if scale >= 1.0:
+        return image.Copy()
+    new_width = max(1, int(width * scale))
+    new_height = max(1, int(height * scale))
+    # Halve cheaply first so the high quality scale works on a small image
+    while image.GetWidth() // 2 >= new_width * 2 and image.GetHeight() // 2 >= new_height * 2:
+        image = image.ShrinkBy(2, 2)
+    return image.Scale(new_width, new_height, wx.IMAGE_QUALITY_HIGH)
+
+
+class ThumbnailCache:
+    """
+    Persistent thumbnail store in a single SQLite database.
+
+    Entries are keyed by (path, mtime, file size, thumbnail size), so an
+    edited file gets a new thumbnail. Pixels are stored as zlib-compressed
+    RGB(A) so reading one back needs no image decoder. Missing thumbnails
+    are generated on a background thread with request(), and the least
+    recently used entries are evicted once the store exceeds max_mb.
+    With db_path MEMORY_DB nothing is written to disk.
+    """
+
+    def __init__(self, supported_formats, db_path=None, max_mb=DEFAULT_MAX_MB,
+                 thumb_size=DEFAULT_THUMB_SIZE):
+        if db_path is None:
+            db_path = os.path.join(default_cache_dir(), 'thumbnails.sqlite')
+        if db_path == MEMORY_DB:
+            # A plain ':memory:' database would be private to each thread's connection
+            self._database = f'file:thumbnails-{id(self)}?mode=memory&cache=shared'
+        else:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._database = db_path
+        self.db_path = db_path
+        self.supported_formats = supported_formats
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.thumb_size = thumb_size
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.evicted = 0
+        self._local = threading.local()
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._create_schema()
+        self._thread = threading.Thread(target=self._run, name="thumbnail-cache", daemon=True)
+        self._thread.start()
+
+    def _connection(self):
+        # SQLite connections cannot be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._database, timeout=30, uri=self.db_path == MEMORY_DB)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self):
+        with self._connection() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    path TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    thumb_size INTEGER NOT NULL,
+                    width INTEGER NOT NULL,
+                    height INTEGER NOT NULL,
+                    has_alpha INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (path, mtime_ns, file_size, thumb_size)
+                )''')
+            # Eviction reads nbytes in last_used order from the index, never
+            # touching the rows, whose nbytes comes after the data blob
+            connection.execute('DROP INDEX IF EXISTS thumbnails_last_used')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS thumbnails_last_used_nbytes ON thumbnails (last_used, nbytes)')
+            # Running total of nbytes, kept by triggers so that no query has
+            # to sum over every row; databases without it are summed once here
+            connection.execute('CREATE TABLE IF NOT EXISTS thumbnail_totals (nbytes INTEGER NOT NULL)')
+            connection.execute('''
+                INSERT INTO thumbnail_totals
+                SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails
+                WHERE NOT EXISTS (SELECT 1 FROM thumbnail_totals)''')
+            connection.execute('''
+                CREATE TRIGGER IF NOT EXISTS thumbnails_insert AFTER INSERT ON thumbnails
+                BEGIN UPDATE thumbnail_totals SET nbytes = nbytes + NEW.nbytes; END''')
+            connection.execute('''
+                CREATE TRIGGER IF NOT EXISTS thumbnails_delete AFTER DELETE ON thumbnails
+                BEGIN UPDATE thumbnail_totals SET nbytes = nbytes - OLD.nbytes; END''')
+
+    def total_bytes(self):
+        """Bytes of thumbnail data stored."""
+        (total,) = self._connection().execute('SELECT nbytes FROM thumbnail_totals').fetchone()
+        return total
+
+    def file_key(self, path):
+        """(path, mtime_ns, size, thumb_size) for the file as it is now, or None if it is gone."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size, self.thumb_size)
+
+    def get(self, path):
+        """Return the cached thumbnail of path as a wx.Image, or None."""
+        return self.get_many([path]).get(path)
+
+    def get_many(self, paths):
+        """Return {path: wx.Image} for the paths that have an up-to-date thumbnail."""
+        keys = {}
+        for path in paths:
+            key = self.file_key(path)
+            if key is not None:
+                keys[key] = path
+        found = {}
+        if not keys:
+            return found
+        by_path = {key[0]: key for key in keys}
+        connection = self._connection()
+        rows = []
+        path_list = list(by_path)
+        # Stay under SQLite's limit on bound parameters per statement
+        for i in range(0, len(path_list), 500):
+            chunk = path_list[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for row in connection.execute(
+                    'SELECT path, mtime_ns, file_size, thumb_size, width, height, has_alpha, data '
+                    f'FROM thumbnails WHERE thumb_size=? AND path IN ({placeholders})',
+                    [self.thumb_size] + chunk):
+                if tuple(row[:4]) == by_path[row[0]]:
+                    rows.append(row)
+        if rows:
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    'UPDATE thumbnails SET last_used=? WHERE path=? AND mtime_ns=? AND file_size=? AND thumb_size=?',
+                    [(now,) + tuple(row[:4]) for row in rows])
+        for path_key, mtime_ns, file_size, thumb_size, width, height, has_alpha, data in rows:
+            path = keys[(path_key, mtime_ns, file_size, thumb_size)]
+            found[path] = self._unpack(width, height, has_alpha, data)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def _unpack(self, width, height, has_alpha, data):
+        raw = zlib.decompress(data)
+        rgb_size = width * height * 3
+        image = wx.Image(width, height, raw[:rgb_size])
+        if has_alpha:
+            image.SetAlpha(raw[rgb_size:])
+        return image
+
+    def put(self, path, thumbnail):
+        """Store a thumbnail for path as the file is now, replacing older ones."""
+        key = self.file_key(path)
+        if key is None:
+            return
+        raw = thumbnail.GetData()
+        if thumbnail.HasAlpha():
+            raw += thumbnail.GetAlpha()
+        data = zlib.compress(raw, 1)
+        with self._connection() as connection:
+            connection.execute('DELETE FROM thumbnails WHERE path=? AND thumb_size=?', (key[0], key[3]))
+            connection.execute(
+                'INSERT INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (thumbnail.GetWidth(), thumbnail.GetHeight(), int(thumbnail.HasAlpha()),
+                       data, len(data), time.time()))
+        self._evict()
+
+    def _evict(self):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        connection = self._connection()
+        # Evict down to 90% of the budget so every insert does not evict again
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for rowid, nbytes in connection.execute(
+                'SELECT rowid, nbytes FROM thumbnails INDEXED BY thumbnails_last_used_nbytes ORDER BY last_used'):
+            doomed.append((rowid,))
+            freed += nbytes
+            if freed >= target:
+                break
+        with connection:
+            connection.executemany('DELETE FROM thumbnails WHERE rowid=?', doomed)
+        self.evicted += len(doomed)
+
+    def generate(self, path):
+        """Decode path, store its thumbnail and return it (None if it cannot be decoded)."""
+        image = imageloader.decode_image(path, self.supported_formats, (self.thumb_size, self.thumb_size))
+        if image is None:
+            return None
+        thumbnail = make_thumbnail(image, self.thumb_size)
+        self.put(path, thumbnail)
+        self.generated += 1
+        return thumbnail
+
+    def request(self, path, callback):
+        """
+        Queue path for background generation; callback(path, thumbnail) is
+        called on the worker thread, thumbnail being None on failure.
+        A cached thumbnail is returned by the worker without decoding.
+        """
+        with self._condition:
+            self._pending[path] = callback
+            self._condition.notify()
+
+    def cancel(self, path):
+        """Forget a queued request that has not started yet."""
+        with self._condition:
+            self._pending.pop(path, None)
+
+    def cancel_all(self):
+        with self._condition:
+            self._pending.clear()
+
+    def populate(self, paths):
+        """Generate missing thumbnails for paths in the background."""
+        for path in paths:
+            self.request(path, None)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                path, callback = self._pending.popitem(last=False)
+            try:
+                thumbnail = self.get(path)
+                if thumbnail is None:
+                    thumbnail = self.generate(path)
+            except Exception:
+                thumbnail = None
+            if callback is not None:
+                callback(path, thumbnail)
+
+    def stats(self):
+        """Entry count, stored bytes, budget and hit/miss/generate/evict counters."""
+        (entries,) = self._connection().execute('SELECT COUNT(*) FROM thumbnails').fetchone()
+        total = self.total_bytes()
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'path': self.db_path,
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'generated': self.generated,
+            'evicted': self.evicted,
+            'pending': pending,
+        }
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute('DELETE FROM thumbnails')
@@ -0,0 +1,221 @@
+import os
+from collections import OrderedDict
+
+import wx
+
+PADDING = 8
+LABEL_HEIGHT = 18
+
+
+class ThumbnailGrid(wx.ScrolledWindow):
+    """
+    Virtualized grid of thumbnails for a list of image paths.
+
+    Only the cells in the visible rows are painted. Thumbnails for those
+    cells are read from the ThumbnailCache in one batch or requested from
+    its background thread, and requests for cells that have scrolled out
+    of view are cancelled. Converted bitmaps are kept in an LRU sized to a
+    few screens of cells, so memory follows the visible rows rather than
+    the folder size. on_activate(index) is called on double-click or Enter.
+    """
+
+    def __init__(self, parent, thumbnails, on_activate=None):
+        super(ThumbnailGrid, self).__init__(parent, style=wx.VSCROLL | wx.WANTS_CHARS)
+        self.thumbnails = thumbnails
+        self.on_activate = on_activate
+        self.paths = []
+        self.selected = -1
+        self.cell_width = thumbnails.thumb_size + 2 * PADDING
+        self.cell_height = thumbnails.thumb_size + 2 * PADDING + LABEL_HEIGHT
+        self._bitmaps = OrderedDict()
+        self._requested = set()
+        self._failed = set()
+        self.SetScrollRate(0, 20)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LEFT_DCLICK, self.on_left_dclick)
+        self.Bind(wx.EVT_KEY_DOWN, self.on_key_down)
+
+    def set_paths(self, paths):
+        self.cancel_requests()
+        self.paths = list(paths)
+        self.selected = 0 if self.paths else -1
+        self._bitmaps.clear()
+        self._failed.clear()
+        self.update_virtual_size()
+        self.Scroll(0, 0)
+        self.Refresh()
+
+    def append_paths(self, paths):
+        """Add paths at the end, e.g. while a folder scan is still running."""
+        self.paths.extend(paths)
+        if self.selected < 0 and self.paths:
+            self.selected = 0
+        self.update_virtual_size()
+        self.Refresh()
+
+    def columns(self):
+        return max(1, self.GetClientSize().width // self.cell_width)
+
+    def update_virtual_size(self):
+        rows = (len(self.paths) + self.columns() - 1) // self.columns()
+        self.SetVirtualSize((self.columns() * self.cell_width, rows * self.cell_height))
+
+    def visible_range(self):
+        """(first, stop) indices of the cells in the rows currently on screen."""
+        _, top = self.CalcUnscrolledPosition(0, 0)
+        height = self.GetClientSize().height
+        first_row = top // self.cell_height
+        last_row = (top + height) // self.cell_height
+        columns = self.columns()
+        return first_row * columns, min(len(self.paths), (last_row + 1) * columns)
+
+    def max_bitmaps(self):
+        rows = self.GetClientSize().height // self.cell_height + 2
+        return max(64, rows * self.columns() * 3)
+
+    def cell_rect(self, index):
+        columns = self.columns()
+        x = (index % columns) * self.cell_width
+        y = (index // columns) * self.cell_height
+        return wx.Rect(x, y, self.cell_width, self.cell_height)
+
+    def hit_test(self, position):
+        x, y = self.CalcUnscrolledPosition(position.x, position.y)
+        column = x // self.cell_width
+        if column >= self.columns():
+            return -1
+        index = (y // self.cell_height) * self.columns() + column
+        return index if 0 <= index < len(self.paths) else -1
+
+    def on_size(self, event):
+        self.update_virtual_size()
+        self.Refresh()
+        event.Skip()
+
+    def on_paint(self, event):
+        dc = wx.PaintDC(self)
+        self.DoPrepareDC(dc)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        first, stop = self.visible_range()
+        self.fetch_thumbnails(first, stop)
+
+        dc.SetFont(self.GetFont())
+        thumb_size = self.thumbnails.thumb_size
+        for index in range(first, stop):
+            rect = self.cell_rect(index)
+            if index == self.selected:
+                dc.SetPen(wx.TRANSPARENT_PEN)
+                dc.SetBrush(wx.Brush(wx.SystemSettings.GetColour(wx.SYS_COLOUR_HIGHLIGHT)))
+                dc.DrawRectangle(rect)
+            path = self.paths[index]
+            bitmap = self._bitmaps.get(path)
+            if bitmap is not None:
+                self._bitmaps.move_to_end(path)
+                dc.DrawBitmap(bitmap,
+                              rect.x + PADDING + (thumb_size - bitmap.GetWidth()) // 2,
+                              rect.y + PADDING + (thumb_size - bitmap.GetHeight()) // 2)
+            else:
+                dc.SetPen(wx.LIGHT_GREY_PEN)
+                dc.SetBrush(wx.TRANSPARENT_BRUSH)
+                dc.DrawRectangle(rect.x + PADDING, rect.y + PADDING, thumb_size, thumb_size)
+            label = os.path.basename(path)
+            label_rect = wx.Rect(rect.x + 2, rect.y + PADDING + thumb_size + 2,
+                                 rect.width - 4, LABEL_HEIGHT)
+            dc.SetClippingRegion(label_rect)
+            dc.DrawLabel(label, label_rect, wx.ALIGN_CENTER_HORIZONTAL | wx.ALIGN_TOP)
+            dc.DestroyClippingRegion()
+
+    def fetch_thumbnails(self, first, stop):
+        """Load cached thumbnails for the visible cells, request the rest, cancel the rest."""
+        visible = set(self.paths[first:stop])
+        for path in list(self._requested - visible):
+            self.thumbnails.cancel(path)
+            self._requested.discard(path)
+
+        missing = [path for path in self.paths[first:stop]
+                   if path not in self._bitmaps and path not in self._requested
+                   and path not in self._failed]
+        if not missing:
+            return
+        for path, thumbnail in self.thumbnails.get_many(missing).items():
+            self.store_bitmap(path, thumbnail)
+        for path in missing:
+            if path not in self._bitmaps:
+                self._requested.add(path)
+                self.thumbnails.request(path, self.on_thumbnail_generated)
+
+    def cancel_requests(self):
+        for path in self._requested:
+            self.thumbnails.cancel(path)
+        self._requested.clear()
+
+    def store_bitmap(self, path, thumbnail):
+        self._bitmaps[path] = wx.Bitmap(thumbnail)
+        while len(self._bitmaps) > self.max_bitmaps():
+            self._bitmaps.popitem(last=False)
+
+    def on_thumbnail_generated(self, path, thumbnail):
+        # Called on the thumbnail cache thread
+        wx.CallAfter(self.on_thumbnail_ready, path, thumbnail)
+
+    def on_thumbnail_ready(self, path, thumbnail):
+        if path not in self._requested:
+            return
+        self._requested.discard(path)
+        if thumbnail is None:
+            self._failed.add(path)
+            return
+        self.store_bitmap(path, thumbnail)
+        first, stop = self.visible_range()
+        for index in range(first, stop):
+            if self.paths[index] == path:
+                rect = self.cell_rect(index)
+                x, y = self.CalcScrolledPosition(rect.x, rect.y)
+                self.RefreshRect(wx.Rect(x, y, rect.width, rect.height))
+                break
+
+    def select(self, index):
+        if not 0 <= index < len(self.paths):
+            return
+        self.selected = index
+        # Keep the selected cell on screen
+        rect = self.cell_rect(index)
+        _, top = self.CalcUnscrolledPosition(0, 0)
+        height = self.GetClientSize().height
+        _, unit = self.GetScrollPixelsPerUnit()
+        if rect.y < top:
+            self.Scroll(-1, rect.y // unit)
+        elif rect.y + rect.height > top + height:
+            self.Scroll(-1, (rect.y + rect.height - height + unit - 1) // unit)
+        self.Refresh()
+
+    def on_left_down(self, event):
+        self.SetFocus()
+        index = self.hit_test(event.GetPosition())
+        if index >= 0:
+            self.select(index)
+
+    def on_left_dclick(self, event):
+        index = self.hit_test(event.GetPosition())
+        if index >= 0 and self.on_activate is not None:
+            self.on_activate(index)
+
+    def on_key_down(self, event):
+        key = event.GetKeyCode()
+        steps = {
+            wx.WXK_LEFT: -1,
+            wx.WXK_RIGHT: 1,
+            wx.WXK_UP: -self.columns(),
+            wx.WXK_DOWN: self.columns(),
+        }
+        if key in steps and self.paths:
+            self.select(min(max(0, self.selected + steps[key]), len(self.paths) - 1))
+        elif key in (wx.WXK_RETURN, wx.WXK_NUMPAD_ENTER) and self.selected >= 0:
+            if self.on_activate is not None:
+                self.on_activate(self.selected)
+        else:
+            event.Skip()
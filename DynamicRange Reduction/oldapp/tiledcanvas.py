@@ -0,0 +1,140 @@
+import math
+from collections import OrderedDict
+
+import wx
+
+TILE_SIZE = 256
+# Source pixels added around a tile scaled on its own, so the filter sees
+# the same neighbours as when scaling the whole image
+TILE_MARGIN = 2
+
+
+class TiledImageCanvas(wx.ScrolledWindow):
+    """
+    Scrolled window that paints a wx.Image tile by tile.
+
+    Only the tiles intersecting the area being repainted are converted to
+    wx.Bitmap, and converted tiles are kept in an LRU cache of max_tiles
+    entries, so memory follows the viewport size rather than the image size.
+    An image smaller than the window is centred. set_bitmap shows a bitmap
+    converted beforehand instead, e.g. the frames of an animation.
+
+    With a scale, e.g. when zoomed in, each tile is scaled from the source
+    pixels under it as it is painted; the whole scaled image, which can be
+    many times the size of the image, is never built.
+    """
+
+    def __init__(self, parent, max_tiles=256):
+        super(TiledImageCanvas, self).__init__(parent)
+        self.image = None
+        self.scale = 1.0
+        self.bitmap = None
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, self.on_size)
+
+    def set_image(self, image, scale=1.0):
+        """Show image, scaled by scale."""
+        self.image = image
+        self.scale = scale
+        self.bitmap = None
+        self._tiles.clear()
+        if image is None:
+            self.SetVirtualSize((0, 0))
+        else:
+            self.SetVirtualSize(self.shown_size())
+        self.Refresh()
+
+    def shown_size(self):
+        """Size of the image as shown, i.e. scaled."""
+        if self.image is None:
+            return (self.bitmap.GetWidth(), self.bitmap.GetHeight())
+        return (max(1, int(self.image.GetWidth() * self.scale)),
+                max(1, int(self.image.GetHeight() * self.scale)))
+
+    def set_bitmap(self, bitmap):
+        """Show bitmap whole, without converting anything; set_image switches back to tiles."""
+        self.image = None
+        self.bitmap = bitmap
+        self._tiles.clear()
+        self.SetVirtualSize((bitmap.GetWidth(), bitmap.GetHeight()))
+        self.Refresh()
+
+    def image_offset(self):
+        """Top-left of the image in unscrolled coordinates (non-zero when centred)."""
+        shown_width, shown_height = self.shown_size()
+        client_width, client_height = self.GetClientSize()
+        return (max(0, (client_width - shown_width) // 2),
+                max(0, (client_height - shown_height) // 2))
+
+    def get_tile(self, column, row):
+        key = (column, row)
+        bitmap = self._tiles.get(key)
+        if bitmap is not None:
+            self._tiles.move_to_end(key)
+            return bitmap
+        shown_width, shown_height = self.shown_size()
+        x = column * TILE_SIZE
+        y = row * TILE_SIZE
+        width = min(TILE_SIZE, shown_width - x)
+        height = min(TILE_SIZE, shown_height - y)
+        if self.scale == 1.0:
+            tile = self.image.GetSubImage(wx.Rect(x, y, width, height))
+        else:
+            tile = self.scaled_tile(x, y, width, height)
+        bitmap = wx.Bitmap(tile)
+        self._tiles[key] = bitmap
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return bitmap
+
+    def scaled_tile(self, x, y, width, height):
+        """The rectangle (x, y, width, height) of the scaled image, scaling only the source pixels under it."""
+        scale = self.scale
+        left = max(0, int(x / scale) - TILE_MARGIN)
+        top = max(0, int(y / scale) - TILE_MARGIN)
+        right = min(self.image.GetWidth(), math.ceil((x + width) / scale) + TILE_MARGIN)
+        bottom = min(self.image.GetHeight(), math.ceil((y + height) / scale) + TILE_MARGIN)
+        part = self.image.GetSubImage(wx.Rect(left, top, right - left, bottom - top))
+        part = part.Scale(max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale)),
+                          wx.IMAGE_QUALITY_HIGH)
+        crop_x = min(round(x - left * scale), part.GetWidth() - 1)
+        crop_y = min(round(y - top * scale), part.GetHeight() - 1)
+        return part.GetSubImage(wx.Rect(crop_x, crop_y, min(width, part.GetWidth() - crop_x),
+                                        min(height, part.GetHeight() - crop_y)))
+
+    def on_size(self, event):
+        self.Refresh()
+        event.Skip()
+
+    def on_paint(self, event):
+        dc = wx.PaintDC(self)
+        self.DoPrepareDC(dc)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+        if self.bitmap is not None:
+            dc.DrawBitmap(self.bitmap, *self.image_offset())
+            return
+        if self.image is None:
+            return
+
+        # Repainted area in image coordinates
+        box = self.GetUpdateRegion().GetBox()
+        left, top = self.CalcUnscrolledPosition(box.x, box.y)
+        offset_x, offset_y = self.image_offset()
+        left -= offset_x
+        top -= offset_y
+        shown_width, shown_height = self.shown_size()
+        right = min(left + box.width, shown_width)
+        bottom = min(top + box.height, shown_height)
+        left = max(0, left)
+        top = max(0, top)
+        if right <= left or bottom <= top:
+            return
+
+        for row in range(top // TILE_SIZE, (bottom - 1) // TILE_SIZE + 1):
+            for column in range(left // TILE_SIZE, (right - 1) // TILE_SIZE + 1):
+                dc.DrawBitmap(self.get_tile(column, row),
+                              offset_x + column * TILE_SIZE, offset_y + row * TILE_SIZE)
@@ -0,0 +1,58 @@
+import threading
+
+
+class LatestOnlyWorker:
+    """
+    Runs func on a single worker thread, newest request only.
+
+    There is one pending slot rather than a queue: a new request replaces
+    any request that has not started yet, and makes the result of a call
+    already in flight stale. Only the newest request ever reaches the
+    callback, so bursts of requests never pile up work.
+    """
+
+    def __init__(self, func, callback, name="worker"):
+        """
+        callback(args, generation, result, error) is called on the worker
+        thread for the newest request only. error holds the exception
+        message if func raised, and result is then None.
+        """
+        self.func = func
+        self.callback = callback
+        self.generation = 0
+        self._pending = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def request(self, *args):
+        """Queue func(*args), superseding anything older. Returns its generation."""
+        with self._condition:
+            self.generation += 1
+            self._pending = (args, self.generation)
+            self._condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """Drop the pending request and discard the result of any call in flight."""
+        with self._condition:
+            self.generation += 1
+            self._pending = None
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                args, generation = self._pending
+                self._pending = None
+            try:
+                result = self.func(*args)
+                error = None
+            except Exception as e:
+                result, error = None, str(e)
+            if self.is_current(generation):
+                self.callback(args, generation, result, error)